@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import time
+from engine import Simulation
+from sinks import NullSink, PrintSink, WARNING
+
+# порівняння рушія симуляції з циклом if/elif і print із попереднього main.py:
+#   python benchmark.py --actions 1000000
+# усі варіанти працюють на поточних Ship/ContainerStore, тож порівнюється лише
+# диспетчеризація дій і виведення, а не старі класи зі списками
+
+
+def make_data(n_actions: int, n_ships: int = 50, n_containers: int = 20_000, seed: int = 0) -> dict:
+    # синтетичний журнал: серії завантажень/розвантажень одного корабля, дозаправки й рейси
+    rnd = random.Random(seed)
+    ports = [{"ID": i, "latitude": rnd.uniform(-60, 60), "longitude": rnd.uniform(-180, 180)} for i in range(10)]
+    ships = [{"ID": i, "currentPort": rnd.randrange(len(ports)), "totalWeightCapacity": 10 ** 9,
+              "maxAll": 500, "maxHeavy": 200, "maxRefrigerated": 50, "maxLiquid": 50,
+              "fuelConsumptionPerKM": 1.0} for i in range(n_ships)]
+    containers = []
+    for i in range(n_containers):
+        c = {"ID": i, "weight": rnd.randrange(500, 6000)}
+        kind = rnd.random()
+        if kind < 0.1:
+            c["type"] = "R"
+        elif kind < 0.2:
+            c["type"] = "L"
+        containers.append(c)
+    # журнал узгоджений зі станом: вантажаться вільні контейнери, розвантажуються ті, що на борту
+    free = list(range(n_containers))
+    on_board = [[] for _ in range(n_ships)]
+    actions = []
+    while len(actions) < n_actions:
+        ship = rnd.randrange(n_ships)
+        kind = rnd.random()
+        if kind < 0.45 and free:
+            for _ in range(min(rnd.randint(1, 20), len(free))):
+                cont = free.pop(rnd.randrange(len(free)))
+                on_board[ship].append(cont)
+                actions.append({"action": "load", "shipID": ship, "containerID": cont})
+        elif kind < 0.9 and on_board[ship]:
+            for _ in range(min(rnd.randint(1, 20), len(on_board[ship]))):
+                cont = on_board[ship].pop(rnd.randrange(len(on_board[ship])))
+                free.append(cont)
+                actions.append({"action": "unload", "shipID": ship, "containerID": cont})
+        elif kind < 0.95:
+            actions.append({"action": "refuel", "shipID": ship, "fuel": rnd.randrange(10 ** 5, 10 ** 7)})
+        else:
+            actions.append({"action": "sail", "shipID": ship, "destPortID": rnd.randrange(len(ports))})
+    return {"ports": ports, "ships": ships, "containers": containers, "actions": actions[:n_actions]}
+
+
+def legacy_run(simulation: Simulation, actions):
+    # крок 5 попереднього main.py: if/elif на кожну дію (над поточними класами)
+    ships, ports, containers = simulation.ships, simulation.ports, simulation.containers
+    for action in actions:
+        if action["action"] == "load":
+            ship = ships[action["shipID"]]
+            cont = containers[action["containerID"]]
+            ship.load(cont)
+        elif action["action"] == "unload":
+            ship = ships[action["shipID"]]
+            ship.unload(action["containerID"])
+        elif action["action"] == "refuel":
+            ship = ships[action["shipID"]]
+            ship.re_fuel(action["fuel"])
+        elif action["action"] == "sail":
+            ship = ships[action["shipID"]]
+            dest_port = ports[action["destPortID"]]
+            ship.sail_to(dest_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рушія симуляції")
+    parser.add_argument("--actions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = make_data(args.actions, seed=args.seed)
+    with open(os.devnull, "w") as devnull:
+        cases = [
+            ("if/elif dispatch + print", lambda sim: legacy_run(sim, data["actions"]), PrintSink(stream=devnull)),
+            ("engine, print all", lambda sim: sim.run(data["actions"]), PrintSink(stream=devnull)),
+            ("engine, warnings only", lambda sim: sim.run(data["actions"]), PrintSink(WARNING, devnull)),
+            ("engine, no output", lambda sim: sim.run(data["actions"]), NullSink()),
+        ]
+        reports = []
+        print("Порівнюється лише диспетчеризація: усі варіанти на поточних Ship/ContainerStore")
+        print(f"{'case':<28} {'s':>8} {'actions/s':>12}")
+        for name, run, sink in cases:
+            simulation = Simulation.from_data(data, sink)
+            start = time.perf_counter()
+            run(simulation)
+            elapsed = time.perf_counter() - start
+            reports.append(simulation.report())
+            print(f"{name:<28} {elapsed:>8.2f} {args.actions / elapsed:>12.0f}")
+    # усі варіанти мають давати однаковий стан портів і кораблів
+    for (name, _, _), report in zip(cases, reports):
+        if report != reports[0]:
+            raise RuntimeError(f"Варіант '{name}' дав інший стан портів і кораблів")
+
+
+if __name__ == "__main__":
+    main()
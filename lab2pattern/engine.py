@@ -0,0 +1,129 @@
+from itertools import groupby
+from models import BasicContainer, HeavyContainer, RefrigeratedContainer, LiquidContainer
+from port import Port
+from ship import Ship
+from sinks import DEFAULT_SINK, WARNING
+
+# дії, сусідні виклики яких для одного корабля виконуються одним пакетом
+BATCHED = ("load", "unload")
+
+
+def make_container(c: dict):
+    if "type" not in c:
+        if c["weight"] > 3000:
+            return HeavyContainer(c["ID"], c["weight"])
+        return BasicContainer(c["ID"], c["weight"])
+    if c["type"] == "R":
+        return RefrigeratedContainer(c["ID"], c["weight"])
+    if c["type"] == "L":
+        return LiquidContainer(c["ID"], c["weight"])
+    raise ValueError(f"Невідомий тип контейнера: {c['type']}")
+
+
+def _batch_key(action: dict):
+    kind = action["action"]
+    return kind, (action["shipID"] if kind in BATCHED else None)
+
+
+def _container_ids(containers) -> dict:
+    return {
+        "basic_container": [c.id_ for c in containers if isinstance(c, BasicContainer)],
+        "heavy_container": [c.id_ for c in containers if isinstance(c, HeavyContainer) and not isinstance(c, (RefrigeratedContainer, LiquidContainer))],
+        "refrigerated_container": [c.id_ for c in containers if isinstance(c, RefrigeratedContainer)],
+        "liquid_container": [c.id_ for c in containers if isinstance(c, LiquidContainer)],
+    }
+
+
+class Simulation:
+    # порти, кораблі й контейнери разом із виконанням потоку дій
+    def __init__(self, ports: dict, ships: dict, containers: dict, sink=DEFAULT_SINK):
+        self.ports = ports
+        self.ships = ships
+        self.containers = containers
+        self.sink = sink
+        for ship in ships.values():
+            ship.sink = sink
+        # таблиця диспетчеризації: дія -> обробник списку сусідніх дій
+        self.handlers = {
+            "load": self._load,
+            "unload": self._unload,
+            "refuel": self._refuel,
+            "sail": self._sail,
+        }
+
+    @classmethod
+    def from_data(cls, data: dict, sink=DEFAULT_SINK):
+        ports = {}
+        ships = {}
+        containers = {}
+
+        for p in data["ports"]:
+            ports[p["ID"]] = Port(p["ID"], p["latitude"], p["longitude"])
+
+        for s in data["ships"]:
+            port = ports[s["currentPort"]]
+            ship = Ship(
+                s["ID"], port,
+                total_weight_capacity=s["totalWeightCapacity"],
+                max_all=s["maxAll"],
+                max_heavy=s["maxHeavy"],
+                max_refrigerated=s["maxRefrigerated"],
+                max_liquid=s["maxLiquid"],
+                fuel_consumption_per_km=s["fuelConsumptionPerKM"],
+                sink=sink,
+            )
+            ships[s["ID"]] = ship
+            port.incoming_ship(ship)
+
+        # кладемо контейнери у перший порт
+        first_port = list(ports.values())[1]
+        for c in data["containers"]:
+            cont = make_container(c)
+            containers[c["ID"]] = cont
+            first_port.containers.append(cont)
+
+        return cls(ports, ships, containers, sink)
+
+    def run(self, actions) -> int:
+        # actions може бути будь-яким ітерованим потоком (напр. генератором рядків журналу);
+        # повертає кількість оброблених дій
+        count = 0
+        for (kind, _), group in groupby(actions, key=_batch_key):
+            group = list(group)
+            count += len(group)
+            handler = self.handlers.get(kind)
+            if handler is None:
+                self.sink.log(WARNING, "Unknown action: %s", kind)
+                continue
+            handler(group)
+        return count
+
+    def _load(self, actions: list):
+        ship = self.ships[actions[0]["shipID"]]
+        ship.load_many([self.containers[a["containerID"]] for a in actions])
+
+    def _unload(self, actions: list):
+        ship = self.ships[actions[0]["shipID"]]
+        ship.unload_many([a["containerID"] for a in actions])
+
+    def _refuel(self, actions: list):
+        for a in actions:
+            self.ships[a["shipID"]].re_fuel(a["fuel"])
+
+    def _sail(self, actions: list):
+        for a in actions:
+            self.ships[a["shipID"]].sail_to(self.ports[a["destPortID"]])
+
+    def report(self) -> dict:
+        result = {}
+        for port in self.ports.values():
+            result[f"Port {port.id_}"] = {
+                "lat": round(port.latitude, 2),
+                "lon": round(port.longitude, 2),
+                **_container_ids(port.containers),
+                "ships": {
+                    f"ship {s.id_}": {"fuel_left": round(s.fuel, 2), **_container_ids(s.containers)}
+                    for s in port.current
+                },
+            }
+        return result
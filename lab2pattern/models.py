@@ -27,3 +27,36 @@ class RefrigeratedContainer(HeavyContainer):
 class LiquidContainer(HeavyContainer):
     def consumption(self) -> float:
         return 0.04 * self.weight
+
+
+class ContainerStore:
+    # контейнери за id_ у порядку додавання: пошук, перевірка і видалення за O(1)
+    def __init__(self):
+        self._by_id = {}
+
+    def append(self, cont: Container):
+        # контейнер з тим самим id_ не дублюється, а переходить у кінець
+        self._by_id.pop(cont.id_, None)
+        self._by_id[cont.id_] = cont
+
+    def get(self, cont_id: int):
+        return self._by_id.get(cont_id)
+
+    def pop(self, cont_id: int):
+        # повертає None, якщо контейнера немає
+        return self._by_id.pop(cont_id, None)
+
+    def remove(self, cont: Container):
+        if cont not in self:
+            raise ValueError(f"Контейнера {cont.id_} немає у сховищі")
+        del self._by_id[cont.id_]
+
+    def __contains__(self, cont) -> bool:
+        # як у списку: рівність за Container.__eq__ (id_ і вага)
+        return self._by_id.get(getattr(cont, "id_", None)) == cont
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self) -> int:
+        return len(self._by_id)
@@ -1,11 +1,12 @@
 import math
+from models import ContainerStore
 
 class Port:
     def __init__(self, id_: int, latitude: float, longitude: float):
         self.id_ = id_
         self.latitude = latitude
         self.longitude = longitude
-        self.containers = []
+        self.containers = ContainerStore()
         self.history = []
         self.current = []
 
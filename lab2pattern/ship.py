@@ -1,9 +1,23 @@
-from models import Container, HeavyContainer, RefrigeratedContainer, LiquidContainer
+from models import Container, ContainerStore, HeavyContainer, RefrigeratedContainer, LiquidContainer
+from sinks import DEFAULT_SINK, DEBUG, INFO, WARNING
+
+# клас контейнера -> (heavy, refrigerated, liquid); isinstance для підкласів ABC повільний
+_KINDS = {}
+
+
+def container_kinds(cont: Container) -> tuple:
+    kinds = _KINDS.get(type(cont))
+    if kinds is None:
+        kinds = _KINDS[type(cont)] = (isinstance(cont, HeavyContainer),
+                                      isinstance(cont, RefrigeratedContainer),
+                                      isinstance(cont, LiquidContainer))
+    return kinds
+
 
 class Ship:
     def __init__(self, id_: int, current_port, total_weight_capacity: int,
                  max_all: int, max_heavy: int, max_refrigerated: int,
-                 max_liquid: int, fuel_consumption_per_km: float):
+                 max_liquid: int, fuel_consumption_per_km: float, sink=DEFAULT_SINK):
         self.id_ = id_
         self.fuel = 0.0
         self.current_port = current_port
@@ -13,71 +27,150 @@ class Ship:
         self.max_refrigerated = max_refrigerated
         self.max_liquid = max_liquid
         self.fuel_consumption_per_km = fuel_consumption_per_km
-        self.containers = []
+        self.containers = ContainerStore()
+        # поточні підсумки вантажу, оновлюються в load/unload замість перерахунку
+        self.total_weight = 0
+        self.heavy_count = 0
+        self.refrigerated_count = 0
+        self.liquid_count = 0
+        self.consumption_rate = 0.0  # сума consumption() контейнерів на борту
+        self.sink = sink  # куди йдуть повідомлення замість print
+
+    def _track(self, cont: Container, sign: int):
+        # sign = 1 при завантаженні, -1 при розвантаженні
+        self.total_weight += sign * cont.weight
+        self.consumption_rate += sign * cont.consumption()
+        if not self.containers:
+            self.consumption_rate = 0.0  # без накопиченої похибки float
+        heavy, refrigerated, liquid = container_kinds(cont)
+        self.heavy_count += sign * heavy
+        self.refrigerated_count += sign * refrigerated
+        self.liquid_count += sign * liquid
 
     def get_current_containers(self):
         return sorted(self.containers, key=lambda c: c.id_)
 
     def re_fuel(self, new_fuel: float):
         self.fuel += new_fuel
-        print(f"Ship {self.id_}: refueled by {new_fuel}, total fuel: {self.fuel:.2f}")
+        self.sink.log(INFO, "Ship %s: refueled by %s, total fuel: %.2f", self.id_, new_fuel, self.fuel)
 
     def load(self, cont: Container) -> bool:
         # обмеження
         if len(self.containers) >= self.max_all:
-            print(f"Ship {self.id_}: cannot load container {cont.id_}, max total containers reached")
+            self.sink.log(WARNING, "Ship %s: cannot load container %s, max total containers reached", self.id_, cont.id_)
             return False
-        if sum(c.weight for c in self.containers) + cont.weight > self.total_weight_capacity:
-            print(f"Ship {self.id_}: cannot load container {cont.id_}, weight limit exceeded")
+        if self.total_weight + cont.weight > self.total_weight_capacity:
+            self.sink.log(WARNING, "Ship %s: cannot load container %s, weight limit exceeded", self.id_, cont.id_)
             return False
-        if isinstance(cont, HeavyContainer) and len([c for c in self.containers if isinstance(c, HeavyContainer)]) >= self.max_heavy:
-            print(f"Ship {self.id_}: cannot load container {cont.id_}, max heavy containers reached")
+        if isinstance(cont, HeavyContainer) and self.heavy_count >= self.max_heavy:
+            self.sink.log(WARNING, "Ship %s: cannot load container %s, max heavy containers reached", self.id_, cont.id_)
             return False
-        if isinstance(cont, RefrigeratedContainer) and len([c for c in self.containers if isinstance(c, RefrigeratedContainer)]) >= self.max_refrigerated:
-            print(f"Ship {self.id_}: cannot load container {cont.id_}, max refrigerated containers reached")
+        if isinstance(cont, RefrigeratedContainer) and self.refrigerated_count >= self.max_refrigerated:
+            self.sink.log(WARNING, "Ship %s: cannot load container %s, max refrigerated containers reached",
+                          self.id_, cont.id_)
             return False
-        if isinstance(cont, LiquidContainer) and len([c for c in self.containers if isinstance(c, LiquidContainer)]) >= self.max_liquid:
-            print(f"Ship {self.id_}: cannot load container {cont.id_}, max liquid containers reached")
+        if isinstance(cont, LiquidContainer) and self.liquid_count >= self.max_liquid:
+            self.sink.log(WARNING, "Ship %s: cannot load container %s, max liquid containers reached", self.id_, cont.id_)
             return False
 
+        self._take(cont)
+        self.sink.log(INFO, "Ship %s: loaded container %s", self.id_, cont.id_)
+        return True
+
+    def _take(self, cont: Container):
+        # контейнер, що вже на борту, лише переходить у кінець: сховище не тримає дублікатів
+        on_board = self.containers.get(cont.id_) is not None
         self.containers.append(cont)
+        if not on_board:
+            self._track(cont, 1)
         if cont in self.current_port.containers:
             self.current_port.containers.remove(cont)
 
-        print(f"Ship {self.id_}: loaded container {cont.id_}")
-        return True
+    def load_many(self, conts) -> int:
+        # пакет завантажень з тим самим результатом, що й load() по черзі;
+        # якщо вміщається весь пакет, обмеження перевіряються один раз на пакет
+        conts = list(conts)
+        ids = set()
+        weight = heavy = refrigerated = liquid = 0
+        for c in conts:
+            ids.add(c.id_)
+            weight += c.weight
+            h, r, l = container_kinds(c)
+            heavy += h
+            refrigerated += r
+            liquid += l
+        fits = (
+            len(ids) == len(conts)
+            and not any(self.containers.get(i) is not None for i in ids)
+            and len(self.containers) + len(conts) <= self.max_all
+            and self.total_weight + weight <= self.total_weight_capacity
+            and self.heavy_count + heavy <= self.max_heavy
+            and self.refrigerated_count + refrigerated <= self.max_refrigerated
+            and self.liquid_count + liquid <= self.max_liquid
+        )
+        if not fits:
+            return sum(self.load(c) for c in conts)
+        for cont in conts:
+            self._take(cont)
+        if self.sink.enabled(INFO):
+            for cont in conts:
+                self.sink.log(INFO, "Ship %s: loaded container %s", self.id_, cont.id_)
+        return len(conts)
 
     def unload(self, cont_id: int) -> bool:
+        self.unload_many([cont_id])
+        return bool(self.containers)
+
+    def _missed(self, cont_id: int) -> tuple:
+        # скільки "not on ship" друкував цикл старого unload до і після знайденого контейнера:
+        # повідомлення йшло для кожного іншого контейнера, а після pop наступний пропускався
+        n = len(self.containers)
         for idx, c in enumerate(self.containers):
             if c.id_ == cont_id:
-                container = self.containers.pop(idx)
-                self.current_port.containers.append(container)
-                print(f"Ship {self.id_}: unloaded container {cont_id} to Port {self.current_port.id_}")
-            else:
-                print(f"Ship {self.id_}: cannot unload container {cont_id}, not on ship")
-        if not self.containers:
-            print(f"Ship {self.id_}: no containers left on board")
-            return False
-        return True
+                return idx, max(n - idx - 2, 0)
+        return n, 0
+
+    def unload_many(self, cont_ids) -> int:
+        # пакет розвантажень у поточний порт; повертає кількість розвантажених
+        store, port_store, log = self.containers, self.current_port.containers, self.sink.log
+        warn = self.sink.enabled(WARNING)
+        unloaded = 0
+        for cont_id in cont_ids:
+            before, after = self._missed(cont_id) if warn else (0, 0)
+            for _ in range(before):
+                log(WARNING, "Ship %s: cannot unload container %s, not on ship", self.id_, cont_id)
+            container = store.pop(cont_id)
+            if container is not None:
+                self._track(container, -1)
+                port_store.append(container)
+                unloaded += 1
+                log(INFO, "Ship %s: unloaded container %s to Port %s", self.id_, cont_id, self.current_port.id_)
+            for _ in range(after):
+                log(WARNING, "Ship %s: cannot unload container %s, not on ship", self.id_, cont_id)
+            if not store:
+                log(INFO, "Ship %s: no containers left on board", self.id_)
+        return unloaded
 
     def sail_to(self, dest_port) -> bool:
         distance = self.current_port.get_distance(dest_port)
-        fuel_need = distance * (self.fuel_consumption_per_km + sum(c.consumption() for c in self.containers))
+        fuel_need = distance * (self.fuel_consumption_per_km + self.consumption_rate)
 
-        print(f"Ship {self.id_}: attempting to sail from Port {self.current_port.id_} to Port {dest_port.id_}")
-        print(f"Ship {self.id_}: distance = {distance:.2f}, fuel needed = {fuel_need:.2f}, current fuel = {self.fuel:.2f}")
+        self.sink.log(DEBUG, "Ship %s: attempting to sail from Port %s to Port %s",
+                      self.id_, self.current_port.id_, dest_port.id_)
+        self.sink.log(DEBUG, "Ship %s: distance = %.2f, fuel needed = %.2f, current fuel = %.2f",
+                      self.id_, distance, fuel_need, self.fuel)
 
         if self.fuel >= fuel_need:
             self.fuel -= fuel_need
-            print(f"Ship {self.id_}: sailing... fuel left after journey = {self.fuel:.2f}")
+            self.sink.log(INFO, "Ship %s: sailing... fuel left after journey = %.2f", self.id_, self.fuel)
 
             self.current_port.outgoing_ship(self)
             self.current_port = dest_port
             self.current_port.incoming_ship(self)
 
-            print(f"Ship {self.id_}: arrived at Port {dest_port.id_}")
+            self.sink.log(INFO, "Ship %s: arrived at Port %s", self.id_, dest_port.id_)
             return True
         else:
-            print(f"Ship {self.id_}: Not enough fuel to sail to Port {dest_port.id_}")
+            self.sink.log(WARNING, "Ship %s: Not enough fuel to sail to Port %s", self.id_, dest_port.id_)
             return False
 
@@ -0,0 +1,55 @@
+import sys
+
+# рівні повідомлень, як у logging
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+
+class Sink:
+    # приймач діагностики: повідомлення нижче level відкидаються ще до форматування
+    def __init__(self, level: int = DEBUG):
+        self.level = level
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, message: str, *args):
+        # message форматується через % лише для повідомлень, що проходять фільтр
+        if level >= self.level:
+            self.write(level, message % args if args else message)
+
+    def write(self, level: int, text: str):
+        raise NotImplementedError
+
+
+class PrintSink(Sink):
+    # друкує у stream (за замовчуванням stdout), як раніше print
+    def __init__(self, level: int = DEBUG, stream=None):
+        super().__init__(level)
+        self.stream = stream
+
+    def write(self, level: int, text: str):
+        print(text, file=self.stream or sys.stdout)
+
+
+class MemorySink(Sink):
+    # збирає повідомлення у список (level, text), напр. для перевірок
+    def __init__(self, level: int = DEBUG):
+        super().__init__(level)
+        self.records = []
+
+    def write(self, level: int, text: str):
+        self.records.append((level, text))
+
+
+class NullSink(Sink):
+    # відкидає все
+    def __init__(self):
+        super().__init__(WARNING + 1)
+
+    def write(self, level: int, text: str):
+        pass
+
+
+DEFAULT_SINK = PrintSink()
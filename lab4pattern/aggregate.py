@@ -0,0 +1,213 @@
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+# ---------- Aggregate functions ----------
+#
+# Each function is (initial state, step(state, value), final(state)). NULL
+# values are skipped by everything but count(*), as in SQL; sum, min, max and
+# avg of a group without non-null values are None.
+
+def _count(state: int, value: Any) -> int:
+    return state if value is None else state + 1
+
+
+def _sum(state: Any, value: Any) -> Any:
+    if value is None:
+        return state
+    return (0 if state is None else state) + value
+
+
+def _min(state: Any, value: Any) -> Any:
+    if value is None or (state is not None and state <= value):
+        return state
+    return value
+
+
+def _max(state: Any, value: Any) -> Any:
+    if value is None or (state is not None and state >= value):
+        return state
+    return value
+
+
+def _avg(state: tuple, value: Any) -> tuple:
+    if value is None:
+        return state
+    return state[0] + value, state[1] + 1
+
+
+def _avg_final(state: tuple) -> Optional[float]:
+    return state[0] / state[1] if state[1] else None
+
+
+def _same(state: Any) -> Any:
+    return state
+
+
+def _add(state: Any, other: Any) -> Any:
+    return state + other
+
+
+def _avg_merge(state: tuple, other: tuple) -> tuple:
+    return state[0] + other[0], state[1] + other[1]
+
+
+AGGREGATES: Dict[str, tuple[Any, Callable, Callable]] = {
+    "count": (0, _count, _same),
+    "sum": (None, _sum, _same),
+    "min": (None, _min, _same),
+    "max": (None, _max, _same),
+    "avg": ((0, 0), _avg, _avg_final),
+}
+
+# Combine two partial states of the same function (see merge_states).
+MERGES: Dict[str, Callable] = {
+    "count": _add,
+    "sum": _sum,
+    "min": _min,
+    "max": _max,
+    "avg": _avg_merge,
+}
+
+
+def aggregate_name(function: str, column: Optional[str]) -> str:
+    """Default result column name, e.g. 'count(*)' or 'sum(score)'."""
+    return f"{function}({column or '*'})"
+
+
+# ---------- Hash aggregation ----------
+
+def hash_aggregate(records: Iterable[tuple], columns: List[str], n_keys: int,
+                   aggregates: List[tuple[str, Optional[str], str]]) -> List[tuple[tuple, Dict[str, Any]]]:
+    """
+    Group and aggregate records in one pass, keeping one state per group.
+
+    Args:
+        records (Iterable[tuple]): One tuple of values per row, aligned with
+            ``columns``.
+        columns (List[str]): Column of each record value; the first
+            ``n_keys`` are the group-by columns.
+        n_keys (int): Number of group-by columns.
+        aggregates (List[tuple]): (function, column or None, alias) triples.
+
+    Returns:
+        List[tuple]: (group-by values, {alias: result}) per group, in
+        first-seen order.
+    """
+    return finish_groups(group_states(records, columns, n_keys, aggregates), n_keys, aggregates)
+
+
+def group_states(records: Iterable[tuple], columns: List[str], n_keys: int,
+                 aggregates: List[tuple[str, Optional[str], str]]) -> Dict[Any, list]:
+    """
+    First phase of hash_aggregate: the partial states of every group.
+
+    Returns:
+        Dict: Group key (the bare value when n_keys is 1) -> states, in
+        first-seen order; see merge_states and finish_groups.
+    """
+    # State slot 0 counts the group's rows and serves count(*); count(column)
+    # updates in place; the other aggregates call their step function.
+    count_values, steps = [], []
+    for j, (function, column, _) in enumerate(aggregates, 1):
+        if column is None:
+            continue
+        if function == "count":
+            count_values.append((j, columns.index(column)))
+        else:
+            steps.append((j, columns.index(column), AGGREGATES[function][1]))
+    initial = [0] + [AGGREGATES[function][0] for function, _, _ in aggregates]
+    single = n_keys == 1  # key by the bare value, not a 1-tuple
+    groups: Dict[Any, list] = {}
+    for record in records:
+        key = record[0] if single else record[:n_keys]
+        state = groups.get(key)
+        if state is None:
+            state = groups[key] = list(initial)
+        state[0] += 1
+        for j, i in count_values:
+            if record[i] is not None:
+                state[j] += 1
+        for j, i, step in steps:
+            state[j] = step(state[j], record[i])
+    return groups
+
+
+def merge_states(parts: Iterable[Dict[Any, list]],
+                 aggregates: List[tuple[str, Optional[str], str]]) -> Dict[Any, list]:
+    """
+    Combine the group states of consecutive record ranges (e.g. partitions of a table).
+
+    Passing the ranges in order keeps groups in first-seen order, so the
+    result finishes exactly like one group_states pass over all records.
+    """
+    merges = [_add] + [MERGES[function] for function, _, _ in aggregates]
+    merged: Dict[Any, list] = {}
+    for part in parts:
+        for key, state in part.items():
+            total = merged.get(key)
+            if total is None:
+                merged[key] = state
+            else:
+                merged[key] = [merge(a, b) for merge, a, b in zip(merges, total, state)]
+    return merged
+
+
+def finish_groups(groups: Dict[Any, list], n_keys: int,
+                  aggregates: List[tuple[str, Optional[str], str]]) -> List[tuple[tuple, Dict[str, Any]]]:
+    """Turn group states into hash_aggregate's (group-by values, {alias: result}) pairs."""
+    if not groups and n_keys == 0:
+        initial = [0] + [AGGREGATES[function][0] for function, _, _ in aggregates]
+        groups = {(): initial}  # an aggregate without GROUP BY always yields one row
+    single = n_keys == 1
+    finals = [(alias, _same if column is None else AGGREGATES[function][2], 0 if column is None else j)
+              for j, (function, column, alias) in enumerate(aggregates, 1)]
+    return [((key,) if single else key, {alias: final(state[j]) for alias, final, j in finals})
+            for key, state in groups.items()]
+
+
+def count_aggregate(value_counts: Iterable[tuple[Any, int]], grouped: bool,
+                    aggregates: List[tuple[str, Optional[str], str]]) -> List[tuple[tuple, Dict[str, Any]]]:
+    """
+    Aggregate a single column from (value, number of rows) pairs, e.g. an index.
+
+    Every aggregate must be count(*) or read the counted column; the result
+    has the same layout as hash_aggregate.
+
+    Args:
+        value_counts (Iterable[tuple]): Distinct values (None included) with
+            the number of rows holding each.
+        grouped (bool): One group per value instead of a single result row.
+        aggregates (List[tuple]): (function, column or None, alias) triples.
+    """
+    functions = {function for function, column, _ in aggregates if column is not None}
+
+    def fold(pairs: List[tuple[Any, int]]) -> Dict[str, Any]:
+        present = [(v, c) for v, c in pairs if v is not None]
+        counted = sum(c for _, c in present)
+        total = None
+        if present and functions & {"sum", "avg"}:
+            total = sum(v * c for v, c in present)
+        results = {}
+        for function, column, alias in aggregates:
+            if column is None:
+                results[alias] = sum(c for _, c in pairs)
+            elif function == "count":
+                results[alias] = counted
+            elif function == "sum":
+                results[alias] = total
+            elif function == "avg":
+                results[alias] = total / counted if counted else None
+            elif present:
+                results[alias] = (min if function == "min" else max)(v for v, _ in present)
+            else:
+                results[alias] = None
+        return results
+
+    if grouped:
+        return [((value,), fold([(value, count)])) for value, count in value_counts]
+    return [((), fold(list(value_counts)))]
+
+
+def run_lengths(keys: Iterable[Any]) -> Iterable[tuple[Any, int]]:
+    """Collapse sorted keys into (value, number of repeats) pairs."""
+    return ((value, sum(1 for _ in run)) for value, run in groupby(keys))
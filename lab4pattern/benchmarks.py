@@ -0,0 +1,416 @@
+import argparse
+import asyncio
+import gc
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datatypes import Row, RowLayout
+from factory import Database
+from query import SimpleQuery
+from server import Client
+
+# ---------- Helpers ----------
+
+BENCH_SCHEMA = {
+    "columns": [
+        {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+        {"name": "city", "type": "string", "nullable": False},
+        {"name": "score", "type": "int", "nullable": True},
+        {"name": "vip", "type": "bool", "nullable": False},
+    ],
+}
+
+
+def make_rows(n: int, seed: int = 0):
+    """Return n synthetic rows for BENCH_SCHEMA."""
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "city": f"city{rnd.randrange(50)}",
+            "score": None if rnd.random() < 0.05 else rnd.randrange(1000),
+            "vip": rnd.random() < 0.1,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def create_table(name: str, storage: str = "row"):
+    """Create an empty BENCH_SCHEMA table."""
+    return Database("BenchDB").create_table_with_factory(name, {**BENCH_SCHEMA, "storage": storage})
+
+
+def make_table(name: str, n: int, storage: str = "row", seed: int = 0):
+    """Create a table with n synthetic rows: id, city, score (nullable), vip."""
+    table = create_table(name, storage)
+    table.insert_many(make_rows(n, seed))
+    return table
+
+
+def best_of(fn, repeat: int) -> float:
+    """Return the fastest of ``repeat`` runs of fn, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ---------- Benchmarks ----------
+
+QUERY_SHAPES = {
+    # ~45% of rows match: result materialization dominates
+    "wide": lambda t: (SimpleQuery(t).where("score", ">", 500)
+                       .where("vip", "=", False).order_by("score", ascending=False)),
+    # <1% of rows match: filter cost dominates
+    "narrow": lambda t: (SimpleQuery(t).where("score", "<", 10)
+                         .where("city", "=", "city7").order_by("id")),
+}
+
+
+def bench_vectorized(sizes, repeat: int):
+    """Compare the row-at-a-time and NumPy paths of SimpleQuery.execute."""
+    print(f"{'storage':<9} {'shape':<7} {'rows':>9} {'row loop, ms':>13} {'numpy, ms':>10} {'speedup':>8}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            table = make_table(f"bench_{storage}_{n}", n, storage)
+            for shape, query in QUERY_SHAPES.items():
+                scalar = best_of(lambda: query(table).execute(), repeat)
+                vector = best_of(lambda: query(table).vectorize().execute(), repeat)
+                print(f"{storage:<9} {shape:<7} {n:>9} {scalar * 1000:>13.2f} "
+                      f"{vector * 1000:>10.2f} {scalar / vector:>7.1f}x")
+
+
+def bench_insert_many(sizes, repeat: int):
+    """Compare a Table.insert loop with Table.insert_many (per-row and per-column validation)."""
+    print(f"{'storage':<9} {'rows':>9} {'insert loop, ms':>16} {'insert_many, ms':>16} "
+          f"{'by_column, ms':>14} {'speedup':>8}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            rows = make_rows(n)
+
+            def insert_loop():
+                table = create_table(f"ins_{storage}", storage)
+                for row in rows:
+                    table.insert(row)
+
+            loop = best_of(insert_loop, repeat)
+            batch = best_of(lambda: create_table(f"ins_{storage}", storage).insert_many(rows), repeat)
+            by_col = best_of(
+                lambda: create_table(f"ins_{storage}", storage).insert_many(rows, by_column=True), repeat)
+            print(f"{storage:<9} {n:>9} {loop * 1000:>16.2f} {batch * 1000:>16.2f} "
+                  f"{by_col * 1000:>14.2f} {loop / min(batch, by_col):>7.1f}x")
+
+
+def bench_top_k(sizes, repeat: int, k: int = 20):
+    """Compare sorting the whole result and slicing with ORDER BY ... LIMIT k (heap top-k)."""
+    print(f"{'storage':<9} {'rows':>9} {'sort + slice, ms':>17} {'limit, ms':>10} {'speedup':>8}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            table = make_table(f"topk_{storage}_{n}", n, storage)
+            query = lambda: SimpleQuery(table).where("vip", "=", False).order_by("score", ascending=False)
+            full = best_of(lambda: query().execute()[:k], repeat)
+            top = best_of(lambda: query().limit(k).execute(), repeat)
+            print(f"{storage:<9} {n:>9} {full * 1000:>17.2f} {top * 1000:>10.2f} {full / top:>7.1f}x")
+
+
+def bench_aggregate(sizes, repeat: int):
+    """Compare GROUP BY through Python rows, the hash aggregation pass, and an index."""
+    print(f"{'storage':<9} {'rows':>9} {'python loop, ms':>16} {'hash agg, ms':>13} {'index, ms':>10}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            table = make_table(f"agg_{storage}_{n}", n, storage)
+            query = lambda: (SimpleQuery(table).group_by(["city"]).aggregate("count")
+                             .aggregate("count", "city"))
+
+            def python_loop():
+                counts = {}
+                for row in SimpleQuery(table).execute():
+                    city = row["city"]
+                    count = counts.setdefault(city, [0, 0])
+                    count[0] += 1
+                    if city is not None:
+                        count[1] += 1
+                return counts
+
+            loop = best_of(python_loop, repeat)
+            hashed = best_of(lambda: query().execute(), repeat)
+            table.create_index("city")
+            indexed = best_of(lambda: query().execute(), repeat)
+            table.drop_index("city")
+            print(f"{storage:<9} {n:>9} {loop * 1000:>16.2f} {hashed * 1000:>13.2f} {indexed * 1000:>10.2f}")
+
+
+def _interpreted(table, conditions):
+    """The former per-row loop: dispatch on the operator string for every condition."""
+    results = []
+    for row in table.get_all():
+        for col, op, val in conditions:
+            r_val = row[col]
+            if op == "=" and r_val != val:
+                break
+            elif op == ">" and (r_val is None or not (r_val > val)):
+                break
+            elif op == "<" and (r_val is None or not (r_val < val)):
+                break
+        else:
+            results.append(row)
+    return results
+
+
+def bench_predicates(sizes, repeat: int):
+    """Compare an interpreted filter loop with the compiled, selectivity-ordered pipeline."""
+    conditions = [("score", ">", 100), ("vip", "=", False), ("city", "=", "city7")]
+    print(f"{'rows':>9} {'interpreted, ms':>16} {'compiled, ms':>13} {'prepared, ms':>13} {'speedup':>8}")
+    for n in sizes:
+        table = make_table(f"pred_{n}", n)
+
+        def build():
+            query = SimpleQuery(table)
+            for condition in conditions:
+                query.where(*condition)
+            return query
+
+        prepared = build().compile()
+        assert [r.id for r in prepared.execute()] == [r.id for r in _interpreted(table, conditions)]
+        interpreted = best_of(lambda: _interpreted(table, conditions), repeat)
+        compiled = best_of(lambda: build().execute(), repeat)
+        reused = best_of(prepared.execute, repeat)
+        print(f"{n:>9} {interpreted * 1000:>16.2f} {compiled * 1000:>13.2f} {reused * 1000:>13.2f} "
+              f"{interpreted / reused:>7.1f}x")
+
+
+def bench_query_cache(sizes, repeat: int, queries: int = 200, write_every: int = 20):
+    """Replay a read-mostly workload of repeated queries with and without the result cache."""
+    db = Database("BenchDB")
+    print(f"{'rows':>9} {'uncached, ms':>13} {'cached, ms':>11} {'hit rate':>9} {'speedup':>8}")
+    for n in sizes:
+        table = make_table(f"cache_{n}", n)
+        shapes = list(QUERY_SHAPES.values())
+        next_id = [n + 1]
+
+        def workload():
+            for i in range(queries):
+                if i % write_every == write_every - 1:
+                    table.insert({"id": next_id[0], "city": "city0", "score": 1, "vip": False})
+                    next_id[0] += 1
+                shapes[i % len(shapes)](table).limit(100).execute()
+
+        uncached = best_of(workload, repeat)
+        cache = db.enable_query_cache()
+        try:
+            cached = best_of(workload, repeat)
+            hit_rate = cache.stats()["hit_rate"]
+        finally:
+            db.disable_query_cache()
+        print(f"{n:>9} {uncached * 1000:>13.2f} {cached * 1000:>11.2f} {hit_rate:>8.0%} "
+              f"{uncached / cached:>7.1f}x")
+
+
+def bench_delete(sizes, repeat: int):
+    """Purge the non-VIP rows with a Table.delete loop and with one delete_where pass."""
+    print(f"{'storage':<9} {'rows':>9} {'delete loop, ms':>16} {'delete_where, ms':>17} {'vacuum, ms':>11}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            rows = make_rows(n)
+
+            def fresh():
+                table = create_table(f"del_{storage}", storage)
+                table.insert_many(rows)
+                table.create_index("score", "sorted")
+                return table
+
+            def delete_loop(table):
+                for row_id in [r.id for r in SimpleQuery(table).where("vip", "=", False).execute()]:
+                    table.delete(row_id)
+
+            loop = where = vacuum = float("inf")
+            for _ in range(repeat):
+                table = fresh()
+                start = time.perf_counter()
+                delete_loop(table)
+                loop = min(loop, time.perf_counter() - start)
+                table = fresh()
+                start = time.perf_counter()
+                table.delete_where(SimpleQuery(table).where("vip", "=", False))
+                where = min(where, time.perf_counter() - start)
+                start = time.perf_counter()
+                table.vacuum()
+                vacuum = min(vacuum, time.perf_counter() - start)
+            print(f"{storage:<9} {n:>9} {loop * 1000:>16.2f} {where * 1000:>17.2f} {vacuum * 1000:>11.2f}")
+
+
+def bench_parallel(sizes, repeat: int, worker_counts=(1, 2, 4, 8)):
+    """Scale a filter + ORDER BY and a GROUP BY across 1/2/4/8 worker processes."""
+    shapes = {
+        "filter": lambda t: (SimpleQuery(t).where("score", ">", 500).where("city", "=", "city7")
+                             .order_by("score")),
+        "group": lambda t: (SimpleQuery(t).where("vip", "=", False).group_by(["city"])
+                            .aggregate("count").aggregate("avg", "score")),
+    }
+    header = "".join(f"{f'{w} workers, ms':>15}" for w in worker_counts)
+    print(f"{'storage':<9} {'shape':<7} {'rows':>9} {'serial, ms':>11}{header}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            table = make_table(f"par_{storage}_{n}", n, storage)
+            for shape, query in shapes.items():
+                serial = best_of(lambda: query(table).execute(), repeat)
+                timings = []
+                for workers in worker_counts:
+                    query(table).parallel(workers).execute()  # start the pool, export the columns
+                    timings.append(best_of(lambda: query(table).parallel(workers).execute(), repeat))
+                cells = "".join(f"{t * 1000:>15.2f}" for t in timings)
+                print(f"{storage:<9} {shape:<7} {n:>9} {serial * 1000:>11.2f}{cells}")
+
+
+class _DictRow:
+    """The former Row layout: an instance dict holding the id and a data dict."""
+
+    def __init__(self, data):
+        self.id = data["id"]
+        self.data = data
+
+    def __getitem__(self, key):
+        return self.data.get(key)
+
+
+def _traced_bytes(build) -> int:
+    """Return the memory still allocated by build() once it has returned."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()  # still referenced while measured
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_row_layout(sizes, repeat: int):
+    """Compare memory and row['col'] access of slotted rows with per-row dicts."""
+    print(f"{'rows':>9} {'dict row, B':>12} {'slotted, B':>11} {'dict get, ms':>13} {'slotted get, ms':>16}")
+    layout = RowLayout.of(c["name"] for c in BENCH_SCHEMA["columns"])  # as a table holds it
+    for n in sizes:
+        old_bytes = _traced_bytes(lambda: [_DictRow(data) for data in make_rows(n)])
+        new_bytes = _traced_bytes(lambda: [Row(data, layout) for data in make_rows(n)])
+        old_rows = [_DictRow(data) for data in make_rows(n)]
+        new_rows = [Row(data, layout) for data in make_rows(n)]
+        old_get = best_of(lambda: [row["score"] for row in old_rows], repeat)
+        new_get = best_of(lambda: [row["score"] for row in new_rows], repeat)
+        print(f"{n:>9} {old_bytes / n:>12.0f} {new_bytes / n:>11.0f} "
+              f"{old_get * 1000:>13.2f} {new_get * 1000:>16.2f}")
+
+
+def _dictionary_table(name: str, n: int, storage: str):
+    """Like make_table, with city declared as a dictionary-encoded string column."""
+    columns = [{**c, "dictionary": True} if c["name"] == "city" else c for c in BENCH_SCHEMA["columns"]]
+    table = Database("BenchDB").create_table_with_factory(name, {"columns": columns, "storage": storage})
+    table.insert_many(make_rows(n))
+    return table
+
+
+def bench_dictionary(sizes, repeat: int):
+    """Compare plain and dictionary-encoded string columns, and LIKE 'prefix%' with a sorted index."""
+    print(f"{'storage':<9} {'rows':>9} {'plain, B':>9} {'dict, B':>8} {'= plain, ms':>12} {'= dict, ms':>11} "
+          f"{'like plain, ms':>15} {'like dict, ms':>14} {'like index, ms':>15}")
+    for storage in ("row", "columnar"):
+        for n in sizes:
+            plain_bytes = _traced_bytes(lambda: make_table(f"plain_{storage}_{n}", n, storage))
+            dict_bytes = _traced_bytes(lambda: _dictionary_table(f"dict_{storage}_{n}", n, storage))
+            plain = make_table(f"plain_{storage}_{n}", n, storage)
+            encoded = _dictionary_table(f"dict_{storage}_{n}", n, storage)
+            equal = lambda t: SimpleQuery(t).where("city", "=", "city7").execute()
+            like = lambda t: SimpleQuery(t).where("city", "like", "city7%").execute()
+            eq_plain, eq_dict = best_of(lambda: equal(plain), repeat), best_of(lambda: equal(encoded), repeat)
+            like_plain, like_dict = best_of(lambda: like(plain), repeat), best_of(lambda: like(encoded), repeat)
+            encoded.create_index("city", "sorted")
+            like_index = best_of(lambda: like(encoded), repeat)
+            encoded.drop_index("city")
+            print(f"{storage:<9} {n:>9} {plain_bytes / n:>9.0f} {dict_bytes / n:>8.0f} {eq_plain * 1000:>12.2f} "
+                  f"{eq_dict * 1000:>11.2f} {like_plain * 1000:>15.2f} {like_dict * 1000:>14.2f} "
+                  f"{like_index * 1000:>15.2f}")
+
+
+def _start_server():
+    """Run server.py in a child process; return the process and its port."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, script, "--port", "0", "--name", "BenchDB"],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # "MiniDB server listening on host:port"
+    return process, int(line.rsplit(":", 1)[1])
+
+
+def bench_server(sizes, repeat: int, client_counts=(1, 16, 64), requests: int = 2_000):
+    """Compare primary-key lookups in process with the same lookups from concurrent clients of server.py."""
+    header = "".join(f"{f'{c} clients, req/s':>18}" for c in client_counts)
+    print(f"{'rows':>9} {'in-process, req/s':>18}{header}")
+    process, port = _start_server()
+    try:
+        for n in sizes:
+            table = make_table(f"srv_{n}", n)
+            keys = random.Random(0).choices(range(1, n + 1), k=requests)
+            local = best_of(lambda: [SimpleQuery(table).where("id", "=", k).execute() for k in keys], repeat)
+
+            async def remote() -> list:
+                async with await Client.connect("127.0.0.1", port) as client:
+                    await client.create_table(table.name, BENCH_SCHEMA)
+                    rows = make_rows(n)
+                    for i in range(0, n, 10_000):
+                        await client.insert_many(table.name, rows[i:i + 10_000])
+
+                    async def lookups(part):
+                        for k in part:
+                            await client.query(table.name).where("id", "=", k).execute()
+
+                    timings = []
+                    for clients in client_counts:
+                        best = float("inf")
+                        for _ in range(repeat):
+                            start = time.perf_counter()
+                            await asyncio.gather(*(lookups(keys[c::clients]) for c in range(clients)))
+                            best = min(best, time.perf_counter() - start)
+                        timings.append(best)
+                    return timings
+
+            cells = "".join(f"{requests / t:>18.0f}" for t in asyncio.run(remote()))
+            print(f"{n:>9} {requests / local:>18.0f}{cells}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+BENCHMARKS = {
+    "vectorized": bench_vectorized,
+    "insert_many": bench_insert_many,
+    "top_k": bench_top_k,
+    "aggregate": bench_aggregate,
+    "predicates": bench_predicates,
+    "query_cache": bench_query_cache,
+    "delete": bench_delete,
+    "parallel": bench_parallel,
+    "row_layout": bench_row_layout,
+    "dictionary": bench_dictionary,
+    "server": bench_server,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MiniDB benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    for name in args.names or BENCHMARKS:
+        print(f"\n== {name} ==")
+        BENCHMARKS[name](args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+# ---------- Query result cache ----------
+
+def estimate_size(result: List[Any]) -> int:
+    """
+    Approximate the memory held by a query result.
+
+    Sizes a sample of up to 16 rows (Row objects or dicts) and extrapolates;
+    values shared with table storage are counted as if they were copies.
+    """
+    size = sys.getsizeof(result)
+    sample = result[:16]
+    if not sample:
+        return size
+    total = 0
+    for item in sample:
+        values = item.values() if isinstance(item, dict) else item.values
+        total += sys.getsizeof(item) + sum(sys.getsizeof(v) for v in values)
+        if not isinstance(item, dict):
+            total += sys.getsizeof(values)
+    return size + total * len(result) // len(sample)
+
+
+class QueryCache:
+    """LRU cache of query results, invalidated through table version counters.
+
+    An entry remembers the tables it was computed from and their versions;
+    Table bumps its version on every insert, update and delete, so a lookup
+    after any write to one of those tables is a miss and drops the entry.
+    Callers take the versions (see versions) before computing a result and
+    store it under them, so a write committed meanwhile leaves it stale.
+    Tables are held through weak references, so a cached entry does not keep
+    a dropped or replaced table alive.
+
+    Args:
+        max_entries (int): Maximum number of cached results.
+        max_bytes (int | None): Approximate bound on the memory of cached
+            results (see estimate_size); larger results are not cached.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple[tuple, List[Any], int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()  # readers may run queries from several threads
+
+    @staticmethod
+    def versions(tables: Iterable[Any]) -> tuple:
+        """Return the current versions of the given tables, to pass to put."""
+        # A dead reference equals only itself, so a new table at a reused
+        # address never matches an entry of the old one.
+        return tuple((weakref.ref(table), table.version) for table in tables)
+
+    def get(self, key: Hashable, tables: Iterable[Any]) -> Optional[List[Any]]:
+        """
+        Return the cached result for a query key, or None (counted as a miss).
+
+        Args:
+            key (Hashable): Normalised query.
+            tables (Iterable[Table]): The tables the query reads now; a table
+                replaced by another object of the same name is a miss too.
+        """
+        versions = self.versions(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != versions:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, versions: tuple, result: List[Any]):
+        """
+        Store a result computed from tables at the given versions.
+
+        Args:
+            key (Hashable): Normalised query.
+            versions (tuple): versions() of the tables, taken before the
+                result was computed.
+            result (List): The query result.
+        """
+        size = estimate_size(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (versions, result, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or \
+                    (self.max_bytes is not None and self.bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        """Drop every entry (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size, for tuning the bounds."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,5 +1,7 @@
 from datetime import date
-from typing import Any, Optional
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional
 
 # ---------- DataType base class and subclasses ----------
 
@@ -10,6 +12,10 @@ class DataType:
         """Check if a value is valid for this type."""
         raise NotImplementedError("Method 'validate' must be implemented")
 
+    def validate_many(self, values: List[Any]) -> bool:
+        """Check a whole batch of values; subclasses may check the distinct types only."""
+        return all(map(self.validate, values))
+
     def __str__(self):
         return self.__class__.__name__
 
@@ -20,12 +26,23 @@ class IntegerType(DataType):
     def validate(self, value: Any) -> bool:
         return isinstance(value, int) or value is None
 
+    def validate_many(self, values: List[Any]) -> bool:
+        return _all_of_types(values, (int, type(None)))
+
 
 class StringType(DataType):
-    """String data type with optional max length."""
+    """String data type with optional max length.
+
+    Args:
+        max_length (int | None): Longest allowed value.
+        dictionary (bool): Dictionary-encode the column: storage keeps each
+            distinct string once, and columnar tables store integer codes.
+            Meant for low-cardinality columns such as statuses or cities.
+    """
 
-    def __init__(self, max_length: Optional[int] = None):
+    def __init__(self, max_length: Optional[int] = None, dictionary: bool = False):
         self.max_length = max_length
+        self.dictionary = dictionary
 
     def validate(self, value: Any) -> bool:
         if value is None:
@@ -36,6 +53,13 @@ class StringType(DataType):
             return False
         return True
 
+    def validate_many(self, values: List[Any]) -> bool:
+        if not _all_of_types(values, (str, type(None))):
+            return False
+        if self.max_length:
+            return all(len(v) <= self.max_length for v in values if v is not None)
+        return True
+
 
 class BooleanType(DataType):
     """Boolean data type."""
@@ -43,6 +67,9 @@ class BooleanType(DataType):
     def validate(self, value: Any) -> bool:
         return isinstance(value, bool) or value is None
 
+    def validate_many(self, values: List[Any]) -> bool:
+        return _all_of_types(values, (bool, type(None)))
+
 
 class DateType(DataType):
     """Date data type."""
@@ -50,6 +77,14 @@ class DateType(DataType):
     def validate(self, value: Any) -> bool:
         return isinstance(value, date) or value is None
 
+    def validate_many(self, values: List[Any]) -> bool:
+        return _all_of_types(values, (date, type(None)))
+
+
+def _all_of_types(values: List[Any], allowed: tuple) -> bool:
+    """Check isinstance against each distinct type of the batch instead of each value."""
+    return all(issubclass(t, allowed) for t in set(map(type, values)))
+
 
 # ---------- Column class ----------
 
@@ -76,6 +111,12 @@ class Column:
             return False
         return self.data_type.validate(value)
 
+    def validate_many(self, values: List[Any]) -> bool:
+        """Check a batch of values for this column at once."""
+        if not self.nullable and None in values:
+            return False
+        return self.data_type.validate_many(values)
+
     def __repr__(self):
         fk = f", FK={self.foreign_key}" if self.foreign_key else ""
         pk = ", PK" if self.primary_key else ""
@@ -84,38 +125,191 @@ class Column:
 
 # ---------- Row class ----------
 
+class RowLayout:
+    """Column name -> position map shared by every row with the same columns.
+
+    A table holds one layout for its columns and stores every row over it,
+    so rows hold one reference to a common layout plus a tuple of values
+    instead of a dict of their own. Layouts are not interned: a layout is
+    shared by passing it around and lives as long as its holder.
+
+    A row that was given only some of the columns uses a variant of the
+    layout (see without): same keys and slots, the other columns holding
+    None, and ``absent`` naming them so that the row reads as if they were
+    never set ("in", get and data skip them).
+    """
+
+    __slots__ = ("keys", "slots", "absent", "base", "_extended", "_variants")
+
+    def __init__(self, keys: tuple, absent: frozenset = frozenset(), base: Optional["RowLayout"] = None):
+        self.keys = keys
+        self.slots = base.slots if base is not None else {key: i for i, key in enumerate(keys)}
+        self.absent = absent
+        self.base = base if base is not None else self  # the layout every variant shares slots with
+        self._extended: dict[str, "RowLayout"] = {}
+        self._variants: dict[frozenset, "RowLayout"] = {}
+
+    @staticmethod
+    def of(keys) -> "RowLayout":
+        """Return a new layout for a sequence of column names."""
+        return RowLayout(tuple(keys))
+
+    def without(self, absent: frozenset) -> "RowLayout":
+        """Return the variant of this layout whose rows lack the given columns."""
+        base = self.base
+        if not absent:
+            return base
+        layout = base._variants.get(absent)
+        if layout is None:
+            layout = base._variants[absent] = RowLayout(base.keys, absent, base)
+        return layout
+
+    def extended(self, key: str) -> "RowLayout":
+        """Return the layout with one more column at the end."""
+        base = self.base
+        layout = base._extended.get(key)
+        if layout is None:
+            layout = base._extended[key] = RowLayout.of(base.keys + (key,))
+        return layout.without(self.absent)
+
+    def reader(self, columns: List[str]) -> Callable[[tuple], tuple]:
+        """Return a function picking the given columns out of a values tuple of this layout.
+
+        Columns the layout lacks read as None.
+        """
+        slots = [self.slots.get(column) for column in columns]
+        if None in slots:
+            return lambda values: tuple(None if s is None else values[s] for s in slots)
+        if len(slots) == 1:
+            slot = slots[0]
+            return lambda values: (values[slot],)
+        return itemgetter(*slots)
+
+    def __repr__(self):
+        if self.absent:
+            return f"RowLayout{self.keys} without {sorted(self.absent)}"
+        return f"RowLayout{self.keys}"
+
+
 class Row:
-    """Represents a table row with unique id."""
+    """Represents a table row with unique id.
+
+    Values live in a tuple aligned with a shared RowLayout, so a row costs
+    a small fixed-size object rather than an instance dict plus a data dict.
+    """
+
+    __slots__ = ("id", "layout", "values")
 
     _id_counter = 1
 
-    def __init__(self, data: dict[str, Any]):
+    def __init__(self, data: dict[str, Any], layout: Optional[RowLayout] = None):
+        """
+        Build a row from a column-value mapping.
+
+        Args:
+            data (dict): Column values; an "id" entry also gives the row id.
+            layout (RowLayout): Layout to store the row over (e.g. its
+                table's); its columns missing from data hold None and stay
+                unset (see RowLayout.without), and columns it lacks extend
+                it. By default the row gets a layout of its own, in data's
+                key order.
+        """
         if "id" in data:
             self.id = data["id"]
         else:
             self.id = Row._id_counter
             Row._id_counter += 1
-        self.data = data
+        if layout is None:
+            self.layout = RowLayout.of(data)
+            self.values = tuple(data.values())
+        else:
+            self._align(data, layout)
+
+    def _align(self, data, layout: RowLayout):
+        keys, slots = data.keys(), layout.slots
+        self.values = tuple(map(data.get, layout.keys))
+        if keys >= slots.keys():
+            self.layout = layout.base
+        else:
+            self.layout = layout.without(frozenset(key for key in layout.keys if key not in keys))
+        if not keys <= slots.keys():
+            for key in [key for key in data if key not in slots]:
+                self[key] = data[key]
+
+    def conformed(self, layout: RowLayout) -> "Row":
+        """Return this row stored over a layout (itself if it already is), as Row(data, layout) does."""
+        if self.layout.base is layout:
+            return self
+        row = Row.__new__(Row)  # keep the id
+        row.id = self.id
+        row._align(self.data, layout)
+        return row
+
+    @staticmethod
+    def make(row_id: int, layout: RowLayout, values: tuple) -> "Row":
+        """Build a row from values already aligned with a layout (no copying)."""
+        row = Row.__new__(Row)  # skip __init__
+        row.id = row_id
+        row.layout = layout
+        row.values = values
+        return row
 
     def __getitem__(self, key):
         """Access value by column name: row['name']."""
-        return self.data.get(key)
+        try:
+            return self.values[self.layout.slots[key]]
+        except KeyError:
+            return None
+
+    def get(self, key, default=None):
+        """Return the value of a column, or default when the row has no such column."""
+        try:
+            value = self.values[self.layout.slots[key]]
+        except KeyError:
+            return default
+        if value is None and key in self.layout.absent:
+            return default
+        return value
 
     def __setitem__(self, key, value):
-        self.data[key] = value
+        layout = self.layout
+        slot = layout.slots.get(key)
+        if slot is None:
+            self.layout = layout.extended(key)
+            self.values += (value,)
+        else:
+            self.values = self.values[:slot] + (value,) + self.values[slot + 1:]
+            if key in layout.absent:
+                self.layout = layout.without(layout.absent - {key})
+
+    def __contains__(self, key):
+        return key in self.layout.slots and key not in self.layout.absent
+
+    def _as_dict(self) -> dict[str, Any]:
+        absent = self.layout.absent
+        if absent:
+            return {key: value for key, value in zip(self.layout.keys, self.values) if key not in absent}
+        return dict(zip(self.layout.keys, self.values))
+
+    @property
+    def data(self) -> Mapping[str, Any]:
+        """Read-only column-value mapping of the row (write through row[key] = value).
+
+        Assigning to it raises TypeError.
+        """
+        return MappingProxyType(self._as_dict())
 
     def __repr__(self):
-        return f"Row(id={self.id}, data={self.data})"
+        return f"Row(id={self.id}, data={self._as_dict()})"
 
     def to_dict(self):
         """Return a dictionary for JSON serialization."""
-        return {"id": self.id, "data": self.data}
+        return {"id": self.id, "data": self._as_dict()}
 
     @staticmethod
     def from_dict(d: dict[str, Any]):
         """Create a Row object from a dictionary."""
-        row = Row.__new__(Row)  # skip __init__
-        row.id = int(d["id"])
-        row.data = d["data"]
+        data = d["data"]
+        row = Row.make(int(d["id"]), RowLayout.of(data), tuple(data.values()))
         Row._id_counter = max(Row._id_counter, row.id + 1)
         return row
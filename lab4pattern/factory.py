@@ -1,6 +1,29 @@
 import json
-from typing import Dict, Any
-from datatypes import Column, IntegerType, StringType, BooleanType, DateType
+import os
+import threading
+from datetime import date
+from typing import Dict, Any, Iterator, Optional, TextIO
+from datatypes import Column, Row, IntegerType, StringType, BooleanType, DateType
+from wal import WriteAheadLog, replace_atomically
+from snapshot import is_snapshot, map_snapshot, write_snapshot
+from cache import QueryCache
+
+TYPE_REGISTRY = {
+    "IntegerType": IntegerType,
+    "StringType": StringType,
+    "BooleanType": BooleanType,
+    "DateType": DateType,
+}
+
+NDJSON_FORMAT = "minidb-ndjson"
+
+
+def _json_default(value: Any):
+    """Encode values json does not handle natively (dates as ISO strings)."""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
 
 class Database:
     """Singleton database with Factory Method to create tables."""
@@ -33,6 +56,15 @@ class Database:
             return
         self.name = name
         self.tables: Dict[str, Any] = {}
+        # table name -> column name -> {value: number of rows holding it}
+        self._fk_indexes: Dict[str, Dict[str, Dict[Any, int]]] = {}
+        self._wal: Optional[WriteAheadLog] = None
+        self._snapshot_path: Optional[str] = None
+        self.checkpoint_every: Optional[int] = None
+        self._lsn = 0  # sequence number of the last logged change
+        self._mapping = None  # mmap behind tables opened from a binary snapshot
+        self.query_cache: Optional[QueryCache] = None  # opt-in, see enable_query_cache
+        self._write_lock = threading.RLock()  # one writer at a time, see Table.snapshot
         self._initialized = True
 
     # ---- Factory Method ----
@@ -42,7 +74,8 @@ class Database:
 
         Args:
             name (str): Table name.
-            schema (dict): Table schema with column definitions.
+            schema (dict): Table schema with column definitions and an
+                optional "storage" kind ("row" or "columnar").
 
         Returns:
             Table: Created table instance.
@@ -61,9 +94,13 @@ class Database:
             )
             columns.append(column)
 
-        table = Table(name, columns)
+        table = Table(name, columns, storage=schema.get("storage", "row"))
         self._validate_foreign_keys(table)
+        if self._wal is not None:
+            self._append_record(table, "create_table", {"schema": table.schema_dict()})
         self.tables[name] = table
+        self._register_fk_indexes(table)
+        self._checkpoint_if_due()
         return table
 
     def _get_data_type(self, col_type: str, col_schema: dict):
@@ -71,7 +108,7 @@ class Database:
         if col_type in ("int", "integer"):
             return IntegerType()
         elif col_type in ("string", "text"):
-            return StringType(col_schema.get("max_length"))
+            return StringType(col_schema.get("max_length"), col_schema.get("dictionary", False))
         elif col_type == "bool":
             return BooleanType()
         elif col_type == "date":
@@ -84,11 +121,96 @@ class Database:
         for column in table.columns.values():
             if column.foreign_key:
                 ref_table, ref_column = column.foreign_key
-                if ref_table not in self.tables:
+                target = table if ref_table == table.name else self.tables.get(ref_table)
+                if target is None:
                     raise ValueError(f"Foreign key error: table '{ref_table}' not found.")
-                if ref_column not in self.tables[ref_table].columns:
+                if ref_column not in target.columns:
                     raise ValueError(f"Foreign key error: column '{ref_column}' not found in '{ref_table}'.")
 
+    # ---- Foreign key indexes ----
+    def _register_fk_indexes(self, table):
+        """
+        Maintain value indexes for the columns referenced by ``table``'s foreign keys.
+
+        Indexes already kept for ``table`` itself are rebuilt, since the table
+        may have replaced an older one with the same name.
+        """
+        for column in list(self._fk_indexes.get(table.name, {})):
+            self._build_fk_index(table.name, column)
+        for column in table.columns.values():
+            if column.foreign_key:
+                ref_table, ref_column = column.foreign_key
+                if ref_column not in self._fk_indexes.get(ref_table, {}):
+                    self._build_fk_index(ref_table, ref_column)
+
+    def _build_fk_index(self, table_name: str, column: str) -> Dict[Any, int]:
+        """Build the value index for a referenced column from the table's rows."""
+        index: Dict[Any, int] = {}
+        for value in self.get_table(table_name).column_values(column):
+            index[value] = index.get(value, 0) + 1
+        self._fk_indexes.setdefault(table_name, {})[column] = index
+        return index
+
+    def has_reference(self, table_name: str, column: str, value: Any) -> bool:
+        """
+        Check whether a referenced column contains a value.
+
+        Args:
+            table_name (str): Referenced table name.
+            column (str): Referenced column name.
+            value (Any): Value to look up.
+
+        Returns:
+            bool: True if at least one row of the table holds the value.
+
+        Raises:
+            ValueError: If the table does not exist.
+        """
+        index = self._fk_indexes.get(table_name, {}).get(column)
+        if index is None:
+            index = self._build_fk_index(table_name, column)
+        return value in index
+
+    def _tracked_columns(self, table) -> Dict[str, Dict[Any, int]]:
+        """Return the FK value indexes kept for a registered table."""
+        if self.tables.get(table.name) is not table:
+            return {}
+        return self._fk_indexes.get(table.name, {})
+
+    def _on_insert(self, table, row):
+        """Add a newly inserted row to the FK value indexes."""
+        for column, index in self._tracked_columns(table).items():
+            value = row[column]
+            index[value] = index.get(value, 0) + 1
+
+    def _on_insert_many(self, table, rows):
+        """Add a batch of inserted rows to the FK value indexes."""
+        for column, index in self._tracked_columns(table).items():
+            for row in rows:
+                value = row[column]
+                index[value] = index.get(value, 0) + 1
+
+    def _on_delete(self, table, row):
+        """Remove a deleted row from the FK value indexes."""
+        for column, index in self._tracked_columns(table).items():
+            self._decrement(index, row[column])
+
+    def _on_update(self, table, column: str, old_value: Any, new_value: Any):
+        """Move one row between values of a tracked column."""
+        index = self._tracked_columns(table).get(column)
+        if index is None:
+            return
+        self._decrement(index, old_value)
+        index[new_value] = index.get(new_value, 0) + 1
+
+    @staticmethod
+    def _decrement(index: Dict[Any, int], value: Any):
+        count = index.get(value, 0)
+        if count <= 1:
+            index.pop(value, None)
+        else:
+            index[value] = count - 1
+
     def get_table(self, name: str):
         """
         Retrieve a table by name.
@@ -110,6 +232,9 @@ class Database:
         """
         Save the entire database to a JSON file.
 
+        The file is replaced atomically, so a crash mid-write leaves the
+        previous version intact.
+
         Args:
             filepath (str): Path to JSON file.
         """
@@ -117,30 +242,326 @@ class Database:
             "name": self.name,
             "tables": [t.to_dict() for t in self.tables.values()],
         }
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(db_data, f, indent=4, ensure_ascii=False)
+        replace_atomically(filepath, lambda f: json.dump(db_data, f, indent=4, ensure_ascii=False))
 
     def load_from_json(self, filepath: str):
         """
-        Load database from a JSON file.
+        Load database from a JSON or NDJSON file, then replay its write-ahead
+        log (``<filepath>.wal``) if one exists.
+
+        Any attached write-ahead log is detached first.
 
         Args:
             filepath (str): Path to JSON file.
         """
+        self.detach_wal()
+        wal_path = f"{filepath}.wal"
+        if os.path.exists(filepath) or not os.path.exists(wal_path):
+            self._load_snapshot(filepath)
+        else:
+            # Never checkpointed: the log alone holds the whole history.
+            self.tables.clear()
+            self._fk_indexes.clear()
+            self._lsn = 0
+        self._replay(wal_path)
+
+    def _load_snapshot(self, filepath: str):
         from table import Table
+        if is_snapshot(filepath):
+            self._open_binary(filepath)
+            return
         with open(filepath, "r", encoding="utf-8") as f:
+            if self._is_ndjson(f.readline()):
+                f.seek(0)
+                self._load_ndjson_stream(f)
+                return
+            f.seek(0)
             db_data = json.load(f)
         self.name = db_data["name"]
         self.tables.clear()
-        type_registry = {
-            "IntegerType": IntegerType,
-            "StringType": StringType,
-            "BooleanType": BooleanType,
-            "DateType": DateType,
-        }
         for tdict in db_data["tables"]:
-            table = Table.from_dict(tdict, type_registry)
+            table = Table.from_dict(tdict, TYPE_REGISTRY)
             self.tables[table.name] = table
+        self._lsn = 0
+        self._reset_fk_indexes()
+
+    # ---- Streaming persistence ----
+    def save_to_ndjson(self, filepath: str):
+        """
+        Save the database as newline-delimited JSON, one table and one row at a time.
+
+        Layout: a header line, then for each table a schema line with its row
+        count followed by one compact line per row. Memory use does not depend
+        on the database size.
+
+        Args:
+            filepath (str): Path to the output file.
+        """
+        replace_atomically(filepath, self._write_ndjson)
+
+    def _write_ndjson(self, f: TextIO):
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"),
+                                 default=_json_default).encode
+        header = {"format": NDJSON_FORMAT, "version": 1, "name": self.name, "lsn": self._lsn}
+        f.write(dumps(header) + "\n")
+        for table in self.tables.values():
+            rows = table.get_all()
+            f.write(dumps({"table": table.schema_dict(), "rows": len(rows)}) + "\n")
+            for row in rows:
+                f.write(dumps(row.to_dict()) + "\n")
+
+    def load_from_ndjson(self, filepath: str):
+        """
+        Load a database saved by save_to_ndjson, streaming rows into tables.
+
+        Args:
+            filepath (str): Path to the NDJSON file.
+
+        Raises:
+            ValueError: If the file is not in the NDJSON snapshot format.
+        """
+        with open(filepath, "r", encoding="utf-8") as f:
+            self._load_ndjson_stream(f)
+
+    @staticmethod
+    def _is_ndjson(first_line: str) -> bool:
+        try:
+            header = json.loads(first_line)
+        except ValueError:
+            return False
+        return isinstance(header, dict) and header.get("format") == NDJSON_FORMAT
+
+    def _load_ndjson_stream(self, f: TextIO):
+        from table import Table
+        header = f.readline()
+        if not self._is_ndjson(header):
+            raise ValueError("Not a MiniDB NDJSON file")
+        header = json.loads(header)
+        self.name = header["name"]
+        self._lsn = header.get("lsn", 0)
+        self.tables.clear()
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            table = Table.from_schema(entry["table"], TYPE_REGISTRY)
+            table.load_rows(self._read_rows(f, entry["rows"], table))
+            self.tables[table.name] = table
+        self._reset_fk_indexes()
+
+    @staticmethod
+    def _read_rows(f: TextIO, count: int, table) -> Iterator[Row]:
+        """Yield the next ``count`` rows of a table, decoding ISO dates."""
+        date_columns = [c.name for c in table.columns.values() if isinstance(c.data_type, DateType)]
+        for _ in range(count):
+            row_dict = json.loads(f.readline())
+            Database._decode_dates(row_dict["data"], date_columns)
+            yield Row.from_dict(row_dict)
+
+    @staticmethod
+    def _decode_dates(data: dict, date_columns):
+        """Turn ISO strings back into dates, in place."""
+        for name in date_columns:
+            value = data.get(name)
+            if value is not None:
+                data[name] = date.fromisoformat(value)
+
+    def _reset_fk_indexes(self):
+        """Drop every FK value index after tables were replaced wholesale.
+
+        has_reference() rebuilds each one from its table on first use.
+        """
+        self._fk_indexes.clear()
+
+    # ---- Binary snapshots ----
+    def save_snapshot(self, filepath: str):
+        """
+        Save the database in the binary snapshot format (see snapshot.py).
+
+        Integers, booleans and dates are stored as fixed-width arrays and
+        strings as offset-indexed UTF-8, so the file can be read in place.
+
+        Args:
+            filepath (str): Path to the snapshot file.
+
+        Raises:
+            ValueError: If an integer does not fit in 64 bits.
+        """
+        replace_atomically(filepath, lambda f: write_snapshot(self, f), binary=True)
+
+    def open_snapshot(self, filepath: str):
+        """
+        Open a binary snapshot with mmap instead of deserializing it.
+
+        Tables become readable at once; rows are decoded when read, and
+        get_by_id bisects the mapped id array. A table is copied into memory on
+        its first write. Indexes are built on first use. Any attached
+        write-ahead log is detached.
+
+        Args:
+            filepath (str): Path to the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a binary snapshot.
+        """
+        self.detach_wal()
+        self._open_binary(filepath)
+
+    def _open_binary(self, filepath: str):
+        mapping, name, lsn, tables = map_snapshot(filepath)
+        self.name = name
+        self._lsn = lsn
+        self.tables.clear()
+        self.tables.update(tables)
+        self._reset_fk_indexes()
+        self._mapping = mapping
+
+    # ---- Snapshots ----
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Take read-only snapshots of every table at one point in time.
+
+        Reader threads query the snapshots while writers keep changing the
+        tables; no writer commits in between, so joins across the returned
+        tables are consistent too.
+
+        Returns:
+            Dict[str, Table]: Table name -> snapshot (see Table.snapshot).
+        """
+        with self._write_lock:
+            return {name: table.snapshot() for name, table in self.tables.items()}
+
+    # ---- Query result cache ----
+    def enable_query_cache(self, max_entries: int = 256, max_bytes: Optional[int] = None) -> QueryCache:
+        """
+        Cache the results of SimpleQuery.execute and JoinedTable.execute.
+
+        Entries are keyed on the normalised query and dropped once one of
+        the tables they read changes.
+
+        Args:
+            max_entries (int): Maximum number of cached results (LRU).
+            max_bytes (int | None): Approximate memory bound for the results.
+
+        Returns:
+            QueryCache: The cache; its stats() reports hits and misses.
+        """
+        self.query_cache = QueryCache(max_entries, max_bytes)
+        return self.query_cache
+
+    def disable_query_cache(self):
+        """Stop caching query results and drop the cached ones."""
+        self.query_cache = None
+
+    # ---- Write-ahead log ----
+    def attach_wal(self, filepath: str, checkpoint_every: Optional[int] = 10_000, sync: bool = True):
+        """
+        Make every later change durable by logging it before applying it.
+
+        Writes a checkpoint of the current state to ``filepath`` (NDJSON) and
+        starts an empty log at ``<filepath>.wal``. Each insert, update, delete,
+        table and index creation then appends one record to the log, so a
+        commit costs one small write regardless of database size.
+        load_from_json(filepath) restores the snapshot and replays the log.
+
+        Args:
+            filepath (str): Snapshot path.
+            checkpoint_every (int | None): Checkpoint automatically after this
+                many logged changes; None disables automatic checkpoints.
+            sync (bool): fsync the log after every record.
+        """
+        self.detach_wal()
+        self._snapshot_path = filepath
+        self.checkpoint_every = checkpoint_every
+        self._wal = WriteAheadLog(f"{filepath}.wal", sync=sync, default=_json_default)
+        self.checkpoint()
+
+    def detach_wal(self):
+        """Stop logging changes (the log and snapshot files are kept)."""
+        if self._wal is not None:
+            self._wal.close()
+        self._wal = None
+        self._snapshot_path = None
+
+    def checkpoint(self):
+        """
+        Compact the log: atomically rewrite the snapshot, then empty the log.
+
+        The snapshot records the last log sequence number it contains, so a
+        crash between the two steps only leaves records that replay skips.
+
+        Raises:
+            ValueError: If no write-ahead log is attached.
+        """
+        if self._wal is None:
+            raise ValueError("No write-ahead log attached")
+        replace_atomically(self._snapshot_path, self._write_ndjson, sync=self._wal.sync)
+        self._wal.truncate()
+
+    def _is_logged(self, table) -> bool:
+        """Check whether changes of a table go to an attached write-ahead log."""
+        return self._wal is not None and self.tables.get(table.name) is table
+
+    def _log_change(self, table, op: str, **fields):
+        """
+        Append a change of a registered table to the attached log, if any.
+
+        Called before the change is applied to memory (write-ahead): a change
+        that cannot be logged is not made. If applying it fails afterwards,
+        _retract_change takes the record back.
+        """
+        if self._is_logged(table):
+            self._append_record(table, op, fields)
+
+    def _append_record(self, table, op: str, fields: dict):
+        self._wal.append({"lsn": self._lsn + 1, "op": op, "table": table.name, **fields})
+        self._lsn += 1
+
+    def _retract_change(self, table):
+        """Drop the record just logged for a change of a table that could not be applied."""
+        if self._is_logged(table):
+            self._wal.retract()
+            self._lsn -= 1
+
+    def _checkpoint_if_due(self):
+        """Checkpoint once enough changes are logged; called after a write has been applied."""
+        if self._wal is not None and self.checkpoint_every and self._wal.count >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _replay(self, wal_path: str):
+        """Apply the log records newer than the loaded snapshot."""
+        from table import Table
+        for record in WriteAheadLog.read(wal_path):
+            if record["lsn"] <= self._lsn:
+                continue
+            op = record["op"]
+            if op == "create_table":
+                table = Table.from_schema(record["schema"], TYPE_REGISTRY)
+                self.tables[table.name] = table
+                self._register_fk_indexes(table)
+            else:
+                table = self.get_table(record["table"])
+                date_columns = [c.name for c in table.columns.values()
+                                if isinstance(c.data_type, DateType)]
+                if op in ("insert", "insert_many"):
+                    for row_dict in record["rows"] if op == "insert_many" else [record["row"]]:
+                        self._decode_dates(row_dict["data"], date_columns)
+                        table._restore_row(Row.from_dict(row_dict))
+                elif op == "update":
+                    self._decode_dates(record["data"], date_columns)
+                    table.update(record["id"], record["data"])
+                elif op == "delete":
+                    table.delete(record["id"])
+                elif op == "delete_many":
+                    table._delete_rows([row for row in map(table.get_by_id, record["ids"]) if row])
+                elif op == "create_index":
+                    table.create_index(record["column"], record["kind"])
+                elif op == "drop_index":
+                    table.drop_index(record["column"], record["kind"])
+            self._lsn = record["lsn"]
 
     def __repr__(self):
         """Return a string representation of the database."""
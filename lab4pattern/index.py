@@ -0,0 +1,220 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+from aggregate import run_lengths
+
+# ---------- Prefix patterns ----------
+
+LIKE_OPERATORS = ("like", "startswith")
+
+
+def like_prefix(operator: str, pattern: str) -> Optional[str]:
+    """
+    Return the literal prefix a pattern condition stands for, if any.
+
+    'startswith' takes the prefix itself; a LIKE pattern qualifies when its
+    only wildcards are trailing '%' (e.g. 'abc%'). Other patterns return None.
+    """
+    if operator == "startswith":
+        return pattern
+    if operator == "like" and pattern.endswith("%"):
+        prefix = pattern.rstrip("%")
+        if "%" not in prefix and "_" not in prefix:
+            return prefix
+    return None
+
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with prefix, or None if there is none."""
+    while prefix and prefix[-1] == "\U0010ffff":
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# ---------- Secondary indexes ----------
+
+class HashIndex:
+    """Hash index on one column: answers '=' lookups."""
+
+    kind = "hash"
+
+    def __init__(self, column: str):
+        self.column = column
+        self._buckets: Dict[Any, Dict[int, None]] = {}
+
+    def add(self, value: Any, row_id: int):
+        """Register a row id under a value."""
+        self._buckets.setdefault(value, {})[row_id] = None
+
+    def add_many(self, pairs: Iterable[tuple[Any, int]]):
+        """Register many (value, row id) pairs."""
+        for value, row_id in pairs:
+            self.add(value, row_id)
+
+    def remove(self, value: Any, row_id: int):
+        """Forget a row id registered under a value."""
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            return
+        bucket.pop(row_id, None)
+        if not bucket:
+            del self._buckets[value]
+
+    def remove_many(self, pairs: Iterable[tuple[Any, int]]):
+        """Forget many (value, row id) pairs."""
+        for value, row_id in pairs:
+            self.remove(value, row_id)
+
+    def estimate(self, operator: str, value: Any) -> Optional[int]:
+        """Return the number of matching rows, or None if the operator is unsupported."""
+        if operator != "=":
+            return None
+        return len(self._buckets.get(value, ()))
+
+    def search(self, operator: str, value: Any) -> Iterable[int]:
+        """Return ids of rows matching ``column <operator> value``."""
+        return list(self._buckets.get(value, ()))
+
+    def value_counts(self) -> Iterable[tuple[Any, int]]:
+        """Yield (value, number of rows) for every indexed value, None included."""
+        return ((value, len(bucket)) for value, bucket in self._buckets.items())
+
+    def __len__(self):
+        return sum(len(b) for b in self._buckets.values())
+
+    def __repr__(self):
+        return f"HashIndex({self.column})"
+
+
+class SortedIndex:
+    """Sorted index on one column: answers '=', '>' and '<' lookups, and on
+    string columns prefix lookups (startswith, LIKE 'abc%') as a key range.
+
+    Non-null values are kept in a sorted list with a parallel list of row ids.
+    Rows holding None are tracked separately, as None never matches '>' or '<'.
+    """
+
+    kind = "sorted"
+
+    def __init__(self, column: str):
+        self.column = column
+        self._keys: List[Any] = []
+        self._ids: List[int] = []
+        self._nulls: Dict[int, None] = {}
+
+    def add(self, value: Any, row_id: int):
+        """Register a row id under a value."""
+        if value is None:
+            self._nulls[row_id] = None
+            return
+        pos = bisect_right(self._keys, value)
+        self._keys.insert(pos, value)
+        self._ids.insert(pos, row_id)
+
+    def add_many(self, pairs: Iterable[tuple[Any, int]]):
+        """Register many (value, row id) pairs with one sort instead of one insert each."""
+        merged = list(zip(self._keys, self._ids))
+        for value, row_id in pairs:
+            if value is None:
+                self._nulls[row_id] = None
+            else:
+                merged.append((value, row_id))
+        merged.sort(key=lambda pair: pair[0])
+        self._keys = [value for value, _ in merged]
+        self._ids = [row_id for _, row_id in merged]
+
+    def remove(self, value: Any, row_id: int):
+        """Forget a row id registered under a value."""
+        if value is None:
+            self._nulls.pop(row_id, None)
+            return
+        lo = bisect_left(self._keys, value)
+        hi = bisect_right(self._keys, value)
+        for pos in range(lo, hi):
+            if self._ids[pos] == row_id:
+                del self._keys[pos]
+                del self._ids[pos]
+                return
+
+    def remove_many(self, pairs: Iterable[tuple[Any, int]]):
+        """Forget many (value, row id) pairs in one pass over the index."""
+        gone = set()
+        for value, row_id in pairs:
+            if value is None:
+                self._nulls.pop(row_id, None)
+            else:
+                gone.add(row_id)
+        if gone:
+            kept = [(value, row_id) for value, row_id in zip(self._keys, self._ids) if row_id not in gone]
+            self._keys = [value for value, _ in kept]
+            self._ids = [row_id for _, row_id in kept]
+
+    def _bounds(self, operator: str, value: Any) -> Optional[tuple[int, int]]:
+        """Key range matching ``column <operator> value``, or None when the index cannot answer it.
+
+        A value that does not compare with the keys (e.g. a string against an
+        int column) yields None as well, so the planner leaves the condition
+        to the row filter.
+        """
+        try:
+            if operator == "=":
+                return bisect_left(self._keys, value), bisect_right(self._keys, value)
+            if operator == ">":
+                return bisect_right(self._keys, value), len(self._keys)
+            if operator == "<":
+                return 0, bisect_left(self._keys, value)
+            if operator in LIKE_OPERATORS:
+                prefix = like_prefix(operator, value)
+                if prefix is None:
+                    return None
+                end = prefix_end(prefix)
+                return (bisect_left(self._keys, prefix),
+                        len(self._keys) if end is None else bisect_left(self._keys, end))
+        except TypeError:
+            return None
+        return None
+
+    def estimate(self, operator: str, value: Any) -> Optional[int]:
+        """Return the number of matching rows, or None if the operator is unsupported."""
+        if value is None:
+            return len(self._nulls) if operator == "=" else 0
+        bounds = self._bounds(operator, value)
+        if bounds is None:
+            return None
+        return bounds[1] - bounds[0]
+
+    def search(self, operator: str, value: Any) -> Iterable[int]:
+        """Return ids of rows matching ``column <operator> value``."""
+        if value is None:
+            return list(self._nulls) if operator == "=" else []
+        bounds = self._bounds(operator, value)
+        if bounds is None:
+            return []
+        return self._ids[bounds[0]:bounds[1]]
+
+    def items(self) -> Iterable[tuple[Any, int]]:
+        """Yield (value, row id) pairs for non-null values in ascending order."""
+        return zip(self._keys, self._ids)
+
+    def null_ids(self) -> List[int]:
+        """Return ids of rows holding None."""
+        return list(self._nulls)
+
+    def value_counts(self) -> Iterable[tuple[Any, int]]:
+        """Yield (value, number of rows): None first, then values in ascending order."""
+        if self._nulls:
+            yield None, len(self._nulls)
+        yield from run_lengths(self._keys)
+
+    def __len__(self):
+        return len(self._ids) + len(self._nulls)
+
+    def __repr__(self):
+        return f"SortedIndex({self.column})"
+
+
+INDEX_KINDS = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+}
@@ -0,0 +1,327 @@
+import atexit
+import heapq
+import os
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from multiprocessing import shared_memory
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence
+from aggregate import finish_groups, group_states, merge_states
+from snapshot import fixed_layout
+
+# Tables with fewer rows are scanned serially: shipping a partition to a
+# worker and back costs more than filtering it in place.
+MIN_ROWS = 20_000
+EXPORTS_KEPT = 16  # shared column segments kept for reuse across queries
+
+# ---------- Shared column segments ----------
+
+class SharedColumn:
+    """One column of a table version, copied into a shared memory block.
+
+    The layout follows the binary snapshot: int64/int8/int32 values for int,
+    bool and date columns, or uint64 offsets into a UTF-8 blob for strings,
+    plus a uint8 null mask when the column has NULLs. Workers attach the
+    block by name, so no row is pickled.
+
+    Raises:
+        ValueError: If an integer does not fit in 64 bits.
+    """
+
+    def __init__(self, table, name: str):
+        column = table.columns[name]
+        layout = fixed_layout(column)
+        vector = table.column_vector(name)
+        sections: List[Any] = []
+        nulls = None
+        if layout and vector is not None and vector.typecode == layout[0]:
+            # Columnar storage already holds the exact layout.
+            typecode, _, decode = layout
+            data, nulls = vector.values, vector.nulls
+            n = len(data)
+        else:
+            values = table.column_values(name)
+            n = len(values)
+            if any(v is None for v in values):
+                nulls = bytes(v is None for v in values)
+            if layout:
+                typecode, encode, decode = layout
+                try:
+                    data = array(typecode, (0 if v is None else encode(v) if encode else v for v in values))
+                except OverflowError as e:
+                    raise ValueError(f"Column '{name}' cannot be shared: {e}")
+            else:
+                typecode, decode = None, None
+                encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+                offsets = array("Q", [0])
+                for chunk in encoded:
+                    offsets.append(offsets[-1] + len(chunk))
+                data = b"".join(encoded)
+        self.spec: Dict[str, Any] = {"n": n, "typecode": typecode, "decode": decode}
+        if nulls is not None:
+            self.spec["nulls"] = len(sections)
+            sections.append(memoryview(nulls).cast("B"))
+        if typecode is None:
+            self.spec["offsets"] = len(sections)
+            sections.append(memoryview(offsets).cast("B"))
+        self.spec["values"] = len(sections)
+        sections.append(memoryview(data).cast("B"))
+
+        # Section index -> byte offset, each section 8-byte aligned.
+        starts, size = [], 0
+        for section in sections:
+            starts.append(size)
+            size += len(section) + -len(section) % 8
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for start, section in zip(starts, sections):
+            self._shm.buf[start:start + len(section)] = section
+            section.release()
+        for key in ("nulls", "offsets", "values"):
+            if key in self.spec:
+                self.spec[key] = starts[self.spec[key]]
+        self.spec["size"] = len(data) if typecode is None else None
+        self.spec["shm"] = self._shm.name
+
+    def release(self):
+        """Free the shared memory block."""
+        self._shm.close()
+        self._shm.unlink()
+
+
+# (id(table), version, column) -> segment. Tables are not referenced: a
+# finalizer queues the id of a collected table, and its segments are
+# released before the next lookup, so a reused id never meets them.
+_exports: "OrderedDict[tuple, SharedColumn]" = OrderedDict()
+_exports_lock = threading.Lock()
+_watched: set = set()  # ids of live tables with a finalizer
+_collected: List[int] = []  # appended by finalizers, which may run inside the lock
+
+
+def _export(table, name: str) -> Dict[str, Any]:
+    """Return the spec of a table column in shared memory, exporting it once per table version."""
+    table_id = id(table)
+    key = (table_id, table.version, name)
+    with _exports_lock:
+        while _collected:
+            dead = _collected.pop()
+            _watched.discard(dead)
+            for old in [k for k in _exports if k[0] == dead]:
+                _exports.pop(old).release()
+        if table_id not in _watched:
+            weakref.finalize(table, _collected.append, table_id)
+            _watched.add(table_id)
+        shared = _exports.get(key)
+        if shared is not None:
+            _exports.move_to_end(key)
+            return shared.spec
+        for old in [k for k in _exports if k[0] == table_id and k[2] == name]:
+            _exports.pop(old).release()  # an older version of the same column
+        shared = _exports[key] = SharedColumn(table, name)
+        while len(_exports) > EXPORTS_KEPT:
+            _exports.popitem(last=False)[1].release()
+        return shared.spec
+
+
+# ---------- Worker side ----------
+
+def _read(buf: memoryview, spec: Dict[str, Any], positions: Sequence[int]) -> List[Any]:
+    """Decode the values of a shared column at the given (ascending) positions."""
+    n, typecode = spec["n"], spec["typecode"]
+    contiguous = isinstance(positions, range)
+    if not contiguous and positions and 4 * len(positions) > positions[-1] - positions[0]:
+        # Dense: decoding the whole span in bulk beats one value at a time.
+        base = positions[0]
+        span = _read(buf, spec, range(base, positions[-1] + 1))
+        return [span[p - base] for p in positions]
+    if typecode is None:
+        offsets = buf[spec["offsets"]:spec["offsets"] + 8 * (n + 1)].cast("Q")
+        blob = buf[spec["values"]:spec["values"] + spec["size"]]
+        values = None
+        if contiguous and len(positions):
+            bounds = offsets[positions.start:positions.stop + 1].tolist()
+            base = bounds[0]
+            text = str(blob[base:bounds[-1]], "utf-8")
+            if len(text) == bounds[-1] - base:  # ASCII: byte offsets are character offsets
+                values = [text[a - base:b - base] for a, b in zip(bounds, bounds[1:])]
+        if values is None:
+            values = [str(blob[offsets[p]:offsets[p + 1]], "utf-8") for p in positions]
+        offsets.release()
+        blob.release()
+    else:
+        view = buf[spec["values"]:spec["values"] + array(typecode).itemsize * n].cast(typecode)
+        if contiguous:
+            values = view[positions.start:positions.stop].tolist()
+        else:
+            values = [view[p] for p in positions]
+        view.release()
+        decode = spec["decode"]
+        if decode is not None:
+            values = [decode(v) for v in values]
+    if "nulls" in spec:
+        nulls = buf[spec["nulls"]:spec["nulls"] + n]
+        values = [None if nulls[p] else v for p, v in zip(positions, values)]
+        nulls.release()
+    return values
+
+
+def _scan_partition(task: tuple):
+    """
+    Filter one row range of the shared columns, then sort or aggregate it.
+
+    Returns:
+        List[int] | List[tuple] | Dict: Matching positions; (sort key,
+        position) pairs in ORDER BY order when sorting; group states when
+        aggregating.
+    """
+    from query import _sort_key, value_matcher
+    specs, conditions, start, stop, sort, limit, aggregate = task
+    blocks = {name: shared_memory.SharedMemory(name=spec["shm"]) for name, spec in specs.items()}
+    try:
+        def read(column: str, positions) -> List[Any]:
+            return _read(blocks[column].buf, specs[column], positions)
+
+        positions = range(start, stop)
+        for col, op, val in conditions:
+            if val is None and op in (">", "<"):
+                positions = []
+            elif op == "=":
+                positions = [p for p, v in zip(positions, read(col, positions)) if v == val]
+            elif op == ">":
+                positions = [p for p, v in zip(positions, read(col, positions)) if v is not None and v > val]
+            elif op == "<":
+                positions = [p for p, v in zip(positions, read(col, positions)) if v is not None and v < val]
+            else:
+                match = value_matcher(op, val)  # like / startswith
+                if match is not None:
+                    positions = [p for p, v in zip(positions, read(col, positions)) if match(v)]
+        if aggregate is not None:
+            needed, n_keys, aggregates = aggregate
+            records = zip(*(read(column, positions) for column in needed)) if needed else [()] * len(positions)
+            return group_states(records, needed, n_keys, aggregates)
+        if sort is not None:
+            column, ascending = sort
+            items = list(zip(map(_sort_key, read(column, positions)), positions))
+            if limit is not None:
+                # Both keep ties in input order, like the serial _sorted.
+                top = heapq.nsmallest if ascending else heapq.nlargest
+                return top(limit, items, key=itemgetter(0))
+            items.sort(key=itemgetter(0), reverse=not ascending)
+            return items
+        return list(positions)
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+# ---------- Parent side ----------
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+
+def default_workers() -> int:
+    """Number of worker processes used when none is given: one per CPU."""
+    return os.cpu_count() or 1
+
+
+def worth_parallel(table) -> bool:
+    """Check whether a table is large enough to be scanned in worker processes."""
+    return len(table.get_all()) >= MIN_ROWS
+
+
+def _specs(table, columns: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Export the columns a worker scan reads; None when the scan must run serially."""
+    if not worth_parallel(table) or any(column not in table.columns for column in columns):
+        return None
+    try:
+        return {column: _export(table, column) for column in dict.fromkeys(columns)}
+    except ValueError:
+        return None
+
+
+def can_parallel(table, columns: List[str]) -> bool:
+    """
+    Check whether a worker scan reading the given columns would run.
+
+    The table must be large enough and every column must fit in a shared
+    segment. The columns are exported as the scan would do it, so the scan
+    that follows reuses them.
+    """
+    return _specs(table, columns) is not None
+
+
+def _run(table, conditions, workers: int, columns: List[str], sort=None, limit=None, aggregate=None):
+    """Scan the table in ``workers`` row ranges; return the partition results in order, or None."""
+    specs = _specs(table, columns)
+    if specs is None:
+        return None
+    n = len(table.get_all())
+    bounds = [n * i // workers for i in range(workers + 1)]
+    tasks = [(specs, conditions, lo, hi, sort, limit, aggregate)
+             for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+    return list(_pool(workers).map(_scan_partition, tasks))
+
+
+def parallel_positions(table, conditions, workers: int, sort: Optional[tuple[str, bool]] = None,
+                       limit: Optional[int] = None) -> Optional[List[int]]:
+    """
+    Filter (and sort) a table in worker processes.
+
+    Args:
+        table (Table): Table to scan.
+        conditions (list): (column, operator, value) conditions, ANDed.
+        workers (int): Number of worker processes and row ranges.
+        sort (tuple | None): (column, ascending) to order the result by.
+        limit (int | None): Keep only the first ``limit`` sorted positions.
+
+    Returns:
+        List[int] | None: Matching storage positions in the order the
+        serial scan produces, or None when the table is too small or a
+        column cannot be shared; the caller then scans serially.
+    """
+    columns = [col for col, _, _ in conditions] + ([sort[0]] if sort else [])
+    parts = _run(table, conditions, workers, columns, sort, limit if sort else None)
+    if parts is None:
+        return None
+    if sort is None:
+        return list(chain.from_iterable(parts))
+    # Partitions hold consecutive row ranges and merge() is stable, so ties
+    # keep table order as in the serial sort.
+    merged = heapq.merge(*parts, key=itemgetter(0), reverse=not sort[1])
+    return [pos for _, pos in islice(merged, limit)]
+
+
+def parallel_groups(table, conditions, workers: int, needed: List[str], n_keys: int,
+                    aggregates: List[tuple[str, Optional[str], str]]) -> Optional[List[tuple]]:
+    """
+    Filter and partially aggregate a table in worker processes, then merge.
+
+    Returns:
+        List[tuple] | None: Same result as hash_aggregate over the serial
+        scan, or None when the scan must run serially.
+    """
+    columns = [col for col, _, _ in conditions] + needed
+    parts = _run(table, conditions, workers, columns, aggregate=(needed, n_keys, aggregates))
+    if parts is None:
+        return None
+    return finish_groups(merge_states(parts, aggregates), n_keys, aggregates)
+
+
+@atexit.register
+def _shutdown():
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+    with _exports_lock:
+        while _exports:
+            _exports.popitem()[1].release()
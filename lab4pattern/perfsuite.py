@@ -0,0 +1,335 @@
+import argparse
+import cProfile
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from benchmarks import BENCH_SCHEMA, QUERY_SHAPES, make_rows
+from factory import Database
+from query import JoinedTable, SimpleQuery
+
+# Reproducible workload suite: every case reports throughput, latency
+# percentiles and peak memory, optionally dumps a cProfile of one run, and
+# results can be saved and compared against a saved baseline.
+#
+#   python perfsuite.py --sizes 1000 100000 1000000 --save base.json
+#   python perfsuite.py --baseline base.json --profile-dir prof/
+
+SUITES = ("insert", "query", "join", "persistence")
+
+# ---------- Synthetic data ----------
+
+ORDERS_SCHEMA = {
+    "columns": [
+        {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+        {"name": "customer_id", "type": "int", "nullable": False, "foreign_key": ("customers", "id")},
+        {"name": "amount", "type": "int", "nullable": False},
+        {"name": "status", "type": "string", "nullable": True},
+    ],
+}
+
+
+def make_orders(n: int, customers: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Return n synthetic orders referencing customer ids 1..customers (skewed towards low ids)."""
+    rnd = random.Random(seed)
+    statuses = ["new", "paid", "shipped", "delivered", "returned"]
+    return [
+        {
+            "id": i,
+            "customer_id": min(int(rnd.paretovariate(1.2)), customers),
+            "amount": rnd.randrange(1, 10_000),
+            "status": None if rnd.random() < 0.02 else rnd.choice(statuses),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def fresh_db() -> Database:
+    """Return the database with every table dropped, so cases do not share state."""
+    db = Database("BenchDB")
+    db.tables.clear()
+    return db
+
+
+def load_tables(n: int, storage: str = "row", seed: int = 0):
+    """Create customers (n // 10 rows, BENCH_SCHEMA) and orders (n rows) tables."""
+    db = fresh_db()
+    customers = db.create_table_with_factory("customers", {**BENCH_SCHEMA, "storage": storage})
+    customers.insert_many(make_rows(max(n // 10, 1), seed))
+    orders = db.create_table_with_factory("orders", {**ORDERS_SCHEMA, "storage": storage})
+    orders.insert_many(make_orders(n, len(customers.get_all()), seed))
+    return customers, orders
+
+
+# ---------- Measurement ----------
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return samples[min(len(samples) - 1, max(math.ceil(q / 100 * len(samples)) - 1, 0))]
+
+
+def _run_ops(op: Callable[[Any, int], Any], state: Any, count: int) -> List[float]:
+    latencies = []
+    clock = time.perf_counter
+    for i in range(count):
+        start = clock()
+        op(state, i)
+        latencies.append(clock() - start)
+    return latencies
+
+
+def measure(name: str, n: int, prepare: Callable[[], Any], op: Callable[[Any, int], Any], count: int,
+            units: int = 1, unit: str = "rows", repeat: int = 3, memory: bool = True,
+            profile_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Time ``count`` calls of ``op(state, i)`` on a state built by ``prepare()``.
+
+    Each repeat prepares a fresh state (untimed); the fastest repeat is
+    reported. Peak memory is taken in a separate traced run, since
+    tracemalloc slows the code down, and counts only what the operations
+    allocate on top of the prepared state.
+
+    Args:
+        name (str): Case name, e.g. "query[narrow]".
+        n (int): Table size the case was prepared with.
+        prepare (Callable): Builds the state the operations run on.
+        op (Callable): One operation; ``i`` numbers the call.
+        count (int): Operations per run.
+        units (int): Work items (e.g. rows) handled by one operation.
+        unit (str): What the work items are, for the report.
+        repeat (int): Timed runs.
+        memory (bool): Measure peak memory.
+        profile_dir (str | None): Write a cProfile dump of one more run here.
+
+    Returns:
+        Dict: name, rows, ops, seconds, throughput (units per second) and
+        unit, latency percentiles p50/p95/p99/max in milliseconds,
+        peak_bytes (None when not measured).
+    """
+    best: Optional[List[float]] = None
+    for _ in range(repeat):
+        latencies = _run_ops(op, prepare(), count)
+        if best is None or sum(latencies) < sum(best):
+            best = latencies
+    seconds = sum(best)
+    ordered = sorted(best)
+    result = {
+        "name": name,
+        "rows": n,
+        "ops": count,
+        "seconds": seconds,
+        "throughput": count * units / seconds if seconds else float("inf"),
+        "unit": unit,
+        **{f"p{q}_ms": percentile(ordered, q) * 1000 for q in (50, 95, 99)},
+        "max_ms": ordered[-1] * 1000,
+        "peak_bytes": None,
+    }
+    if memory:
+        state = prepare()
+        tracemalloc.start()
+        try:
+            _run_ops(op, state, count)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        state = prepare()
+        profiler = cProfile.Profile()
+        profiler.runcall(_run_ops, op, state, count)
+        safe = "".join(c if c.isalnum() else "_" for c in name).strip("_")
+        profiler.dump_stats(os.path.join(profile_dir, f"{safe}_{n}.prof"))
+    return result
+
+
+def _queries(n: int, cap: int = 200) -> int:
+    """Operations per run for a case whose cost grows with n: about 10^6 rows touched, at least 5."""
+    return max(5, min(cap, 1_000_000 // n))
+
+
+# ---------- Cases ----------
+
+def insert_cases(n: int, seed: int, **options) -> Iterator[Dict[str, Any]]:
+    """Single-row Table.insert and batched insert_many, per storage kind."""
+    rows = make_rows(n, seed)
+    batch = 1_000
+    for storage in ("row", "columnar"):
+        def prepare():
+            return fresh_db().create_table_with_factory("bench", {**BENCH_SCHEMA, "storage": storage})
+
+        yield measure(f"insert[{storage}]", n, prepare, lambda table, i: table.insert(rows[i]), n, **options)
+        yield measure(f"insert_many[{storage}]", n, prepare,
+                      lambda table, i: table.insert_many(rows[i * batch:(i + 1) * batch]),
+                      math.ceil(n / batch), units=batch, **options)
+
+
+def query_cases(n: int, seed: int, **options) -> Iterator[Dict[str, Any]]:
+    """SimpleQuery shapes: primary-key lookup, selective and wide filters, top-k, range + sort."""
+    shapes = {
+        "point": lambda t, i: SimpleQuery(t).where("id", "=", i * 7919 % n + 1),
+        "narrow": lambda t, i: QUERY_SHAPES["narrow"](t),
+        "wide": lambda t, i: QUERY_SHAPES["wide"](t),
+        "top_k": lambda t, i: (SimpleQuery(t).where("vip", "=", False)
+                               .order_by("score", ascending=False).limit(20)),
+        "range": lambda t, i: (SimpleQuery(t).where("score", ">", i % 900)
+                               .where("score", "<", i % 900 + 50).order_by("id")),
+    }
+    for storage in ("row", "columnar"):
+        table = None
+
+        def prepare():
+            nonlocal table
+            if table is None:  # queries do not change the table: build it once
+                table = fresh_db().create_table_with_factory("bench", {**BENCH_SCHEMA, "storage": storage})
+                table.insert_many(make_rows(n, seed))
+            return table
+
+        for shape, query in shapes.items():
+            count = 200 if shape == "point" else _queries(n)
+            yield measure(f"query[{storage},{shape}]", n, prepare,
+                          lambda t, i: query(t, i).execute(), count, unit="queries", **options)
+
+
+def join_cases(n: int, seed: int, **options) -> Iterator[Dict[str, Any]]:
+    """JoinedTable of orders (n rows) with customers (n // 10 rows), hash and merge strategies."""
+    tables = None
+
+    def prepare():
+        nonlocal tables
+        if tables is None:
+            tables = load_tables(n, seed=seed)
+            for table, column in zip(tables, ("id", "customer_id")):
+                table.create_index(column, "sorted")
+        return tables
+
+    for strategy in ("hash", "merge"):
+        yield measure(f"join[{strategy}]", n, prepare,
+                      lambda t, i: JoinedTable(t[1], t[0], "customer_id", "id", strategy).execute(),
+                      _queries(n, cap=20), unit="joins", **options)
+
+
+def persistence_cases(n: int, seed: int, **options) -> Iterator[Dict[str, Any]]:
+    """Database.save_to_json and load_from_json of the customers and orders tables."""
+    rows = n + max(n // 10, 1)
+    count = max(1, min(5, 100_000 // n))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.json")
+
+        def prepare():
+            load_tables(n, seed=seed)
+            return Database()
+
+        yield measure("save_to_json", n, prepare, lambda db, i: db.save_to_json(path), count,
+                      units=rows, **options)
+        # The file written by the save case is loaded into an empty database.
+        yield measure("load_from_json", n, fresh_db, lambda db, i: db.load_from_json(path), count,
+                      units=rows, **options)
+
+
+CASES = {
+    "insert": insert_cases,
+    "query": query_cases,
+    "join": join_cases,
+    "persistence": persistence_cases,
+}
+
+
+# ---------- Reporting ----------
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine a result file was produced on."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def _megabytes(size: Optional[int]) -> str:
+    return "-" if size is None else f"{size / 2 ** 20:.1f}"
+
+
+def print_result(result: Dict[str, Any]):
+    throughput = f"{result['throughput']:,.0f} {result['unit']}/s"
+    print(f"{result['name']:<26} {result['rows']:>9} {result['ops']:>6} {throughput:>20} "
+          f"{result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+          f"{_megabytes(result['peak_bytes']):>9}")
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> int:
+    """
+    Print the change of each case against a baseline run.
+
+    A case regresses when its throughput dropped by more than ``threshold``
+    (a fraction). Cases missing from either run are skipped.
+
+    Returns:
+        int: Number of regressions.
+    """
+    before = {(r["name"], r["rows"]): r for r in baseline}
+    print(f"\n{'case':<26} {'rows':>9} {'per s before':>14} {'per s now':>14} {'change':>8} "
+          f"{'p95 before':>11} {'p95 now':>9}")
+    regressions = 0
+    for result in results:
+        old = before.get((result["name"], result["rows"]))
+        if old is None:
+            continue
+        change = result["throughput"] / old["throughput"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<26} {result['rows']:>9} {old['throughput']:>14,.0f} "
+              f"{result['throughput']:>14,.0f} {change:>+8.1%} {old['p95_ms']:>11.3f} "
+              f"{result['p95_ms']:>9.3f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MiniDB workload suite")
+    parser.add_argument("suites", nargs="*", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run measuring peak memory")
+    parser.add_argument("--profile-dir", help="write a cProfile dump per case into this directory")
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="throughput drop reported as a regression (default: 0.10)")
+    args = parser.parse_args()
+    for name in args.suites:
+        if name not in CASES:
+            parser.error(f"unknown suite: {name}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    options = {"repeat": args.repeat, "memory": not args.no_memory, "profile_dir": args.profile_dir}
+    print(f"{'case':<26} {'rows':>9} {'ops':>6} {'throughput':>20} {'p50, ms':>9} {'p95, ms':>9} "
+          f"{'p99, ms':>9} {'peak, MB':>9}")
+    results = []
+    for name in args.suites or SUITES:
+        for n in args.sizes:
+            for result in CASES[name](n, args.seed, **options):
+                print_result(result)
+                results.append(result)
+    fresh_db()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "seed": args.seed, "results": results}, f, indent=2)
+    if baseline is not None and compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
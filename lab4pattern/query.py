@@ -1,11 +1,170 @@
-from typing import Any, List, Optional
-from datatypes import Row
+import copy
+import heapq
+import re
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from datatypes import Row, RowLayout
+from storage import DictionaryVector
 from table import Table
+from factory import Database
+from index import LIKE_OPERATORS, SortedIndex, like_prefix
+from aggregate import AGGREGATES, aggregate_name, count_aggregate, hash_aggregate
+from vectorized import HAS_NUMPY, vectorized_positions
+from parallel import can_parallel, default_workers, parallel_groups, parallel_positions
+from stats import estimate_join_rows
+
+
+def _sort_key(value: Any) -> tuple[bool, Any]:
+    """Sort key that puts None before every other value."""
+    return value is not None, value
+
+# ---------- Compiled predicates ----------
+
+# Fraction of rows assumed to match when neither an index nor the table
+# statistics give an estimate (e.g. a value of another type).
+DEFAULT_SELECTIVITY = {"=": 0.1, ">": 1 / 3, "<": 1 / 3, "like": 0.1, "startswith": 0.1}
+
+
+def value_matcher(operator: str, value: Any) -> Optional[Callable[[Any], bool]]:
+    """
+    Build a test of one column value against ``<operator> value``.
+
+    Same semantics as compile_condition: None never matches '>' or '<', and
+    'like' / 'startswith' match strings only. LIKE patterns use '%' for any
+    run of characters and '_' for one character, case-sensitively.
+
+    Returns:
+        Callable | None: Test on a value, or None for an unknown operator.
+    """
+    if operator == "=":
+        return lambda v: v == value
+    if operator in (">", "<") and value is None:
+        return lambda v: False
+    if operator == ">":
+        return lambda v: v is not None and v > value
+    if operator == "<":
+        return lambda v: v is not None and v < value
+    if operator in LIKE_OPERATORS:
+        prefix = like_prefix(operator, value)
+        if prefix is not None:
+            return lambda v: isinstance(v, str) and v.startswith(prefix)
+        regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in value)
+        fullmatch = re.compile(regex, re.DOTALL).fullmatch
+        return lambda v: isinstance(v, str) and fullmatch(v) is not None
+    return None
+
+
+def compile_condition(column: str, operator: str, value: Any) -> Optional[Callable[[Row], bool]]:
+    """
+    Build a predicate specialised for one condition.
+
+    The operator is resolved once here instead of per row, and the predicate
+    reads the row's value directly. None never matches '>' or '<'.
+
+    Returns:
+        Callable | None: Predicate on a Row, or None for an unknown operator
+        (which, as before, filters nothing).
+    """
+    if operator == "=":
+        def predicate(row: Row) -> bool:
+            return row[column] == value
+    elif operator in (">", "<") and value is None:
+        def predicate(row: Row) -> bool:
+            return False
+    elif operator == ">":
+        def predicate(row: Row) -> bool:
+            v = row[column]
+            return v is not None and v > value
+    elif operator == "<":
+        def predicate(row: Row) -> bool:
+            v = row[column]
+            return v is not None and v < value
+    elif operator in LIKE_OPERATORS:
+        match = value_matcher(operator, value)
+
+        def predicate(row: Row) -> bool:
+            return match(row[column])
+    else:
+        return None
+    return predicate
+
+
+def _code_scan(vector: DictionaryVector, positions, operator: str, value: Any):
+    """
+    Filter positions of a dictionary-encoded column on its codes.
+
+    The condition is evaluated once per distinct string, not once per row;
+    rows then only look up their code. ``value`` must not be None.
+    """
+    match = value_matcher(operator, value)
+    if match is None:
+        return positions
+    dictionary, codes = vector.dictionary, vector.values
+    if operator == "=":
+        code = dictionary.code(value)
+        if code is None:
+            return []
+        hits = bytearray(len(dictionary))
+        hits[code] = 1
+    else:
+        hits = bytearray(map(match, dictionary.strings)) or bytearray(1)  # NULL rows store code 0
+    if isinstance(positions, range) and operator == "=":
+        # array.index finds the next occurrence in C, hopping over the
+        # non-matching rows instead of visiting each of them.
+        found, find, p = [], codes.index, positions.start
+        try:
+            while True:
+                p = find(code, p, positions.stop)
+                found.append(p)
+                p += 1
+        except ValueError:
+            positions = found
+    elif isinstance(positions, range):
+        positions = [p for p, c in enumerate(codes[positions.start:positions.stop], positions.start) if hits[c]]
+    else:
+        positions = [p for p in positions if hits[codes[p]]]
+    if hits[0] and vector.nulls is not None:
+        nulls = vector.nulls
+        positions = [p for p in positions if not nulls[p]]
+    return positions
+
+
+def _record_reader(columns: List[str]) -> Callable[[Row], tuple]:
+    """Return a function reading the given columns of a row into a tuple.
+
+    The slot lookup is done once per row layout (normally once per table),
+    leaving a C-level item getter on the row's values.
+    """
+    seen = (None, None)
+
+    def record(row: Row) -> tuple:
+        nonlocal seen
+        layout, read = seen
+        if row.layout.base is not layout:
+            layout = row.layout.base
+            read = layout.reader(columns)
+            seen = (layout, read)
+        return read(row.values)
+    return record
+
+
+def filter_rows(rows, predicates: List[Callable[[Row], bool]]) -> Iterator[Row]:
+    """Chain one filter() per predicate; a row stops at the first one it fails."""
+    rows = iter(rows)
+    for predicate in predicates:
+        rows = filter(predicate, rows)
+    return rows
 
 # ---------- SimpleQuery ----------
 
 class SimpleQuery:
-    """Simple query system for a table: SELECT, WHERE, ORDER BY."""
+    """Simple query system for a table: SELECT, WHERE, GROUP BY, ORDER BY, LIMIT/OFFSET.
+
+    Iterating a query (or calling cursor()) streams the result; execute()
+    collects it into a list. Do not modify the table while a cursor is open.
+    """
+
+    _BATCH = 1024  # rows materialized at a time when streaming storage positions
 
     def __init__(self, table: Table):
         """
@@ -19,6 +178,13 @@ class SimpleQuery:
         self.filter_conditions = []
         self.sort_column = None
         self.sort_ascending = True
+        self.vectorized = False
+        self.workers: Optional[int] = None  # set by parallel()
+        self.row_limit: Optional[int] = None
+        self.row_offset = 0
+        self._compiled: Optional[Dict[Optional[int], list]] = None  # set by compile()
+        self.group_columns: List[str] = []
+        self.aggregates: List[tuple[str, Optional[str], str]] = []  # (function, column, alias)
 
     def select(self, columns: List[str]):
         """Specify columns to select."""
@@ -26,69 +192,538 @@ class SimpleQuery:
         return self
 
     def where(self, column: str, operator: str, value: Any):
-        """Add a filter condition."""
+        """
+        Add a filter condition: '=', '>', '<', 'like' or 'startswith'.
+
+        None never matches '>' or '<'. 'like' takes an SQL pattern ('%' any
+        characters, '_' one character) and 'startswith' a plain prefix; both
+        match strings only, and a sorted index answers prefix patterns
+        ('abc%') without a scan.
+
+        Raises:
+            ValueError: If a 'like' or 'startswith' value is not a string.
+        """
+        if operator in LIKE_OPERATORS and not isinstance(value, str):
+            raise ValueError(f"'{operator}' needs a string pattern, got {value!r}")
         self.filter_conditions.append((column, operator, value))
         return self
 
+    def group_by(self, columns: List[str]):
+        """
+        Group matching rows by columns; each group becomes one result row.
+
+        Result rows hold the group-by values and the aggregates (see
+        aggregate()). order_by, select, limit and offset apply to them.
+        """
+        self.group_columns = list(columns)
+        return self
+
+    def aggregate(self, function: str, column: Optional[str] = None, alias: Optional[str] = None):
+        """
+        Add an aggregate: count, sum, min, max or avg over a column.
+
+        NULLs are ignored, except by count without a column (COUNT(*)).
+        Without group_by, the aggregates cover all matching rows.
+
+        Args:
+            function (str): Aggregate function name.
+            column (str | None): Input column; only count may omit it.
+            alias (str | None): Result column name, e.g. 'sum(score)' by default.
+
+        Raises:
+            ValueError: If the function is unknown or needs a column.
+        """
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate function: {function}")
+        if column is None and function != "count":
+            raise ValueError(f"Aggregate '{function}' needs a column")
+        self.aggregates.append((function, column, alias or aggregate_name(function, column)))
+        return self
+
     def order_by(self, column: str, ascending: bool = True):
-        """Specify sorting column and order."""
+        """Specify sorting column and order. None sorts before other values."""
         self.sort_column = column
         self.sort_ascending = ascending
         return self
 
-    def execute(self) -> List[Row]:
+    def limit(self, count: int):
+        """
+        Return at most ``count`` rows.
+
+        With order_by, the scan keeps only the first offset + count rows in a
+        bounded heap instead of sorting every match.
+
+        Raises:
+            ValueError: If count is negative.
+        """
+        if count < 0:
+            raise ValueError("LIMIT must not be negative")
+        self.row_limit = count
+        return self
+
+    def offset(self, count: int):
+        """
+        Skip the first ``count`` result rows.
+
+        Raises:
+            ValueError: If count is negative.
+        """
+        if count < 0:
+            raise ValueError("OFFSET must not be negative")
+        self.row_offset = count
+        return self
+
+    def _stop(self) -> Optional[int]:
+        """Position after the last requested row, or None when unlimited."""
+        return None if self.row_limit is None else self.row_offset + self.row_limit
+
+    def vectorize(self, enabled: bool = True):
+        """
+        Evaluate full scans with NumPy masks and argsort instead of a row loop.
+
+        Results are identical to the row loop; the query quietly falls back to
+        it when NumPy is missing or a condition cannot be vectorized. This pays
+        off on columnar tables, whose int/bool/date columns are copied into
+        arrays with one memcpy; row tables first gather each column in Python.
+        """
+        self.vectorized = enabled
+        return self
+
+    def parallel(self, workers: Optional[int] = None, enabled: bool = True):
+        """
+        Run full scans in worker processes, one row range per worker.
+
+        The columns the query reads are copied once per table version into
+        shared memory; each worker filters its range and sorts it (top-k with
+        a limit) or partially aggregates it, and the partial results are
+        merged into exactly the serial result. Index plans, and tables
+        smaller than parallel.MIN_ROWS, still run serially.
+
+        Args:
+            workers (int | None): Number of processes (default: one per CPU).
+            enabled (bool): False returns to serial execution.
+
+        Raises:
+            ValueError: If workers is less than 1.
         """
-        Execute the query.
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = (workers or default_workers()) if enabled else None
+        return self
+
+    # ---- Planning ----
+    def _plan(self) -> Optional[tuple[int, Any, int]]:
+        """
+        Pick the most selective index for the filter conditions.
 
         Returns:
-            List[Row]: Filtered, sorted, and optionally column-selected rows.
-        """
-        results = []
-
-        # 1. Filtering
-        filtered_rows = []
-        for row in self.table.get_all():
-            match = True
-            for col, op, val in self.filter_conditions:
-                r_val = row[col]
-                if op == "=" and r_val != val:
-                    match = False
-                    break
-                elif op == ">" and not (r_val > val):
-                    match = False
-                    break
-                elif op == "<" and not (r_val < val):
-                    match = False
-                    break
-            if match:
-                filtered_rows.append(row)
-
-        # 2. Sorting
+            tuple | None: (estimated rows, index or "pk", condition position),
+            or None when no index applies and the table must be scanned.
+        """
+        best = None
+        pk_col = self.table.get_primary_key()
+        for pos, (col, op, val) in enumerate(self.filter_conditions):
+            candidates = []
+            if pk_col and col == pk_col.name and op == "=":
+                candidates.append((1, "pk"))
+            for index in self.table.indexes_on(col):
+                estimate = index.estimate(op, val)
+                if estimate is not None:
+                    candidates.append((estimate, index))
+            for estimate, index in candidates:
+                if best is None or estimate < best[0]:
+                    best = (estimate, index, pos)
+        return best
+
+    def explain(self) -> str:
+        """
+        Describe how the query would be executed.
+
+        Returns:
+            str: One line per step: access path, remaining filters, sort.
+        """
+        plan = self._plan()
+        lines = []
+        index = self._aggregate_index()
+        if index is not None:
+            lines.append(f"INDEX AGGREGATE {self.table.name} USING {index.kind}({index.column}) "
+                         f"[{self._describe_aggregates()}]")
+            residual = []
+        elif plan is None:
+            if self.workers and can_parallel(self.table, self._parallel_columns()):
+                scan = f"PARALLEL SCAN [{self.workers} workers]"
+            elif self.vectorized and HAS_NUMPY:
+                scan = "VECTORIZED SCAN"
+            elif self.table.storage == "columnar":
+                scan = "COLUMN SCAN"
+            else:
+                scan = "FULL SCAN"
+            lines.append(f"{scan} {self.table.name} [{len(self.table.get_all())} rows]")
+            residual = self._residual(plan)
+        else:
+            estimate, access, pos = plan
+            col, op, val = self.filter_conditions[pos]
+            if access == "pk":
+                lines.append(f"PRIMARY KEY LOOKUP {self.table.name} WHERE {col} {op} {val!r}")
+            else:
+                lines.append(
+                    f"INDEX SCAN {self.table.name} USING {access.kind}({col}) "
+                    f"WHERE {col} {op} {val!r} [est. {estimate} rows]"
+                )
+            residual = self._residual(plan)
+        for col, op, val in residual:
+            lines.append(f"FILTER {col} {op} {val!r}")
+        if index is None and self._is_aggregate():
+            lines.append(f"HASH AGGREGATE [{self._describe_aggregates()}]")
         if self.sort_column:
-            filtered_rows.sort(
-                key=lambda r: r[self.sort_column],
-                reverse=not self.sort_ascending,
-            )
-
-        # 3. Column selection
-        for row in filtered_rows:
-            if self.selected_columns:
-                filtered_data = {
-                    col: row[col] for col in self.selected_columns if col in row.data
-                }
-                results.append(Row(filtered_data))
+            top = "" if self._stop() is None else f" [top {self._stop()}]"
+            lines.append(f"SORT {self.sort_column} {'ASC' if self.sort_ascending else 'DESC'}{top}")
+        if self.row_offset:
+            lines.append(f"OFFSET {self.row_offset}")
+        if self.row_limit is not None:
+            lines.append(f"LIMIT {self.row_limit}")
+        return "\n".join(lines)
+
+    def _selectivity(self, condition: tuple[str, str, Any]) -> float:
+        """Estimated fraction of rows matching a condition: exact from an index,
+        else from the table statistics, else a default."""
+        col, op, val = condition
+        if val is None and op in (">", "<"):
+            return 0.0
+        for index in self.table.indexes_on(col):
+            estimate = index.estimate(op, val)
+            if estimate is not None:
+                return estimate / max(len(self.table.get_all()), 1)
+        estimate = self.table.stats.selectivity(col, op, val)
+        if estimate is not None:
+            return estimate
+        return DEFAULT_SELECTIVITY.get(op, 1.0)
+
+    def _ordered(self, conditions) -> list:
+        """Order conditions so the most selective ones run first."""
+        if len(conditions) < 2:
+            return list(conditions)
+        return sorted(conditions, key=self._selectivity)
+
+    def _residual(self, plan) -> list:
+        """Conditions left after the planned access path, in evaluation order."""
+        conditions = self.filter_conditions
+        if plan is not None:
+            pos = plan[2]
+            conditions = conditions[:pos] + conditions[pos + 1:]
+        return self._ordered(conditions)
+
+    def _predicates(self, plan) -> List[Callable[[Row], bool]]:
+        """Compile the residual conditions of a plan (once per plan for a prepared query)."""
+        key = None if plan is None else plan[2]
+        if self._compiled is not None and key in self._compiled:
+            return self._compiled[key]
+        compiled = (compile_condition(*condition) for condition in self._residual(plan))
+        predicates = [predicate for predicate in compiled if predicate is not None]
+        if self._compiled is not None:
+            self._compiled[key] = predicates
+        return predicates
+
+    def _sorted(self, items, key) -> list:
+        """Order items for ORDER BY; with a limit only the first offset + limit are kept."""
+        stop = self._stop()
+        if stop is None:
+            return sorted(items, key=key, reverse=not self.sort_ascending)
+        # Both keep ties in input order, like sorted(..., reverse=...)[:stop].
+        top = heapq.nsmallest if self.sort_ascending else heapq.nlargest
+        return top(stop, items, key=key)
+
+    def _column_scan(self, sort: bool = True) -> List[int]:
+        """
+        Filter and sort a columnar table one whole column at a time.
+
+        Args:
+            sort (bool): Apply order_by to the positions.
+
+        Returns:
+            List[int]: Matching storage positions, sorted if requested and
+            order_by was given.
+        """
+        table = self.table
+        positions = range(len(table.get_all()))
+        for col, op, val in self._ordered(self.filter_conditions):
+            if val is None and op in (">", "<"):
+                positions = []
+                continue
+            vector = table.column_vector(col)
+            if isinstance(vector, DictionaryVector) and val is not None:
+                positions = _code_scan(vector, positions, op, val)
+                continue
+            values = table.column_values(col)
+            if op == "=":
+                positions = [p for p in positions if values[p] == val]
+            elif op == ">":
+                positions = [p for p in positions if values[p] is not None and values[p] > val]
+            elif op == "<":
+                positions = [p for p in positions if values[p] is not None and values[p] < val]
+            elif op in LIKE_OPERATORS:
+                match = value_matcher(op, val)
+                positions = [p for p in positions if match(values[p])]
+        if sort and self.sort_column:
+            keys = [_sort_key(v) for v in table.column_values(self.sort_column)]
+            positions = self._sorted(positions, keys.__getitem__)
+        return list(positions)
+
+    def _parallel_columns(self) -> List[str]:
+        """Columns a worker scan of the query reads (see parallel_positions and parallel_groups)."""
+        columns = [col for col, _, _ in self.filter_conditions]
+        if self._is_aggregate():
+            return columns + self._aggregate_columns()
+        return columns + ([self.sort_column] if self.sort_column else [])
+
+    def _matching_positions(self, plan, sort: bool) -> Optional[List[int]]:
+        """Return matching storage positions when a column-wise scan applies, else None."""
+        if plan is not None:
+            return None
+        positions = None
+        if self.workers:
+            order = (self.sort_column, self.sort_ascending) if sort and self.sort_column else None
+            positions = parallel_positions(self.table, self._ordered(self.filter_conditions), self.workers,
+                                           order, self._stop())
+        if positions is None and self.vectorized:
+            positions = vectorized_positions(self.table, self.filter_conditions,
+                                             self.sort_column if sort else None, self.sort_ascending)
+        if positions is None and self.table.storage == "columnar":
+            positions = self._column_scan(sort)
+        return positions
+
+    def _matching_rows(self, plan) -> Iterator[Row]:
+        """Yield matching rows in table order, through the planned index if any."""
+        if plan is None:
+            candidates = self.table.get_all()
+        else:
+            _, index, pos = plan
+            col, op, val = self.filter_conditions[pos]
+            if index == "pk":
+                row = self.table.get_by_primary_key(val)
+                candidates = [row] if row is not None else []
+            else:
+                candidates = self.table.rows_for_ids(index.search(op, val))
+        return filter_rows(candidates, self._predicates(plan))
+
+    # ---- Aggregation ----
+    def _is_aggregate(self) -> bool:
+        return bool(self.group_columns or self.aggregates)
+
+    def _describe_aggregates(self) -> str:
+        parts = [alias for _, _, alias in self.aggregates]
+        if self.group_columns:
+            parts.insert(0, f"GROUP BY {', '.join(self.group_columns)}")
+        return "; ".join(parts)
+
+    def _aggregate_index(self):
+        """
+        Return an index that answers the aggregation without reading rows.
+
+        That is the case without filters when every aggregate is count(*) or
+        reads one indexed column, and that column is the only group-by column
+        (or there is no GROUP BY).
+        """
+        if not self._is_aggregate() or self.filter_conditions:
+            return None
+        columns = {column for _, column, _ in self.aggregates if column is not None}
+        columns.update(self.group_columns)
+        if len(columns) != 1 or len(self.group_columns) > 1:
+            return None
+        indexes = self.table.indexes_on(columns.pop())
+        return indexes[0] if indexes else None
+
+    def _records(self, plan, needed: List[str]) -> Iterable[tuple]:
+        """Yield one tuple of the needed column values per matching row."""
+        positions = self._matching_positions(plan, sort=False)
+        if positions is not None:
+            # Read only the needed columns; no Row objects are built.
+            columns = []
+            for column in needed:
+                values = self.table.column_values(column)
+                columns.append([values[p] for p in positions])
+            return zip(*columns) if needed else [()] * len(positions)
+        rows = self._matching_rows(plan)
+        if needed:
+            return map(_record_reader(needed), rows)
+        return (() for _ in rows)  # COUNT(*) only
+
+    def _aggregate_columns(self) -> List[str]:
+        """Group-by columns, then the other columns the aggregates read, without repeats."""
+        return list(dict.fromkeys(
+            self.group_columns + [column for _, column, _ in self.aggregates if column is not None]))
+
+    def _aggregate_rows(self) -> List[Row]:
+        """Group and aggregate the matching rows in one pass."""
+        keys = self.group_columns
+        index = self._aggregate_index()
+        if index is not None:
+            groups = count_aggregate(index.value_counts(), bool(keys), self.aggregates)
+        else:
+            needed = self._aggregate_columns()
+            plan = self._plan()
+            groups = None
+            if self.workers and plan is None:
+                groups = parallel_groups(self.table, self._ordered(self.filter_conditions), self.workers,
+                                         needed, len(keys), self.aggregates)
+            if groups is None:
+                groups = hash_aggregate(self._records(plan, needed), needed, len(keys), self.aggregates)
+        rows, layout = [], None
+        for key, results in groups:
+            data = {**dict(zip(keys, key)), **results}
+            if layout is None:
+                layout = RowLayout.of(data)  # shared by the result rows
+            rows.append(Row(data, layout))
+        return rows
+
+    def _result_rows(self) -> Iterator[Row]:
+        """Yield the rows of the requested page in result order."""
+        start, stop = self.row_offset, self._stop()
+        if self._is_aggregate():
+            rows = self._aggregate_rows()
+        else:
+            plan = self._plan()
+            positions = self._matching_positions(plan, sort=True)
+            if positions is not None:
+                # Only the rows of the page are materialized, a batch at a time.
+                page = positions[start:stop]
+                for i in range(0, len(page), self._BATCH):
+                    yield from self.table.rows_at(page[i:i + self._BATCH])
+                return
+            rows = self._matching_rows(plan)
+        if self.sort_column:
+            column = self.sort_column
+            rows = self._sorted(rows, key=lambda r: _sort_key(r[column]))
+        yield from islice(rows, start, stop)
+
+    def cursor(self) -> Iterator[Row]:
+        """
+        Execute the query lazily, using an index when one applies.
+
+        Without order_by, rows are filtered as the caller iterates and the
+        scan stops once the limit is reached.
+
+        Yields:
+            Row: Filtered, sorted, paged and optionally column-selected rows.
+        """
+        selected = self.selected_columns
+        layout = RowLayout.of(selected) if selected else None
+        for row in self._result_rows():
+            if selected:
+                yield Row({col: row[col] for col in selected if col in row}, layout)
             else:
-                results.append(row)
+                yield row
+
+    def __iter__(self) -> Iterator[Row]:
+        return self.cursor()
+
+    def execute(self) -> List[Row]:
+        """
+        Execute the query, using an index when one applies.
+
+        With Database.enable_query_cache, the result is cached until the
+        table changes; cached rows are shared, so treat them as read-only.
+
+        Returns:
+            List[Row]: Filtered, sorted, paged and optionally column-selected rows.
+        """
+        cache = Database().query_cache
+        key = self._cache_key() if cache is not None else None
+        if key is None:
+            return list(self.cursor())
+        versions = cache.versions([self.table])  # before the scan, which a write may follow
+        rows = cache.get(key, [self.table])
+        if rows is None:
+            rows = list(self.cursor())
+            cache.put(key, versions, rows)
+        return list(rows)
 
-        return results
+    def _cache_key(self) -> Optional[tuple]:
+        """Normalised query for the result cache, or None if a value is unhashable."""
+        # Conditions are ANDed, so their order does not matter; the type name
+        # keeps e.g. 1 and True apart.
+        conditions = sorted(((col, op, type(val).__name__, val) for col, op, val in self.filter_conditions),
+                            key=repr)
+        key = (
+            "select", self.table.name, tuple(self.selected_columns or ()), tuple(conditions),
+            (self.sort_column, self.sort_ascending) if self.sort_column else None,
+            self.row_offset, self.row_limit, tuple(self.group_columns), tuple(self.aggregates),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def compile(self) -> "PreparedQuery":
+        """
+        Freeze the query for repeated execution.
+
+        Returns:
+            PreparedQuery: Runs the query as it is now; later builder calls
+            on this SimpleQuery do not affect it.
+        """
+        return PreparedQuery(self)
+
+
+class PreparedQuery:
+    """A compiled SimpleQuery that can be executed many times.
+
+    The predicates left after each access path are compiled and ordered by
+    selectivity on first use and then reused. The access path itself is
+    chosen again on every run (a few index estimates), so indexes created or
+    dropped later are still taken into account.
+    """
+
+    def __init__(self, query: SimpleQuery):
+        frozen = copy.copy(query)
+        frozen.selected_columns = list(query.selected_columns) if query.selected_columns else None
+        frozen.filter_conditions = list(query.filter_conditions)
+        frozen.group_columns = list(query.group_columns)
+        frozen.aggregates = list(query.aggregates)
+        frozen._compiled = {}
+        self._query = frozen
+
+    def explain(self) -> str:
+        """Describe how the query would be executed (see SimpleQuery.explain)."""
+        return self._query.explain()
+
+    def cursor(self) -> Iterator[Row]:
+        """Execute the query lazily (see SimpleQuery.cursor)."""
+        return self._query.cursor()
+
+    def __iter__(self) -> Iterator[Row]:
+        return self.cursor()
+
+    def execute(self) -> List[Row]:
+        """Execute the query and return its rows as a list."""
+        return self._query.execute()
 
 
 # ---------- JoinedTable ----------
 
 class JoinedTable:
-    """Inner join of two tables."""
+    """Inner join of two tables.
+
+    Strategies:
+        - "hash": build a hash table on the smaller input and probe with the other.
+        - "merge": walk sorted indexes on both join columns in step.
+        - "nested": compare every pair of rows.
+        - "auto" (default): "merge" when both join columns have a sorted
+          index and their keys compare with each other, otherwise "hash".
 
-    def __init__(self, left: Table, right: Table, left_col: str, right_col: str):
+    A merge join over keys that do not compare (e.g. strings against ints)
+    falls back to the hash join, which matches them by equality instead.
+
+    Every strategy returns rows in the same order as the nested loop:
+    left table order first, then right table order. The hash join builds
+    on the side with fewer rows according to the table statistics.
+    """
+
+    STRATEGIES = ("auto", "hash", "merge", "nested")
+
+    def __init__(self, left: Table, right: Table, left_col: str, right_col: str,
+                 strategy: str = "auto"):
         """
         Initialize an inner join between two tables.
 
@@ -97,22 +732,172 @@ class JoinedTable:
             right (Table): Right table.
             left_col (str): Column from the left table to join on.
             right_col (str): Column from the right table to join on.
+            strategy (str): Join algorithm, see class docstring.
+
+        Raises:
+            ValueError: If the strategy is unknown.
         """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown join strategy: {strategy}")
         self.left = left
         self.right = right
         self.left_col = left_col
         self.right_col = right_col
+        self.strategy = strategy
+
+    def _choose_strategy(self) -> str:
+        """Resolve "auto" to a concrete join algorithm."""
+        if self.strategy != "auto":
+            return self.strategy
+        left_index = self.left.indexes.get((self.left_col, "sorted"))
+        right_index = self.right.indexes.get((self.right_col, "sorted"))
+        if left_index is not None and right_index is not None and \
+                self._keys_compare(left_index, right_index):
+            return "merge"
+        return "hash"
+
+    @staticmethod
+    def _keys_compare(left_index: SortedIndex, right_index: SortedIndex) -> bool:
+        """Whether the smallest keys of two sorted indexes can be ordered against each other."""
+        left_key = next(iter(left_index.items()), (None,))[0]
+        right_key = next(iter(right_index.items()), (None,))[0]
+        if left_key is None or right_key is None:
+            return True
+        try:
+            left_key < right_key
+        except TypeError:
+            return False
+        return True
+
+    def explain(self) -> str:
+        """Describe the join algorithm that execute() will use."""
+        strategy = self._choose_strategy()
+        condition = f"{self.left.name}.{self.left_col} = {self.right.name}.{self.right_col}"
+        estimate = f"[est. {self.estimate_rows()} rows]"
+        if strategy == "hash":
+            build = self.right if self._build_right() else self.left
+            return f"HASH JOIN {condition} {estimate} [build: {build.name}]"
+        if strategy == "merge":
+            return f"MERGE JOIN {condition} {estimate}"
+        return f"NESTED LOOP JOIN {condition} {estimate}"
+
+    def estimate_rows(self) -> int:
+        """Estimate the number of joined rows from the table statistics."""
+        return estimate_join_rows(self.left.stats, self.left_col, self.right.stats, self.right_col)
+
+    def _build_right(self) -> bool:
+        """Whether the hash join should build on the right table (the smaller one)."""
+        return self.right.stats.row_count <= self.left.stats.row_count
 
     def execute(self) -> List[dict]:
         """
         Perform inner join and return merged rows as dictionaries.
 
+        With Database.enable_query_cache, the result is cached until either
+        table changes; cached dictionaries are shared, so treat them as read-only.
+
         Returns:
             List[dict]: List of joined rows combining both tables' data.
         """
+        cache = Database().query_cache
+        if cache is None:
+            return self._join()
+        key = ("join", self.left.name, self.left_col, self.right.name, self.right_col)
+        tables = [self.left, self.right]
+        versions = cache.versions(tables)
+        joined = cache.get(key, tables)
+        if joined is None:
+            joined = self._join()
+            cache.put(key, versions, joined)
+        return list(joined)
+
+    def _join(self) -> List[dict]:
+        strategy = self._choose_strategy()
+        if strategy == "merge":
+            try:
+                return self._merge_join()
+            except TypeError:  # keys that do not compare: match them by equality
+                return self._hash_join()
+        if strategy == "hash":
+            return self._hash_join()
+        return self._nested_loop_join()
+
+    def _nested_loop_join(self) -> List[dict]:
         joined = []
         for left_row in self.left.get_all():
             for right_row in self.right.get_all():
                 if left_row[self.left_col] == right_row[self.right_col]:
                     joined.append({**left_row.data, **right_row.data})
         return joined
+
+    def _hash_join(self) -> List[dict]:
+        left_rows = self.left.get_all()
+        right_rows = self.right.get_all()
+        joined = []
+
+        if self._build_right():
+            # Build on the right, probe in left order: output is already in order.
+            buckets: dict[Any, list] = {}
+            for right_row in right_rows:
+                buckets.setdefault(right_row[self.right_col], []).append(right_row)
+            for left_row in left_rows:
+                for right_row in buckets.get(left_row[self.left_col], ()):
+                    joined.append({**left_row.data, **right_row.data})
+            return joined
+
+        # Build on the left, probe in right order, then restore left-major order.
+        buckets = {}
+        for pos, left_row in enumerate(left_rows):
+            buckets.setdefault(left_row[self.left_col], []).append((pos, left_row))
+        pairs = []
+        for right_row in right_rows:
+            for pos, left_row in buckets.get(right_row[self.right_col], ()):
+                pairs.append((pos, left_row, right_row))
+        pairs.sort(key=lambda p: p[0])  # stable: keeps right order per left row
+        for _, left_row, right_row in pairs:
+            joined.append({**left_row.data, **right_row.data})
+        return joined
+
+    @staticmethod
+    def _sorted_index(table: Table, column: str) -> SortedIndex:
+        """Return the table's sorted index on a column, or a throwaway one."""
+        index = table.indexes.get((column, "sorted"))
+        if index is None:
+            index = SortedIndex(column)
+            index.add_many((row[column], row.id) for row in table.get_all())
+        return index
+
+    def _merge_join(self) -> List[dict]:
+        left_index = self._sorted_index(self.left, self.left_col)
+        right_index = self._sorted_index(self.right, self.right_col)
+        left_items = list(left_index.items())
+        right_items = list(right_index.items())
+
+        matches = []  # (left id, right id)
+        i = j = 0
+        while i < len(left_items) and j < len(right_items):
+            left_key, right_key = left_items[i][0], right_items[j][0]
+            if left_key < right_key:
+                i += 1
+            elif right_key < left_key:
+                j += 1
+            else:
+                i_end = i
+                while i_end < len(left_items) and left_items[i_end][0] == left_key:
+                    i_end += 1
+                j_end = j
+                while j_end < len(right_items) and right_items[j_end][0] == right_key:
+                    j_end += 1
+                for _, left_id in left_items[i:i_end]:
+                    for _, right_id in right_items[j:j_end]:
+                        matches.append((left_id, right_id))
+                i, j = i_end, j_end
+        # None == None holds in the nested loop, so null keys join each other too.
+        for left_id in left_index.null_ids():
+            for right_id in right_index.null_ids():
+                matches.append((left_id, right_id))
+
+        left_pos, right_pos = self.left.row_position, self.right.row_position
+        matches.sort(key=lambda m: (left_pos(m[0]), right_pos(m[1])))
+        get_left, get_right = self.left.get_by_id, self.right.get_by_id
+        return [{**get_left(l).data, **get_right(r).data} for l, r in matches]
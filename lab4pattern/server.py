@@ -0,0 +1,565 @@
+import argparse
+import asyncio
+import json
+import struct
+from contextlib import suppress
+from datetime import date
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+from datatypes import DateType, Row, RowLayout
+from factory import Database, _json_default
+from query import JoinedTable, SimpleQuery
+
+# One Database served over TCP, so the data is held once instead of once per
+# process:
+#
+#   python server.py --port 8765 --load mydb.json
+#
+#   async with await Client.connect("127.0.0.1", 8765) as client:
+#       rows = await client.query("users").where("age", ">", 23).order_by("age").execute()
+
+# ---------- Protocol ----------
+#
+# Every message is a frame: a 4-byte big-endian body length, then one compact
+# JSON object. A request is {"id": n, "op": name, ...fields}; its response is
+# {"id": n, "result": ...} or {"id": n, "error": message}. A connection may
+# send any number of requests before reading a response (pipelining), and
+# responses come back in request order.
+#
+# Query and join results are packed by row layout instead of one object per
+# row: {"layouts": [[column, ...]], "rows": [[layout, id, value, ...]],
+# "dates": [column, ...]}, where join rows have no id and the date columns
+# travel as ISO strings.
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+HIGH_WATER = 256 * 1024  # buffered response bytes before the server waits for the client
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default).encode
+
+
+def encode_frame(message: dict) -> bytes:
+    """Serialize one message into a length-prefixed frame."""
+    body = _encode(message).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[dict]:
+    """
+    Read one frame.
+
+    Returns:
+        dict | None: The message, or None when the peer closed the
+        connection between frames.
+
+    Raises:
+        ConnectionError: If the connection ends inside a frame.
+        ValueError: If the frame is too large or not a JSON object.
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ConnectionError("Connection closed inside a frame")
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"Frame of {size} bytes exceeds the {MAX_FRAME} byte limit")
+    try:
+        message = json.loads(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("Connection closed inside a frame")
+    if not isinstance(message, dict):
+        raise ValueError("A frame must hold a JSON object")
+    return message
+
+
+def _date_columns(table) -> List[str]:
+    return [c.name for c in table.columns.values() if isinstance(c.data_type, DateType)]
+
+
+def pack_rows(rows: List[Row], dates: List[str]) -> dict:
+    """Pack query result rows by layout (see the protocol notes above)."""
+    layouts: Dict[RowLayout, int] = {}
+    packed = []
+    for row in rows:
+        layout = row.layout
+        i = layouts.get(layout)
+        if i is None:
+            i = layouts[layout] = len(layouts)
+        if layout.absent:  # columns the row never had are not sent
+            packed.append([i, row.id, *(v for k, v in zip(layout.keys, row.values) if k not in layout.absent)])
+        else:
+            packed.append([i, row.id, *row.values])
+    return {"layouts": [[k for k in layout.keys if k not in layout.absent] for layout in layouts],
+            "rows": packed, "dates": dates}
+
+
+def pack_dicts(records: List[dict], dates: List[str]) -> dict:
+    """Pack join result dictionaries by key order, like pack_rows without ids."""
+    layouts: Dict[tuple, int] = {}
+    packed = []
+    for record in records:
+        keys = tuple(record)
+        i = layouts.get(keys)
+        if i is None:
+            i = layouts[keys] = len(layouts)
+        packed.append([i, *record.values()])
+    return {"layouts": [list(keys) for keys in layouts], "rows": packed, "dates": dates}
+
+
+def _decoders(result: dict) -> List[Callable[[list], list]]:
+    """Per layout: a function turning the ISO date strings of a packed row back into dates."""
+    dates = set(result["dates"])
+    decoders = []
+    for keys in result["layouts"]:
+        slots = [i for i, key in enumerate(keys) if key in dates]
+
+        def decode(values: list, slots=slots) -> list:
+            for i in slots:
+                if values[i] is not None:
+                    values[i] = date.fromisoformat(values[i])
+            return values
+
+        decoders.append(decode)
+    return decoders
+
+
+def unpack_rows(result: dict) -> List[Row]:
+    """Rebuild the Row objects of a packed query result."""
+    layouts = [RowLayout.of(keys) for keys in result["layouts"]]
+    decoders = _decoders(result) if result["dates"] else None
+    rows = []
+    for packed in result["rows"]:
+        i, row_id, values = packed[0], packed[1], packed[2:]
+        if decoders is not None:
+            values = decoders[i](values)
+        rows.append(Row.make(row_id, layouts[i], tuple(values)))
+    return rows
+
+
+def unpack_dicts(result: dict) -> List[dict]:
+    """Rebuild the dictionaries of a packed join result."""
+    layouts = result["layouts"]
+    decoders = _decoders(result) if result["dates"] else None
+    records = []
+    for packed in result["rows"]:
+        i, values = packed[0], packed[1:]
+        if decoders is not None:
+            values = decoders[i](values)
+        records.append(dict(zip(layouts[i], values)))
+    return records
+
+
+# ---------- Server ----------
+
+class QueryServer:
+    """asyncio TCP server executing protocol requests against one Database.
+
+    Requests run one at a time on the event loop, so table writes never
+    interleave, while reads and writes of the sockets of many clients
+    overlap. Each connection's requests are answered in order; responses are
+    buffered and only flushed to a slow client once HIGH_WATER bytes are
+    waiting.
+    """
+
+    # SimpleQuery builder methods a "query" request may call, in its order.
+    QUERY_CALLS = ("select", "where", "group_by", "aggregate", "order_by", "limit", "offset")
+
+    # Fields each operation requires, checked before it runs; others are optional.
+    REQUIRED_FIELDS = {
+        "create_table": ("table", "schema"),
+        "create_index": ("table", "column"),
+        "insert": ("table", "row"),
+        "insert_many": ("table", "rows"),
+        "update": ("table", "row_id", "data"),
+        "delete": ("table", "row_id"),
+        "query": ("table",),
+        "join": ("left", "right", "left_col", "right_col"),
+    }
+
+    def __init__(self, db: Optional[Database] = None):
+        """
+        Args:
+            db (Database | None): Database to serve (default: the singleton).
+        """
+        self.db = db or Database()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.ops: Dict[str, Callable[[dict], Any]] = {
+            "create_table": self._create_table,
+            "create_index": self._create_index,
+            "insert": self._insert,
+            "insert_many": self._insert_many,
+            "update": self._update,
+            "delete": self._delete,
+            "query": self._query,
+            "join": self._join,
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple[str, int]:
+        """
+        Start listening.
+
+        Args:
+            host (str): Interface to bind.
+            port (int): TCP port; 0 picks a free one.
+
+        Returns:
+            tuple: The (host, port) actually bound.
+        """
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Accept connections until the task is cancelled."""
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and wait for the listener to close."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                writer.write(encode_frame(self.handle(request)))
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # a broken or malformed stream ends this connection only
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    def handle(self, request: dict) -> dict:
+        """
+        Execute one request.
+
+        Errors of the request (unknown tables, constraint violations,
+        missing fields, or any other exception) are returned as
+        {"error": message}; the connection stays usable. Required fields
+        (see REQUIRED_FIELDS) are checked before the operation runs.
+
+        Returns:
+            dict: The response message.
+        """
+        request_id = request.get("id")
+        name = request.get("op")
+        try:
+            op = self.ops.get(name)
+            if op is None:
+                raise ValueError(f"Unknown operation: {name!r}")
+            missing = [field for field in self.REQUIRED_FIELDS[name] if field not in request]
+            if missing:
+                raise ValueError(f"Missing request field(s) for '{name}': {', '.join(missing)}")
+            return {"id": request_id, "result": op(request)}
+        except ValueError as e:
+            return {"id": request_id, "error": str(e)}
+        except Exception as e:  # keep serving the connection's other requests
+            return {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+
+    # ---- Operations ----
+    def _create_table(self, request: dict) -> None:
+        self.db.create_table_with_factory(request["table"], request["schema"])
+
+    def _create_index(self, request: dict) -> None:
+        self.db.get_table(request["table"]).create_index(request["column"], request.get("kind", "hash"))
+
+    def _insert(self, request: dict) -> int:
+        table = self.db.get_table(request["table"])
+        row = request["row"]
+        Database._decode_dates(row, _date_columns(table))
+        return table.insert(row).id
+
+    def _insert_many(self, request: dict) -> List[int]:
+        table = self.db.get_table(request["table"])
+        dates = _date_columns(table)
+        rows = request["rows"]
+        if dates:
+            for row in rows:
+                Database._decode_dates(row, dates)
+        return [row.id for row in table.insert_many(rows, request.get("by_column", False))]
+
+    def _update(self, request: dict) -> None:
+        table = self.db.get_table(request["table"])
+        data = request["data"]
+        Database._decode_dates(data, _date_columns(table))
+        table.update(request["row_id"], data)
+
+    def _delete(self, request: dict) -> None:
+        self.db.get_table(request["table"]).delete(request["row_id"])
+
+    def _query(self, request: dict) -> dict:
+        table = self.db.get_table(request["table"])
+        dates = _date_columns(table)
+        query = SimpleQuery(table)
+        for name, args in request.get("calls", []):
+            if name not in self.QUERY_CALLS:
+                raise ValueError(f"Unknown query call: {name!r}")
+            if name == "where" and args[0] in dates and isinstance(args[2], str):
+                args = [args[0], args[1], date.fromisoformat(args[2])]
+            getattr(query, name)(*args)
+        dates += [alias for function, column, alias in query.aggregates
+                  if column in dates and function in ("min", "max")]
+        return pack_rows(query.execute(), dates)
+
+    def _join(self, request: dict) -> dict:
+        left, right = self.db.get_table(request["left"]), self.db.get_table(request["right"])
+        join = JoinedTable(left, right, request["left_col"], request["right_col"],
+                           request.get("strategy", "auto"))
+        return pack_dicts(join.execute(), _date_columns(left) + _date_columns(right))
+
+
+# ---------- Client ----------
+
+class Connection:
+    """One client connection with pipelining.
+
+    request() writes its frame at once and waits for the matching response,
+    so concurrent callers share the socket without waiting for each other's
+    round trips; a background task reads responses and resolves them by id.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def open(cls, host: str, port: int) -> "Connection":
+        """Connect to a QueryServer."""
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests waiting for their response."""
+        return len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        return self._receiver.done()
+
+    async def request(self, op: str, **fields) -> Any:
+        """
+        Send one request and wait for its result.
+
+        Raises:
+            ValueError: If the server reports an error for the request.
+            ConnectionError: If the connection is or becomes closed.
+        """
+        if self.closed:
+            raise ConnectionError("Connection is closed")
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self._writer.write(encode_frame({**fields, "id": request_id, "op": op}))
+            await self._writer.drain()  # only waits while the send buffer is full
+            response = await future
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def _receive(self):
+        try:
+            while True:
+                response = await read_frame(self._reader)
+                if response is None:
+                    break
+                future = self._pending.get(response.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed by the server"))
+
+    async def close(self):
+        self._writer.close()
+        with suppress(ConnectionError):
+            await self._writer.wait_closed()
+        self._receiver.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._receiver
+
+
+class ConnectionPool:
+    """A fixed number of pipelined connections to one server.
+
+    Each request goes to the connection with the fewest requests in flight;
+    a connection the server dropped is reopened on its next use.
+    """
+
+    def __init__(self, host: str, port: int, connections: List[Connection]):
+        self.host = host
+        self.port = port
+        self._connections = connections
+
+    @classmethod
+    async def open(cls, host: str, port: int, size: int = 4) -> "ConnectionPool":
+        """
+        Open ``size`` connections.
+
+        Raises:
+            ValueError: If size is less than 1.
+        """
+        if size < 1:
+            raise ValueError("A pool needs at least one connection")
+        connections = await asyncio.gather(*(Connection.open(host, port) for _ in range(size)))
+        return cls(host, port, list(connections))
+
+    async def request(self, op: str, **fields) -> Any:
+        """Send a request on the least busy connection; see Connection.request."""
+        i = min(range(len(self._connections)), key=lambda j: self._connections[j].in_flight)
+        connection = self._connections[i]
+        if connection.closed:
+            connection = self._connections[i] = await Connection.open(self.host, self.port)
+        return await connection.request(op, **fields)
+
+    async def close(self):
+        await asyncio.gather(*(connection.close() for connection in self._connections))
+
+
+class RemoteQuery:
+    """SimpleQuery counterpart built on the client and executed by the server.
+
+    The builder methods take the same arguments as SimpleQuery's and are
+    replayed in order on the server; execute() returns the same Row objects.
+    """
+
+    def __init__(self, pool: ConnectionPool, table: str):
+        self._pool = pool
+        self.table = table
+        self.calls: List[tuple[str, list]] = []
+
+    def _call(self, name: str, *args) -> "RemoteQuery":
+        self.calls.append((name, list(args)))
+        return self
+
+    def select(self, columns: List[str]):
+        return self._call("select", columns)
+
+    def where(self, column: str, operator: str, value: Any):
+        return self._call("where", column, operator, value)
+
+    def group_by(self, columns: List[str]):
+        return self._call("group_by", columns)
+
+    def aggregate(self, function: str, column: Optional[str] = None, alias: Optional[str] = None):
+        return self._call("aggregate", function, column, alias)
+
+    def order_by(self, column: str, ascending: bool = True):
+        return self._call("order_by", column, ascending)
+
+    def limit(self, count: int):
+        return self._call("limit", count)
+
+    def offset(self, count: int):
+        return self._call("offset", count)
+
+    async def execute(self) -> List[Row]:
+        """
+        Run the query on the server.
+
+        Raises:
+            ValueError: If the server rejects the query.
+        """
+        return unpack_rows(await self._pool.request("query", table=self.table, calls=self.calls))
+
+
+class Client:
+    """Client library for a QueryServer, mirroring the in-process Table/SimpleQuery calls.
+
+    Every method is a coroutine; calls made concurrently (e.g. with
+    asyncio.gather) are pipelined over the pool's connections.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765, pool_size: int = 4) -> "Client":
+        """Open a client with ``pool_size`` connections."""
+        return cls(await ConnectionPool.open(host, port, pool_size))
+
+    async def create_table(self, name: str, schema: dict):
+        await self.pool.request("create_table", table=name, schema=schema)
+
+    async def create_index(self, table: str, column: str, kind: str = "hash"):
+        await self.pool.request("create_index", table=table, column=column, kind=kind)
+
+    async def insert(self, table: str, row: dict[str, Any]) -> int:
+        """Insert a row; return its id."""
+        return await self.pool.request("insert", table=table, row=row)
+
+    async def insert_many(self, table: str, rows: List[dict[str, Any]], by_column: bool = False) -> List[int]:
+        """Insert rows all-or-nothing; return their ids."""
+        return await self.pool.request("insert_many", table=table, rows=rows, by_column=by_column)
+
+    async def update(self, table: str, row_id: int, data: dict[str, Any]):
+        await self.pool.request("update", table=table, row_id=row_id, data=data)
+
+    async def delete(self, table: str, row_id: int):
+        await self.pool.request("delete", table=table, row_id=row_id)
+
+    def query(self, table: str) -> RemoteQuery:
+        """Start a query on a table; finish it with ``await query.execute()``."""
+        return RemoteQuery(self.pool, table)
+
+    async def join(self, left: str, right: str, left_col: str, right_col: str,
+                   strategy: str = "auto") -> List[dict]:
+        """Inner join two tables on the server; same result as JoinedTable.execute."""
+        result = await self.pool.request("join", left=left, right=right, left_col=left_col,
+                                         right_col=right_col, strategy=strategy)
+        return unpack_dicts(result)
+
+    async def close(self):
+        await self.pool.close()
+
+    async def __aenter__(self) -> "Client":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ---------- Command line ----------
+
+async def _main(args: argparse.Namespace):
+    db = Database(args.name)
+    if args.load:
+        db.load_from_json(args.load)
+    server = QueryServer(db)
+    host, port = await server.start(args.host, args.port)
+    print(f"MiniDB server listening on {host}:{port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a MiniDB database over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--name", default="MyDB", help="database name")
+    parser.add_argument("--load", help="JSON, NDJSON or binary snapshot file to serve")
+    args = parser.parse_args()
+    with suppress(KeyboardInterrupt):
+        asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import copy
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import date
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional
+from datatypes import Column, Row, RowLayout, IntegerType, BooleanType, DateType
+from storage import STORAGE_KINDS, RowView, decode_date
+
+# ---------- Binary snapshot format ----------
+#
+#   MAGIC
+#   sections, each padded to 8 bytes:
+#       ids            int64[n]           row ids in table order
+#       sorted_ids     int64[n]           only when ids are not ascending,
+#       sorted_pos     int64[n]           with the matching positions
+#       per column:
+#           nulls      uint8[n]           only when the column has NULLs
+#           values     int64[n]           IntegerType
+#                      int8[n]            BooleanType
+#                      int32[n]           DateType (proleptic ordinal)
+#           offsets    uint64[n + 1]      StringType: byte offsets into blob
+#           blob       utf-8 bytes
+#   footer             JSON: database name, lsn, table schemas, section offsets
+#   uint64             footer offset
+#   MAGIC
+
+MAGIC = b"MDBSNAP1"
+_TRAILER = struct.Struct("<Q8s")
+
+_FIXED = {  # DataType -> (array typecode, encode, decode)
+    IntegerType: ("q", None, None),
+    BooleanType: ("b", int, bool),
+    DateType: ("i", date.toordinal, decode_date),
+}
+
+
+def fixed_layout(column: Column):
+    """Return (array typecode, encode, decode) of a fixed-width column, or None for strings."""
+    for dtype, layout in _FIXED.items():
+        if isinstance(column.data_type, dtype):
+            return layout
+    return None
+
+
+def is_snapshot(filepath: str) -> bool:
+    """Check whether a file starts with the binary snapshot magic."""
+    with open(filepath, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# ---------- Writing ----------
+
+class _SectionWriter:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.offset = 0
+
+    def write(self, data: bytes) -> int:
+        """Write an 8-byte aligned section and return its offset."""
+        start = self.offset
+        self.f.write(data)
+        pad = -len(data) % 8
+        self.f.write(b"\0" * pad)
+        self.offset += len(data) + pad
+        return start
+
+
+def write_snapshot(db, f: BinaryIO):
+    """
+    Write every table of a database to an open binary file.
+
+    Raises:
+        ValueError: If an integer does not fit in 64 bits.
+    """
+    out = _SectionWriter(f)
+    out.write(MAGIC)
+    tables = []
+    for table in db.tables.values():
+        ids = array("q", table._store.ids())
+        entry = {"schema": table.schema_dict(), "rows": len(ids), "ids": out.write(ids.tobytes())}
+        if any(a >= b for a, b in zip(ids, ids[1:])):
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            entry["sorted_ids"] = out.write(array("q", (ids[p] for p in order)).tobytes())
+            entry["sorted_pos"] = out.write(array("q", order).tobytes())
+        columns = {}
+        for column in table.columns.values():
+            values = table.column_values(column.name)
+            section = {}
+            if any(v is None for v in values):
+                section["nulls"] = out.write(bytes(v is None for v in values))
+            layout = fixed_layout(column)
+            if layout:
+                typecode, encode, _ = layout
+                try:
+                    data = array(typecode, (0 if v is None else encode(v) if encode else v
+                                            for v in values))
+                except OverflowError as e:
+                    raise ValueError(f"Column '{column.name}' does not fit the snapshot format: {e}")
+                section["values"] = out.write(data.tobytes())
+            else:
+                encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+                offsets = array("Q", [0])
+                for chunk in encoded:
+                    offsets.append(offsets[-1] + len(chunk))
+                section["offsets"] = out.write(offsets.tobytes())
+                section["blob"] = out.write(b"".join(encoded))
+            columns[column.name] = section
+        entry["columns"] = columns
+        tables.append(entry)
+    footer = json.dumps({"name": db.name, "lsn": db._lsn, "tables": tables},
+                        separators=(",", ":")).encode("utf-8")
+    footer_offset = out.write(footer)
+    f.write(_TRAILER.pack(footer_offset, MAGIC))
+
+
+# ---------- Reading ----------
+
+class _MappedColumn:
+    """Read-only view of one column inside the mapped file."""
+
+    def __init__(self, buf: memoryview, column: Column, section: dict, n: int):
+        self.nulls = buf[section["nulls"]:section["nulls"] + n] if "nulls" in section else None
+        layout = fixed_layout(column)
+        if layout:
+            typecode, _, self._decode = layout
+            size = array(typecode).itemsize
+            start = section["values"]
+            self.values = buf[start:start + size * n].cast(typecode)
+            self.offsets = None
+        else:
+            self._decode = None
+            start = section["offsets"]
+            self.offsets = buf[start:start + 8 * (n + 1)].cast("Q")
+            self.blob = buf[section["blob"]:section["blob"] + self.offsets[n]]
+
+    def __getitem__(self, pos: int) -> Any:
+        if self.nulls is not None and self.nulls[pos]:
+            return None
+        if self.offsets is not None:
+            return str(self.blob[self.offsets[pos]:self.offsets[pos + 1]], "utf-8")
+        value = self.values[pos]
+        return self._decode(value) if self._decode else value
+
+    def to_list(self) -> List[Any]:
+        if self.offsets is not None:
+            offsets, blob = self.offsets.tolist(), self.blob
+            values = [str(blob[a:b], "utf-8") for a, b in zip(offsets, offsets[1:])]
+        else:
+            values = self.values.tolist()
+            if self._decode:
+                values = [self._decode(v) for v in values]
+        if self.nulls is not None:
+            values = [None if null else v for v, null in zip(values, self.nulls)]
+        return values
+
+
+class MappedStore:
+    """Storage backed by a memory-mapped binary snapshot.
+
+    Rows are decoded only when read; get() bisects the id section. The first
+    write copies the data into a store of the table's declared kind (a
+    RowStore or a ColumnStore), which serves everything after.
+    """
+
+    def __init__(self, buf: memoryview, columns: Iterable[Column], entry: dict,
+                 layout: Optional[RowLayout] = None, kind: str = "columnar"):
+        self.kind = kind
+        self._columns = list(columns)
+        n = self._n = entry["rows"]
+        self._ids = buf[entry["ids"]:entry["ids"] + 8 * n].cast("q")
+        if "sorted_ids" in entry:
+            self._sorted_ids = buf[entry["sorted_ids"]:entry["sorted_ids"] + 8 * n].cast("q")
+            self._sorted_pos = buf[entry["sorted_pos"]:entry["sorted_pos"] + 8 * n].cast("q")
+        else:
+            self._sorted_ids, self._sorted_pos = self._ids, None
+        self._mapped = {c.name: _MappedColumn(buf, c, entry["columns"][c.name], n)
+                        for c in self._columns}
+        self._layout = layout or RowLayout.of(self._mapped)
+        self._copy = None  # RowStore or ColumnStore, made by the first write
+
+    # ---- writes: copy on first use ----
+    def _writable(self):
+        if self._copy is None:
+            store = STORAGE_KINDS[self.kind](self._columns, self._layout)
+            for pos in range(self._n):
+                store.append(self.row_at(pos))
+            self._copy = store
+        return self._copy
+
+    def append(self, row: Row):
+        self._writable().append(row)
+
+    def set(self, row: Row, column: str, value: Any):
+        self._writable().set(row, column, value)
+
+    def remove(self, row: Row):
+        self._writable().remove(row)
+
+    def vacuum(self) -> int:
+        return self._copy.vacuum() if self._copy is not None else 0
+
+    def snapshot(self):
+        """Return a read-only copy; the mapped data never changes, so it is shared as is."""
+        if self._copy is not None:
+            return self._copy.snapshot()
+        return copy.copy(self)
+
+    # ---- reads ----
+    def _find(self, row_id: int) -> Optional[int]:
+        i = bisect_left(self._sorted_ids, row_id)
+        if i < self._n and self._sorted_ids[i] == row_id:
+            return i if self._sorted_pos is None else self._sorted_pos[i]
+        return None
+
+    def row_at(self, pos: int) -> Row:
+        if self._copy is not None:
+            return self._copy.rows_at([pos])[0]
+        return Row.make(self._ids[pos], self._layout, tuple(column[pos] for column in self._mapped.values()))
+
+    def get(self, row_id: int) -> Optional[Row]:
+        if self._copy is not None:
+            return self._copy.get(row_id)
+        pos = self._find(row_id)
+        return None if pos is None else self.row_at(pos)
+
+    def position(self, row_id: int) -> int:
+        if self._copy is not None:
+            return self._copy.position(row_id)
+        return self._find(row_id)
+
+    def rows(self):
+        if self._copy is not None:
+            return self._copy.rows()
+        return RowView(self)
+
+    def rows_at(self, positions: Iterable[int]) -> List[Row]:
+        if self._copy is not None:
+            return self._copy.rows_at(positions)
+        return [self.row_at(p) for p in positions]
+
+    def ids(self) -> List[int]:
+        if self._copy is not None:
+            return self._copy.ids()
+        return self._ids.tolist()
+
+    def column(self, name: str) -> List[Any]:
+        if self._copy is not None:
+            return self._copy.column(name)
+        return self._mapped[name].to_list()
+
+    def __contains__(self, row_id: int) -> bool:
+        if self._copy is not None:
+            return row_id in self._copy
+        return self._find(row_id) is not None
+
+    def __len__(self):
+        return len(self._copy) if self._copy is not None else self._n
+
+    def max_id(self) -> Optional[int]:
+        """Return the largest stored row id, or None when empty."""
+        return self._sorted_ids[self._n - 1] if self._n else None
+
+
+def map_snapshot(filepath: str):
+    """
+    Map a binary snapshot and build its tables without decoding any rows.
+
+    Args:
+        filepath (str): Snapshot path.
+
+    Returns:
+        tuple: (mapping, database name, lsn, {table name: Table}). The
+        mapping must stay open while the tables use it.
+
+    Raises:
+        ValueError: If the file is not a binary snapshot.
+    """
+    from factory import TYPE_REGISTRY
+    from table import Table
+    with open(filepath, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = memoryview(mapping)
+    if len(buf) < len(MAGIC) + _TRAILER.size or buf[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a MiniDB binary snapshot")
+    footer_offset, trailer_magic = _TRAILER.unpack(buf[-_TRAILER.size:])
+    if trailer_magic != MAGIC:
+        raise ValueError("Truncated MiniDB binary snapshot")
+    footer = json.loads(bytes(buf[footer_offset:len(buf) - _TRAILER.size]).rstrip(b"\0"))
+
+    tables: Dict[str, Any] = {}
+    for entry in footer["tables"]:
+        table = Table.from_schema(entry["schema"], TYPE_REGISTRY)
+        store = MappedStore(buf, table.columns.values(), entry, table.layout, table.storage)
+        table.attach_store(store)
+        tables[table.name] = table
+        if store.max_id() is not None:
+            # Keep ids assigned later unique, as Row.from_dict does.
+            Row._id_counter = max(Row._id_counter, store.max_id() + 1)
+    return mapping, footer["name"], footer["lsn"], tables
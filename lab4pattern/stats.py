@@ -0,0 +1,335 @@
+import math
+import random
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from datatypes import Row
+
+SAMPLE_SIZE = 1024        # rows kept in the reservoir sample
+HISTOGRAM_BUCKETS = 32    # equi-depth buckets per column
+_MASK64 = (1 << 64) - 1
+
+# ---------- Distinct-count sketch ----------
+
+_SALT = 0x5BD1E995  # two rounds of the tuple hash mix small ints well enough, in C
+
+
+class DistinctSketch:
+    """HyperLogLog estimate of the number of distinct values (about 3% error).
+
+    Removals cannot be undone in the registers, so after deletes and updates
+    the estimate is an upper bound until the statistics are rebuilt.
+    """
+
+    def __init__(self, bits: int = 10):
+        self.bits = bits
+        self.registers = bytearray(1 << bits)
+        self._tail = 64 - bits
+        self._estimate: Optional[float] = 0.0
+
+    def add(self, value: Any):
+        h = hash((hash((value, _SALT)), _SALT)) & _MASK64
+        rank = self._tail - (h & ((1 << self._tail) - 1)).bit_length() + 1
+        slot = h >> self._tail
+        if rank > self.registers[slot]:
+            self.registers[slot] = rank
+            self._estimate = None
+
+    def add_many(self, values: Iterable[Any]):
+        registers, tail = self.registers, self._tail
+        low = (1 << tail) - 1
+        changed = False
+        for value in values:
+            h = hash((hash((value, _SALT)), _SALT)) & _MASK64
+            rank = tail - (h & low).bit_length() + 1
+            slot = h >> tail
+            if rank > registers[slot]:
+                registers[slot] = rank
+                changed = True
+        if changed:
+            self._estimate = None
+
+    def estimate(self) -> float:
+        """Return the estimated number of distinct values added."""
+        if self._estimate is None:
+            m = len(self.registers)
+            raw = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            # Small cardinalities: linear counting is more accurate.
+            self._estimate = m * math.log(m / zeros) if raw <= 2.5 * m and zeros else raw
+        return self._estimate
+
+
+# ---------- Column and table statistics ----------
+
+class ColumnStats:
+    """Null count, min/max and distinct-count sketch of one column.
+
+    Unique columns (primary keys) need no sketch: every value is distinct.
+    """
+
+    def __init__(self, unique: bool = False):
+        self.nulls = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.range_stale = False  # min or max was removed; recompute on use
+        self.distinct: Optional[DistinctSketch] = None if unique else DistinctSketch()
+
+    def add_many(self, values: List[Any]):
+        """Fold a batch of values into the statistics."""
+        present = [v for v in values if v is not None]
+        self.nulls += len(values) - len(present)
+        if not present:
+            return
+        low, high = min(present), max(present)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        if self.distinct is not None:
+            self.distinct.add_many(set(present))
+
+    def remove(self, value: Any):
+        if value is None:
+            self.nulls -= 1
+        elif value == self.min or value == self.max:
+            self.range_stale = True
+
+
+class TableStats:
+    """Statistics of one table, kept up to date as rows are inserted, updated and deleted.
+
+    Exact row and null counts; min/max per column; a HyperLogLog sketch of
+    the distinct values per column; and equi-depth histograms built from a
+    reservoir sample of rows, rebuilt lazily after the sample changes.
+
+    Inserted rows are buffered and folded in one column at a time every
+    FLUSH_AT rows (or before any read, update or delete), which keeps the
+    cost of a single insert to a list append.
+
+    Args:
+        columns (Iterable[str]): Column names.
+        column_values (Callable): Returns a column's values, used to
+            recompute min/max after the current extreme was removed.
+        unique (Iterable[str]): Columns whose non-null values are all distinct.
+        seed (int): Seed of the reservoir sampling.
+    """
+
+    FLUSH_AT = 256
+
+    def __init__(self, columns: Iterable[str], column_values: Callable[[str], List[Any]],
+                 unique: Iterable[str] = (), seed: int = 0):
+        self.row_count = 0
+        unique = set(unique)
+        self._columns: Dict[str, ColumnStats] = {name: ColumnStats(name in unique) for name in columns}
+        self._column_values = column_values
+        self._pending: List[Row] = []  # rows not folded in yet
+        self._random = random.Random(seed)
+        # Reservoir sample (Algorithm L): random numbers are drawn only for
+        # rows that enter the sample; _next is the row count at which the
+        # next one does.
+        self._seen = 0
+        self._next = 1
+        self._weight = 0.0
+        self._sample_ids: List[int] = []
+        self._sample: Dict[int, Dict[str, Any]] = {}  # row id -> sampled values
+        self._histograms: Optional[Dict[str, List[Any]]] = None
+
+    # ---- Maintenance ----
+    def add(self, row: Row):
+        """Account for an inserted row."""
+        self.row_count += 1
+        self._pending.append(row)
+        if len(self._pending) >= self.FLUSH_AT:
+            self._flush()
+        self._seen += 1
+        if self._seen == self._next:
+            self._sample_row(row)
+
+    def add_many(self, rows: List[Row]):
+        """Account for a batch of inserted rows."""
+        self.row_count += len(rows)
+        self._pending.extend(rows)
+        self._flush()
+        for row in rows:
+            self._seen += 1
+            if self._seen == self._next:
+                self._sample_row(row)
+
+    def _flush(self):
+        """Fold the buffered rows into the column statistics."""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        names = list(self._columns)
+        layouts = set(map(attrgetter("layout.base"), rows))
+        if len(layouts) == 1:
+            # The usual case: read every column out of the values tuples in C.
+            columns = zip(*map(layouts.pop().reader(names), map(attrgetter("values"), rows)))
+        else:
+            columns = ([row[name] for row in rows] for name in names)
+        for column, values in zip(self._columns.values(), columns):
+            column.add_many(list(values))
+
+    def column(self, name: str) -> ColumnStats:
+        """Return the up-to-date statistics of one column."""
+        self._flush()
+        return self._columns[name]
+
+    def _sample_row(self, row: Row):
+        if len(self._sample_ids) < SAMPLE_SIZE:
+            self._sample_ids.append(row.id)
+            if len(self._sample_ids) < SAMPLE_SIZE:
+                self._next = self._seen + 1
+            else:
+                self._weight = math.exp(math.log(self._uniform()) / SAMPLE_SIZE)
+                self._skip()
+        else:
+            slot = self._random.randrange(SAMPLE_SIZE)
+            del self._sample[self._sample_ids[slot]]
+            self._sample_ids[slot] = row.id
+            self._weight *= math.exp(math.log(self._uniform()) / SAMPLE_SIZE)
+            self._skip()
+        self._sample[row.id] = {name: row[name] for name in self._columns}
+        self._histograms = None
+
+    def _uniform(self) -> float:
+        """Random number in the open interval (0, 1)."""
+        u = 0.0
+        while u == 0.0:
+            u = self._random.random()
+        return u
+
+    def _skip(self):
+        gap = math.floor(math.log(self._uniform()) / math.log(1 - self._weight))
+        self._next = self._seen + gap + 1
+
+    def remove(self, row: Row):
+        """Account for a deleted row."""
+        self._flush()
+        self.row_count -= 1
+        for name, column in self._columns.items():
+            column.remove(row[name])
+        if self._sample.pop(row.id, None) is not None:
+            self._sample_ids.remove(row.id)
+            self._next = self._seen + 1  # refill from the next insert
+            self._histograms = None
+
+    def update(self, row: Row, column: str, old: Any, new: Any):
+        """Account for one changed value of a stored row."""
+        stats = self.column(column)
+        stats.remove(old)
+        stats.add_many([new])
+        sampled = self._sample.get(row.id)
+        if sampled is not None:
+            sampled[column] = new
+            self._histograms = None
+
+    # ---- Estimates ----
+    def value_range(self, column: str) -> tuple[Any, Any]:
+        """Return (min, max) of the column's non-null values, or (None, None)."""
+        stats = self.column(column)
+        if stats.range_stale:
+            present = [v for v in self._column_values(column) if v is not None]
+            stats.min, stats.max = (min(present), max(present)) if present else (None, None)
+            stats.range_stale = False
+        return stats.min, stats.max
+
+    def distinct(self, column: str) -> int:
+        """Estimated number of distinct non-null values, at most the non-null count."""
+        stats = self.column(column)
+        present = self.row_count - stats.nulls
+        if stats.distinct is None:
+            return present
+        return min(present, max(round(stats.distinct.estimate()), 1 if present else 0))
+
+    def histogram(self, column: str) -> List[Any]:
+        """Return the equi-depth bucket bounds of a column (empty without non-null values)."""
+        if self._histograms is None:
+            self._histograms = {}
+            for name in self._columns:
+                values = sorted(v for v in (s[name] for s in self._sample.values()) if v is not None)
+                if not values:
+                    self._histograms[name] = []
+                    continue
+                buckets = min(HISTOGRAM_BUCKETS, len(values))
+                bounds = [values[i * len(values) // buckets] for i in range(buckets)]
+                self._histograms[name] = bounds + [values[-1]]
+        return self._histograms[column]
+
+    def _fraction_below(self, column: str, value: Any, inclusive: bool) -> float:
+        """Estimated fraction of non-null values below (or up to) value."""
+        low, high = self.value_range(column)
+        if value < low or (value == low and not inclusive):
+            return 0.0
+        if value > high or (value == high and inclusive):
+            return 1.0
+        bounds = self.histogram(column)
+        if len(bounds) < 2:
+            return 0.5
+        find = bisect_right if inclusive else bisect_left
+        bucket = min(max(find(bounds, value) - 1, 0), len(bounds) - 2)
+        start, end = bounds[bucket], bounds[bucket + 1]
+        within = 0.5
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and end > start:
+            within = min(max((value - start) / (end - start), 0.0), 1.0)
+        return (bucket + within) / (len(bounds) - 1)
+
+    def selectivity(self, column: str, operator: str, value: Any) -> Optional[float]:
+        """
+        Estimate the fraction of rows for which ``column <operator> value`` holds.
+
+        Returns:
+            float | None: Fraction in [0, 1], or None when the column or
+            operator is unknown or the value is not comparable.
+        """
+        if column not in self._columns or operator not in ("=", ">", "<"):
+            return None
+        stats = self.column(column)
+        if self.row_count == 0:
+            return 0.0
+        if value is None:
+            return stats.nulls / self.row_count if operator == "=" else 0.0
+        present = (self.row_count - stats.nulls) / self.row_count
+        if not present:
+            return 0.0
+        try:
+            if operator == "=":
+                low, high = self.value_range(column)
+                if value < low or value > high:
+                    return 0.0
+                return present / self.distinct(column)
+            below = self._fraction_below(column, value, inclusive=operator == ">")
+        except TypeError:
+            return None
+        return present * (1.0 - below if operator == ">" else below)
+
+    # ---- Bulk ----
+    @staticmethod
+    def build(columns: Iterable[str], column_values: Callable[[str], List[Any]],
+              ids: List[int], unique: Iterable[str] = (), seed: int = 0) -> "TableStats":
+        """Compute statistics for rows stored in bulk (e.g. loaded from a snapshot)."""
+        stats = TableStats(columns, column_values, unique, seed)
+        n = stats.row_count = stats._seen = len(ids)
+        picked = sorted(stats._random.sample(range(n), min(n, SAMPLE_SIZE)))
+        stats._sample_ids = [ids[p] for p in picked]
+        stats._sample = {row_id: {} for row_id in stats._sample_ids}
+        for name, column in stats._columns.items():
+            values = column_values(name)
+            column.add_many(values)
+            for p, row_id in zip(picked, stats._sample_ids):
+                stats._sample[row_id][name] = values[p]
+        if len(picked) == SAMPLE_SIZE:
+            stats._weight = math.exp(math.log(stats._uniform()) / SAMPLE_SIZE)
+            stats._skip()
+        else:
+            stats._next = n + 1
+        return stats
+
+
+def estimate_join_rows(left: TableStats, left_column: str, right: TableStats, right_column: str) -> int:
+    """Estimate the size of an equi-join, assuming the smaller key set is contained in the larger."""
+    left_stats, right_stats = left.column(left_column), right.column(right_column)
+    matched = (left.row_count - left_stats.nulls) * (right.row_count - right_stats.nulls)
+    keys = max(left.distinct(left_column), right.distinct(right_column), 1)
+    return round(matched / keys + left_stats.nulls * right_stats.nulls)  # NULL keys join each other
@@ -0,0 +1,523 @@
+import copy
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import date
+from itertools import compress
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from datatypes import Column, Row, RowLayout, IntegerType, BooleanType, DateType, StringType
+
+# ---------- Dictionary encoding ----------
+
+class StringDictionary:
+    """Intern table of a dictionary-encoded string column.
+
+    Each distinct string is kept once and numbered in first-seen order.
+    Codes are never reused or renumbered, so a store and its snapshots can
+    share one dictionary while the store keeps adding strings.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []  # code -> string
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        """Return the code of a string, adding it on first use."""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def code(self, value: Any) -> Optional[int]:
+        """Return the code of a string, or None if no row ever held it."""
+        return self._codes.get(value)
+
+    def intern(self, value: str) -> str:
+        """Return the shared copy of a string."""
+        return self.strings[self.encode(value)]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def dictionary_columns(columns: Iterable[Column]) -> List[str]:
+    """Names of the dictionary-encoded string columns."""
+    return [c.name for c in columns if isinstance(c.data_type, StringType) and c.data_type.dictionary]
+
+
+# ---------- Row storage ----------
+
+class RowStore:
+    """Row-oriented storage: a list of Row objects plus an id -> Row map.
+
+    remove() leaves a tombstone (None) in the list instead of shifting it;
+    scans skip tombstones, and the list is compacted by vacuum(), which
+    also runs by itself once tombstones outnumber the live rows.
+
+    snapshot() shares the containers with a read-only copy; the first write
+    afterwards copies them, and set() replaces a shared Row instead of
+    changing it, so the snapshot never sees later writes.
+
+    Values of dictionary-encoded columns are interned: rows holding the same
+    string share one str object.
+    """
+
+    kind = "row"
+
+    def __init__(self, columns: Iterable[Column], layout: Optional[RowLayout] = None):
+        # Rows carry their layout; the table's one needs no keeping here.
+        self._dictionaries = {name: StringDictionary() for name in dictionary_columns(columns)}
+        self._rows: List[Optional[Row]] = []  # None marks a removed row
+        self._by_id: Dict[int, Row] = {}
+        self._slot: Dict[int, int] = {}  # row id -> index in _rows
+        self._dead = 0
+        self._live: Optional[List[Row]] = None  # _rows without tombstones, built on demand
+        self._shared = False  # containers are shared with a snapshot
+        self._owned: Optional[set] = None  # ids of rows no snapshot holds; None: all of them
+
+    def snapshot(self) -> "RowStore":
+        """Return a read-only copy of the store as it is now (copy-on-write, O(1))."""
+        self.vacuum()
+        frozen = copy.copy(self)
+        self._shared = True
+        self._owned = set()
+        return frozen
+
+    def _detach(self):
+        """Copy the containers shared with a snapshot before changing them."""
+        self._rows = list(self._rows)
+        self._by_id = dict(self._by_id)
+        self._slot = dict(self._slot)
+        self._shared = False
+
+    def _intern(self, row: Row):
+        values, slots = list(row.values), row.layout.slots
+        for name, dictionary in self._dictionaries.items():
+            slot = slots.get(name)
+            if slot is not None and values[slot] is not None:
+                values[slot] = dictionary.intern(values[slot])
+        row.values = tuple(values)
+
+    def append(self, row: Row):
+        """Store a new row."""
+        if self._shared:
+            self._detach()
+        if self._dictionaries:
+            self._intern(row)
+        if self._owned is not None:
+            self._owned.add(row.id)
+        self._slot[row.id] = len(self._rows)
+        self._rows.append(row)
+        self._by_id[row.id] = row
+        if self._live is not None:
+            self._live.append(row)
+
+    def get(self, row_id: int) -> Optional[Row]:
+        """Return the row with the given id, or None."""
+        return self._by_id.get(row_id)
+
+    def set(self, row: Row, column: str, value: Any):
+        """Write one value of a stored row."""
+        if self._shared:
+            self._detach()
+        stored = self._by_id[row.id]
+        if self._owned is not None and row.id not in self._owned:
+            # A snapshot holds this Row object: store a changed copy instead
+            # (the values tuple is immutable and can be shared).
+            stored = Row.make(stored.id, stored.layout, stored.values)
+            self._by_id[row.id] = self._rows[self._slot[row.id]] = stored
+            self._owned.add(row.id)
+            self._live = None
+        dictionary = self._dictionaries.get(column)
+        if dictionary is not None and value is not None:
+            value = dictionary.intern(value)
+        stored[column] = value
+
+    def remove(self, row: Row):
+        """Remove a stored row, leaving a tombstone in its slot."""
+        if self._shared:
+            self._detach()
+        if self._owned is not None:
+            self._owned.discard(row.id)
+        self._rows[self._slot.pop(row.id)] = None
+        del self._by_id[row.id]
+        self._dead += 1
+        self._live = None
+        if self._dead > len(self._by_id):
+            self.vacuum()
+
+    def vacuum(self) -> int:
+        """Compact the row list; return the number of tombstones dropped."""
+        dead = self._dead
+        if dead:
+            self._rows = self.rows()
+            self._slot = {row.id: pos for pos, row in enumerate(self._rows)}
+            self._dead = 0
+            self._live = None
+        return dead
+
+    def position(self, row_id: int) -> int:
+        """Return a sort key reflecting the row's position in storage order."""
+        return self._slot[row_id]
+
+    def rows(self) -> List[Row]:
+        """Return all rows in storage order."""
+        if not self._dead:
+            return self._rows
+        if self._live is None:
+            self._live = [row for row in self._rows if row is not None]
+        return self._live
+
+    def rows_at(self, positions: Iterable[int]) -> List[Row]:
+        """Return the rows at the given storage positions."""
+        rows = self.rows()
+        return [rows[p] for p in positions]
+
+    def ids(self) -> List[int]:
+        """Return all row ids in storage order."""
+        return [r.id for r in self.rows()]
+
+    def column(self, name: str) -> List[Any]:
+        """Return one column's values in storage order."""
+        return [r[name] for r in self.rows()]
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self._by_id
+
+    def __len__(self):
+        return len(self._by_id)
+
+
+# ---------- Column storage ----------
+
+class ColumnVector:
+    """Values of one column in a typed array, with a null mask allocated on first None.
+
+    Args:
+        typecode (str | None): ``array`` typecode, or None to keep Python objects in a list.
+        encode (Callable | None): Converts a value to its stored form.
+        decode (Callable | None): Converts a stored value back.
+    """
+
+    def __init__(self, typecode: Optional[str] = None,
+                 encode: Optional[Callable] = None, decode: Optional[Callable] = None):
+        self.typecode = typecode
+        self.values = array(typecode) if typecode else []
+        self.nulls: Optional[bytearray] = None  # one byte per row, 1 = NULL
+        self._encode = encode
+        self._decode = decode
+        self._empty = 0 if typecode else None
+
+    def _stored(self, value: Any) -> Any:
+        if value is None:
+            return self._empty
+        return self._encode(value) if self._encode else value
+
+    def append(self, value: Any):
+        """Append a value; raises ValueError if it does not fit the array type."""
+        try:
+            self.values.append(self._stored(value))
+        except (OverflowError, TypeError) as e:
+            raise ValueError(f"Value {value!r} cannot be stored in a columnar column: {e}")
+        if value is None and self.nulls is None:
+            self.nulls = bytearray(len(self.values) - 1)
+        if self.nulls is not None:
+            self.nulls.append(value is None)
+
+    def pop(self):
+        """Drop the last value (used to roll back a partial append)."""
+        self.values.pop()
+        if self.nulls is not None:
+            self.nulls.pop()
+
+    def __getitem__(self, pos: int) -> Any:
+        if self.nulls is not None and self.nulls[pos]:
+            return None
+        value = self.values[pos]
+        return self._decode(value) if self._decode else value
+
+    def __setitem__(self, pos: int, value: Any):
+        try:
+            self.values[pos] = self._stored(value)
+        except (OverflowError, TypeError) as e:
+            raise ValueError(f"Value {value!r} cannot be stored in a columnar column: {e}")
+        if value is None and self.nulls is None:
+            self.nulls = bytearray(len(self.values))
+        if self.nulls is not None:
+            self.nulls[pos] = value is None
+
+    def clone(self) -> "ColumnVector":
+        """Return an independent copy of the vector."""
+        twin = copy.copy(self)
+        twin.values = copy.copy(self.values)
+        twin.nulls = None if self.nulls is None else bytearray(self.nulls)
+        return twin
+
+    def compacted(self, mask: bytearray) -> "ColumnVector":
+        """Return a copy without the values whose mask byte is 0."""
+        twin = copy.copy(self)
+        values = compress(self.values, mask)
+        twin.values = array(self.typecode, values) if self.typecode else list(values)
+        if self.nulls is not None:
+            twin.nulls = bytearray(compress(self.nulls, mask))
+        return twin
+
+    def __len__(self):
+        return len(self.values)
+
+    def take(self, positions: List[int]) -> List[Any]:
+        """Return the values at the given positions as Python objects."""
+        values = self.values
+        picked = [values[p] for p in positions]
+        if self._decode:
+            picked = [self._decode(v) for v in picked]
+        if self.nulls is not None:
+            nulls = self.nulls
+            picked = [None if nulls[p] else v for p, v in zip(positions, picked)]
+        return picked
+
+    def to_list(self) -> List[Any]:
+        """Return all values as Python objects."""
+        values = self.values.tolist() if self.typecode else list(self.values)
+        if self._decode:
+            values = list(map(self._decode, values))
+        if self.nulls is not None:
+            values = [None if null else v for v, null in zip(values, self.nulls)]
+        return values
+
+
+class DictionaryVector(ColumnVector):
+    """Dictionary-encoded string column: uint32 codes into a StringDictionary.
+
+    Filters can be evaluated once per distinct string and then applied to
+    the codes (see SimpleQuery._column_scan).
+    """
+
+    def __init__(self, dictionary: Optional[StringDictionary] = None):
+        self.dictionary = dictionary or StringDictionary()
+        super().__init__("I", self.dictionary.encode, self.dictionary.strings.__getitem__)
+
+
+def decode_date(ordinal: int) -> Optional[date]:
+    """Turn a stored ordinal back into a date; 0, stored for NULL, reads as None."""
+    return date.fromordinal(ordinal) if ordinal else None
+
+
+def make_vector(column: Column) -> ColumnVector:
+    """Choose the typed array for a column from its data type."""
+    dtype = column.data_type
+    if isinstance(dtype, StringType) and dtype.dictionary:
+        return DictionaryVector()
+    if isinstance(dtype, BooleanType):
+        return ColumnVector("b", int, bool)
+    if isinstance(dtype, IntegerType):
+        return ColumnVector("q")
+    if isinstance(dtype, DateType):
+        return ColumnVector("i", date.toordinal, decode_date)
+    return ColumnVector()
+
+
+class RowView(Sequence):
+    """Read-only sequence over a ColumnStore that builds Row objects on access."""
+
+    def __init__(self, store: "ColumnStore"):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return self._store.rows_at(range(len(self))[pos])
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("row index out of range")
+        return self._store.row_at(pos)
+
+    def __iter__(self):
+        row_at = self._store.row_at
+        for pos in range(len(self)):
+            yield row_at(pos)
+
+    def __repr__(self):
+        return f"RowView({len(self)} rows)"
+
+
+class ColumnStore:
+    """Column-oriented storage: one ColumnVector per column and an array of row ids.
+
+    Rows are materialized only when requested and are snapshots: writes must go
+    through the table. Values of columns not in the schema are not stored.
+
+    remove() only clears the row's byte in a liveness mask. Positions stay
+    stable for lookups and writes; the first positional read afterwards
+    (a scan, rows_at, column, ids or vectors) compacts every column in one
+    pass, as does vacuum().
+
+    snapshot() shares the vectors with a read-only copy; the first write
+    afterwards copies them (a memcpy per typed column).
+    """
+
+    kind = "columnar"
+
+    def __init__(self, columns: Iterable[Column], layout: Optional[RowLayout] = None):
+        self._vectors: Dict[str, ColumnVector] = {c.name: make_vector(c) for c in columns}
+        # Shared by every materialized row: the table's layout, of the same columns.
+        self._layout = layout or RowLayout.of(self._vectors)
+        self._ids = array("q")
+        # Auto-assigned ids arrive in ascending order, in which case lookups
+        # bisect self._ids and no id -> position map is kept.
+        self._pos: Optional[Dict[int, int]] = None
+        self._alive: Optional[bytearray] = None  # 1 = live, allocated on first remove
+        self._dead = 0
+        self._shared = False  # containers are shared with a snapshot
+        self._lock = threading.RLock()  # guards compaction
+
+    def snapshot(self) -> "ColumnStore":
+        """Return a read-only copy of the store as it is now (copy-on-write, O(1))."""
+        with self._lock:
+            self.vacuum()
+            frozen = copy.copy(self)
+            self._shared = True
+        return frozen
+
+    def _detach(self):
+        """Copy the containers shared with a snapshot before changing them."""
+        self._vectors = {name: vector.clone() for name, vector in self._vectors.items()}
+        self._ids = array("q", self._ids)
+        if self._pos is not None:
+            self._pos = dict(self._pos)
+        self._shared = False
+
+    def append(self, row: Row):
+        """Store a new row."""
+        if self._shared:
+            self._detach()
+        if row.layout.base is self._layout:
+            values = row.values
+        else:
+            values = [row[name] for name in self._vectors]
+        done = []
+        try:
+            for vector, value in zip(self._vectors.values(), values):
+                vector.append(value)
+                done.append(vector)
+        except ValueError:
+            for vector in done:
+                vector.pop()
+            raise
+        pos = len(self._ids)
+        if self._pos is None and pos and row.id <= self._ids[-1]:
+            self._pos = {row_id: p for p, row_id in enumerate(self._ids)
+                         if self._alive is None or self._alive[p]}
+        self._ids.append(row.id)
+        if self._pos is not None:
+            self._pos[row.id] = pos
+        if self._alive is not None:
+            self._alive.append(1)
+
+    def _find(self, row_id: int) -> Optional[int]:
+        if self._pos is not None:
+            return self._pos.get(row_id)
+        pos = bisect_left(self._ids, row_id)
+        if pos < len(self._ids) and self._ids[pos] == row_id and \
+                (self._alive is None or self._alive[pos]):
+            return pos
+        return None
+
+    def _materialize(self, pos: int) -> Row:
+        return Row.make(self._ids[pos], self._layout, tuple(vector[pos] for vector in self._vectors.values()))
+
+    def row_at(self, pos: int) -> Row:
+        """Materialize the row at a storage position."""
+        if self._dead:
+            self.vacuum()
+        return self._materialize(pos)
+
+    def get(self, row_id: int) -> Optional[Row]:
+        """Return the row with the given id, or None."""
+        pos = self._find(row_id)
+        return None if pos is None else self._materialize(pos)
+
+    def set(self, row: Row, column: str, value: Any):
+        """Write one value of a stored row (and of the given snapshot)."""
+        if self._shared:
+            self._detach()
+        self._vectors[column][self._find(row.id)] = value
+        row[column] = value
+
+    def remove(self, row: Row):
+        """Remove a stored row by marking its position dead."""
+        if self._shared:
+            self._detach()
+        pos = self._find(row.id)
+        if self._alive is None:
+            self._alive = bytearray(b"\x01") * len(self._ids)
+        self._alive[pos] = 0
+        self._dead += 1
+        if self._pos is not None:
+            del self._pos[row.id]
+
+    def vacuum(self) -> int:
+        """Compact every column, dropping removed rows; return how many were dropped."""
+        # Reads compact lazily, so this can race with snapshot() in another
+        # thread; new containers are built aside, never changed in place.
+        with self._lock:
+            dead = self._dead
+            if dead:
+                alive = self._alive
+                self._vectors = {name: vector.compacted(alive) for name, vector in self._vectors.items()}
+                ids = array("q", compress(self._ids, alive))
+                if self._pos is not None:
+                    self._pos = {row_id: p for p, row_id in enumerate(ids)}
+                self._ids = ids
+                self._alive = None
+                self._dead = 0
+            return dead
+
+    @property
+    def vectors(self) -> Dict[str, ColumnVector]:
+        """The column vectors, compacted first so that positions match rows()."""
+        if self._dead:
+            self.vacuum()
+        return self._vectors
+
+    def position(self, row_id: int) -> int:
+        """Return a sort key reflecting the row's position in storage order."""
+        return self._find(row_id)
+
+    def rows(self) -> RowView:
+        """Return a lazy view of all rows in storage order."""
+        return RowView(self)
+
+    def rows_at(self, positions: Iterable[int]) -> List[Row]:
+        """Materialize the rows at the given storage positions, one column at a time."""
+        positions = list(positions)
+        columns = [vector.take(positions) for vector in self.vectors.values()]
+        ids, layout, make = self._ids, self._layout, Row.make
+        return [make(ids[pos], layout, values) for pos, values in zip(positions, zip(*columns))]
+
+    def ids(self) -> List[int]:
+        """Return all row ids in storage order."""
+        if self._dead:
+            self.vacuum()
+        return self._ids.tolist()
+
+    def column(self, name: str) -> List[Any]:
+        """Return one column's values in storage order."""
+        return self.vectors[name].to_list()
+
+    def __contains__(self, row_id: int) -> bool:
+        return self._find(row_id) is not None
+
+    def __len__(self):
+        return len(self._ids) - self._dead
+
+
+STORAGE_KINDS = {
+    "row": RowStore,
+    "columnar": ColumnStore,
+}
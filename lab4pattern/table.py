@@ -1,23 +1,92 @@
-from typing import Any, List, Optional
-from datatypes import Column, Row
+import copy
+import functools
+from typing import Any, Dict, Iterable, List, Optional
+from datatypes import Column, Row, RowLayout
 from factory import Database  # used for FK checks
+from index import INDEX_KINDS
+from storage import STORAGE_KINDS
+from stats import TableStats
+
+def _writes(method):
+    """Run a Table method that changes the table under the database write lock.
+
+    Writers are serialized; snapshots (see Table.snapshot) refuse writes.
+    A due checkpoint of the write-ahead log runs once the write is applied.
+    """
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        db = Database()
+        with db._write_lock:
+            if self._frozen:
+                raise ValueError(f"Table '{self.name}' is a read-only snapshot")
+            result = method(self, *args, **kwargs)
+            db._checkpoint_if_due()
+            return result
+    return locked
+
 
 class Table:
     """Table supporting CRUD operations and primary/foreign key constraints."""
 
-    def __init__(self, name: str, columns: List[Column]):
+    def __init__(self, name: str, columns: List[Column], storage: str = "row"):
         """
         Initialize a table.
 
         Args:
             name (str): Table name.
             columns (List[Column]): List of columns in the table.
+            storage (str): "row" keeps Row objects, "columnar" keeps one
+                typed array per column and builds Row objects on demand.
+
+        Raises:
+            ValueError: If the storage kind is unknown.
         """
+        if storage not in STORAGE_KINDS:
+            raise ValueError(f"Unknown storage kind: {storage}")
         self.name = name
         self.columns = {c.name: c for c in columns}
-        self.rows: List[Row] = []
+        self.storage = storage
+        self.layout = RowLayout.of(self.columns)  # every stored row uses it
+        self._store = STORAGE_KINDS[storage](columns, self.layout)
+        self._pk_col: Optional[Column] = self.get_primary_key()
+        self._pk_map: Dict[Any, int] = {}  # PK value -> row id
+        self._indexes: Dict[tuple[str, str], Any] = {}
+        self._indexes_stale = False  # set by bulk loads, rebuilt on first use
+        self._stats = TableStats(self.columns, self.column_values, self._unique_columns())
+        self._stats_stale = False  # likewise for the statistics
+        self.version = 0  # bumped by every change to the rows (see cache.QueryCache)
+        self._frozen = False  # a read-only snapshot
+        self._snapshot: Optional["Table"] = None  # latest snapshot, reused until the next change
+
+    @property
+    def indexes(self) -> Dict[tuple[str, str], Any]:
+        """Secondary indexes keyed by (column, kind)."""
+        if self._indexes_stale:
+            self._rebuild_indexes()
+        return self._indexes
+
+    @property
+    def _pk_index(self) -> Dict[Any, int]:
+        if self._indexes_stale:
+            self._rebuild_indexes()
+        return self._pk_map
+
+    @property
+    def stats(self) -> TableStats:
+        """Row count, per-column min/max, distinct counts and histograms."""
+        if self._stats_stale:
+            self._stats = TableStats.build(self.columns, self.column_values, self._store.ids(),
+                                           self._unique_columns())
+            self._stats_stale = False
+        return self._stats
+
+    @property
+    def rows(self):
+        """All rows in table order (a list, or a lazy view for columnar tables)."""
+        return self._store.rows()
 
     # ---- CREATE ----
+    @_writes
     def insert(self, row_data: dict[str, Any]) -> Row:
         """
         Insert a new row with type, PK, and FK validation.
@@ -37,38 +106,197 @@ class Table:
                 raise ValueError(f"Invalid value for column '{col_name}': {value}")
 
         # Check primary key
-        pk_col = self.get_primary_key()
-        if pk_col and pk_col.name in row_data:
-            for r in self.rows:
-                if r[pk_col.name] == row_data[pk_col.name]:
-                    raise ValueError(f"Duplicate primary key '{pk_col.name}' value")
+        pk_col = self._pk_col
+        if pk_col and pk_col.name in row_data and row_data[pk_col.name] in self._pk_index:
+            raise ValueError(f"Duplicate primary key '{pk_col.name}' value")
 
         # Check foreign keys
+        db = Database()
         for col in self.columns.values():
             if col.foreign_key and row_data.get(col.name) is not None:
                 ref_table_name, ref_col_name = col.foreign_key
-                ref_table = Database().get_table(ref_table_name)
-                if all(r[ref_col_name] != row_data[col.name] for r in ref_table.get_all()):
+                if not db.has_reference(ref_table_name, ref_col_name, row_data[col.name]):
                     raise ValueError(f"Foreign key violation on column '{col.name}'")
 
-        row = Row(row_data)
-        self.rows.append(row)
+        row = Row(row_data, self.layout)
+        if row.id in self._store:
+            raise ValueError(f"Duplicate row id {row.id}")
+        if db._is_logged(self):
+            db._log_change(self, "insert", row=row.to_dict())
+        try:
+            self._store.append(row)
+        except ValueError:
+            db._retract_change(self)
+            raise
+        self.version += 1
+        self._index_row(row)
+        if not self._stats_stale:
+            self._stats.add(row)
+        db._on_insert(self, row)
         return row
 
+    @_writes
+    def insert_many(self, rows: Iterable[dict[str, Any]], by_column: bool = False) -> List[Row]:
+        """
+        Insert a batch of rows atomically: either all of them are stored or none.
+
+        The schema, primary key and foreign-key targets are resolved once for
+        the whole batch. Primary keys must be unique within the batch and
+        against the table; foreign keys may also point at rows of the same
+        batch when the table references itself.
+
+        Args:
+            rows (Iterable[dict]): Column-value mappings for the new rows.
+            by_column (bool): Validate one column at a time over the whole
+                batch instead of one row at a time.
+
+        Returns:
+            List[Row]: Inserted rows, in input order.
+
+        Raises:
+            ValueError: If any row fails validation or violates a key; the
+                message names the offending row's position in the batch.
+        """
+        batch = list(rows)
+        if not batch:
+            return []
+        columns = list(self.columns.values())
+
+        # Types and nullability
+        if by_column:
+            for column in columns:
+                values = [r.get(column.name) for r in batch]
+                if not column.validate_many(values):
+                    pos = next(i for i, v in enumerate(values) if not column.validate(v))
+                    raise ValueError(f"Row {pos}: invalid value for column '{column.name}': {values[pos]}")
+        else:
+            checks = [(c.name, c.validate) for c in columns]
+            for pos, row_data in enumerate(batch):
+                for col_name, validate in checks:
+                    value = row_data.get(col_name)
+                    if not validate(value):
+                        raise ValueError(f"Row {pos}: invalid value for column '{col_name}': {value}")
+
+        # Primary key: unique within the batch and against the table
+        pk_col = self._pk_col
+        if pk_col:
+            pk_index = self._pk_index
+            seen = set()
+            for pos, row_data in enumerate(batch):
+                if pk_col.name not in row_data:
+                    continue
+                key = row_data[pk_col.name]
+                if key in seen or key in pk_index:
+                    raise ValueError(f"Row {pos}: duplicate primary key '{pk_col.name}' value")
+                seen.add(key)
+
+        # Foreign keys
+        db = Database()
+        for col in columns:
+            if not col.foreign_key:
+                continue
+            ref_table_name, ref_col_name = col.foreign_key
+            in_batch = set()
+            if ref_table_name == self.name:
+                in_batch = {r.get(ref_col_name) for r in batch}
+            for pos, row_data in enumerate(batch):
+                value = row_data.get(col.name)
+                if value is not None and value not in in_batch and \
+                        not db.has_reference(ref_table_name, ref_col_name, value):
+                    raise ValueError(f"Row {pos}: foreign key violation on column '{col.name}'")
+
+        layout = self.layout
+        new_rows = [Row(row_data, layout) for row_data in batch]
+        ids = set()
+        for pos, row in enumerate(new_rows):
+            if row.id in ids or row.id in self._store:
+                raise ValueError(f"Row {pos}: duplicate row id {row.id}")
+            ids.add(row.id)
+
+        # Commit: log the batch, then store every row, undoing a partial append
+        if db._is_logged(self):
+            db._log_change(self, "insert_many", rows=[row.to_dict() for row in new_rows])
+        self.version += 1
+        stored = 0
+        try:
+            for row in new_rows:
+                self._store.append(row)
+                stored += 1
+        except ValueError as e:
+            for row in reversed(new_rows[:stored]):
+                self._store.remove(row)
+            db._retract_change(self)
+            raise ValueError(f"Row {stored}: {e}")
+
+        if pk_col:
+            pk_index = self._pk_index
+            for row in new_rows:
+                pk_index[row[pk_col.name]] = row.id
+        for (col_name, _), index in self.indexes.items():
+            index.add_many((row[col_name], row.id) for row in new_rows)
+        if not self._stats_stale:
+            self._stats.add_many(new_rows)
+        db._on_insert_many(self, new_rows)
+        return new_rows
+
+    @_writes
+    def _restore_row(self, row: Row):
+        """Store a row that was validated before (log replay), keeping indexes in sync."""
+        row = row.conformed(self.layout)
+        self._store.append(row)
+        self.version += 1
+        self._index_row(row)
+        if not self._stats_stale:
+            self._stats.add(row)
+        Database()._on_insert(self, row)
+
     # ---- READ ----
     def get_all(self) -> List[Row]:
         """Return all rows in the table."""
-        return self.rows
+        return self._store.rows()
 
     def get_by_id(self, row_id: int) -> Optional[Row]:
         """Return a row by its id, or None if not found."""
-        return next((r for r in self.rows if r.id == row_id), None)
+        return self._store.get(row_id)
+
+    def get_by_primary_key(self, value: Any) -> Optional[Row]:
+        """Return the row holding a primary key value, or None if not found."""
+        row_id = self._pk_index.get(value)
+        return None if row_id is None else self._store.get(row_id)
+
+    def row_position(self, row_id: int) -> int:
+        """Return a sort key reflecting the row's position in table order."""
+        return self._store.position(row_id)
+
+    def rows_for_ids(self, row_ids) -> List[Row]:
+        """Return the rows with the given ids, in table order."""
+        store = self._store
+        ordered = sorted((i for i in row_ids if i in store), key=store.position)
+        return [store.get(i) for i in ordered]
+
+    def column_values(self, column: str) -> List[Any]:
+        """Return one column's values in table order."""
+        return self._store.column(column)
+
+    def column_vector(self, column: str):
+        """Return the typed ColumnVector of a columnar table, or None for row storage."""
+        vectors = getattr(self._store, "vectors", None)
+        return vectors[column] if vectors is not None else None
+
+    def rows_at(self, positions) -> List[Row]:
+        """Return the rows at the given positions of table order."""
+        return self._store.rows_at(positions)
 
     # ---- UPDATE ----
+    @_writes
     def update(self, row_id: int, new_data: dict[str, Any]):
         """
         Update a row by id with new data after validation.
 
+        All values are validated before any of them is written, and a value
+        the storage cannot hold leaves the row, its indexes and the log as
+        they were.
+
         Args:
             row_id (int): ID of the row to update.
             new_data (dict): Column-value mapping to update.
@@ -80,25 +308,197 @@ class Table:
         if not row:
             raise ValueError(f"No row with id={row_id}")
 
+        pk_col = self._pk_col
+        if pk_col and pk_col.name in new_data:
+            new_pk = new_data[pk_col.name]
+            owner = self._pk_index.get(new_pk)
+            if owner is not None and owner != row.id:
+                raise ValueError(f"Duplicate primary key '{pk_col.name}' value")
+
         for key, value in new_data.items():
             if key not in self.columns:
                 raise ValueError(f"Column '{key}' does not exist")
             column = self.columns[key]
             if not column.validate(value):
                 raise ValueError(f"Invalid value for column '{key}': {value}")
-            row[key] = value
+
+        db = Database()
+        db._log_change(self, "update", id=row.id, data=new_data)
+        # Store first: a value the storage refuses (e.g. an int beyond int64 in
+        # a columnar table) undoes the written ones and the log record.
+        old = {key: row[key] for key in new_data}
+        written = []
+        try:
+            for key, value in new_data.items():
+                self._store.set(row, key, value)
+                written.append(key)
+        except ValueError:
+            for key in reversed(written):
+                self._store.set(row, key, old[key])
+            db._retract_change(self)
+            raise
+        self.version += 1
+        for key, value in new_data.items():
+            db._on_update(self, key, old[key], value)
+            for index in self.indexes_on(key):
+                index.remove(old[key], row.id)
+                index.add(value, row.id)
+            if pk_col and key == pk_col.name:
+                if self._pk_index.get(old[key]) == row.id:
+                    del self._pk_index[old[key]]
+                self._pk_index[value] = row.id
+            if not self._stats_stale:
+                self._stats.update(row, key, old[key], value)
 
     # ---- DELETE ----
+    @_writes
     def delete(self, row_id: int):
         """
         Delete a row by id.
 
+        The row's storage slot becomes a tombstone (see vacuum).
+
         Args:
             row_id (int): ID of the row to delete.
         """
         row = self.get_by_id(row_id)
         if row:
-            self.rows.remove(row)
+            db = Database()
+            db._log_change(self, "delete", id=row.id)
+            self._store.remove(row)
+            self.version += 1
+            if self._pk_col:
+                self._unindex_pk(row)
+            for (col_name, _), index in self.indexes.items():
+                index.remove(row[col_name], row.id)
+            if not self._stats_stale:
+                self._stats.remove(row)
+            db._on_delete(self, row)
+
+    @_writes
+    def delete_where(self, query) -> int:
+        """
+        Delete every row a query over this table returns, in one pass.
+
+        The matching rows are collected first and then removed from the
+        storage, the indexes and the statistics together, with a single log
+        record.
+
+        Args:
+            query (SimpleQuery): Query over this table. Filters, order_by,
+                limit and offset apply; selected columns are ignored.
+
+        Returns:
+            int: Number of deleted rows.
+
+        Raises:
+            ValueError: If the query reads another table or aggregates.
+        """
+        if query.table is not self:
+            raise ValueError(f"Query does not read table '{self.name}'")
+        if query.group_columns or query.aggregates:
+            raise ValueError("Cannot delete the rows of an aggregate query")
+        rows = list(query._result_rows())
+        if rows:
+            Database()._log_change(self, "delete_many", ids=[row.id for row in rows])
+            self._delete_rows(rows)
+        return len(rows)
+
+    def _delete_rows(self, rows: List[Row]):
+        """Remove stored rows, updating every index once for the whole batch."""
+        for row in rows:
+            self._store.remove(row)
+        self.version += 1
+        if self._pk_col:
+            for row in rows:
+                self._unindex_pk(row)
+        for (col_name, _), index in self.indexes.items():
+            index.remove_many((row[col_name], row.id) for row in rows)
+        db = Database()
+        for row in rows:
+            if not self._stats_stale:
+                self._stats.remove(row)
+            db._on_delete(self, row)
+
+    @_writes
+    def vacuum(self) -> int:
+        """
+        Compact the storage, reclaiming the slots of deleted rows.
+
+        Row storage also compacts itself once deleted slots outnumber live
+        rows, and columnar storage on the next scan; vacuum does it now.
+
+        Returns:
+            int: Number of slots reclaimed.
+        """
+        return self._store.vacuum()
+
+    # ---- SNAPSHOTS ----
+    def snapshot(self) -> "Table":
+        """
+        Return a read-only view of the table as it is now.
+
+        The view shares storage with the table and costs O(1) to take; the
+        first write afterwards copies what the snapshot still holds
+        (copy-on-write), so queries on the view see neither later writes
+        nor half-applied ones, whichever thread makes them. The view is
+        reused until the table changes. Its indexes and statistics are
+        rebuilt from its own rows on first use.
+
+        Returns:
+            Table: Snapshot; writing to it raises ValueError.
+        """
+        with Database()._write_lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != self.version:
+                snapshot = copy.copy(self)
+                snapshot._store = self._store.snapshot()
+                snapshot._frozen = True
+                snapshot._snapshot = None
+                snapshot._indexes = dict.fromkeys(self._indexes)
+                snapshot._indexes_stale = True
+                snapshot._stats_stale = True
+                self._snapshot = snapshot
+            return snapshot
+
+    # ---- INDEXES ----
+    @_writes
+    def create_index(self, column: str, kind: str = "hash"):
+        """
+        Create a secondary index on a column.
+
+        Args:
+            column (str): Column to index.
+            kind (str): "hash" for '=' lookups, "sorted" for '=', '>' and '<'.
+
+        Returns:
+            HashIndex | SortedIndex: The new (or already existing) index.
+
+        Raises:
+            ValueError: If the column or index kind is unknown.
+        """
+        if column not in self.columns:
+            raise ValueError(f"Column '{column}' does not exist")
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+        if (column, kind) in self.indexes:
+            return self.indexes[(column, kind)]
+        Database()._log_change(self, "create_index", column=column, kind=kind)
+        index = INDEX_KINDS[kind](column)
+        index.add_many(zip(self._store.column(column), self._store.ids()))
+        self.indexes[(column, kind)] = index
+        return index
+
+    @_writes
+    def drop_index(self, column: str, kind: str = "hash"):
+        """Remove a secondary index if it exists."""
+        if (column, kind) in self.indexes:
+            Database()._log_change(self, "drop_index", column=column, kind=kind)
+            del self.indexes[(column, kind)]
+
+    def indexes_on(self, column: str) -> List[Any]:
+        """Return all secondary indexes defined on a column."""
+        return [index for (col_name, _), index in self.indexes.items() if col_name == column]
 
     # ---- Helpers ----
     def get_primary_key(self) -> Optional[Column]:
@@ -108,8 +508,40 @@ class Table:
                 return c
         return None
 
-    def to_dict(self) -> dict:
-        """Return a dictionary representation of the table for JSON serialization."""
+    def _unique_columns(self) -> List[str]:
+        """Columns whose values are known to be distinct (the primary key)."""
+        return [self._pk_col.name] if self._pk_col else []
+
+    def _index_row(self, row: Row):
+        """Register a stored row in the primary-key and secondary indexes."""
+        if self._pk_col:
+            self._pk_index[row[self._pk_col.name]] = row.id
+        for (col_name, _), index in self.indexes.items():
+            index.add(row[col_name], row.id)
+
+    def _unindex_pk(self, row: Row):
+        """Drop a row's primary-key entry if the index points at that row."""
+        key = row[self._pk_col.name]
+        if self._pk_index.get(key) == row.id:
+            del self._pk_index[key]
+
+    def _rebuild_indexes(self):
+        """Recompute the primary-key and secondary indexes from stored rows."""
+        # Built aside and published last: readers of a snapshot may race here.
+        ids = self._store.ids()
+        pk_map = {}
+        if self._pk_col:
+            pk_map = dict(zip(self._store.column(self._pk_col.name), ids))
+        indexes = {}
+        for (col_name, kind) in self._indexes:
+            index = INDEX_KINDS[kind](col_name)
+            index.add_many(zip(self._store.column(col_name), ids))
+            indexes[(col_name, kind)] = index
+        self._pk_map, self._indexes = pk_map, indexes
+        self._indexes_stale = False
+
+    def schema_dict(self) -> dict:
+        """Return the table definition (everything but the rows) as a dictionary."""
         return {
             "name": self.name,
             "columns": [
@@ -119,28 +551,60 @@ class Table:
                     "nullable": c.nullable,
                     "primary_key": c.primary_key,
                     "foreign_key": c.foreign_key,
+                    **({"dictionary": True} if getattr(c.data_type, "dictionary", False) else {}),
                 }
                 for c in self.columns.values()
             ],
-            "rows": [r.to_dict() for r in self.rows],
+            "storage": self.storage,
+            "indexes": [{"column": col, "kind": kind} for col, kind in self._indexes],
         }
 
+    def to_dict(self) -> dict:
+        """Return a dictionary representation of the table for JSON serialization."""
+        return {**self.schema_dict(), "rows": [r.to_dict() for r in self.rows]}
+
+    @_writes
+    def load_rows(self, rows: Iterable[Row]):
+        """
+        Append already-validated rows (e.g. from a snapshot).
+
+        Rows are stored over the table's layout. Indexes are rebuilt once,
+        on first use after the load.
+
+        Args:
+            rows (Iterable[Row]): Rows to store; consumed lazily.
+        """
+        layout = self.layout
+        for row in rows:
+            self._store.append(row.conformed(layout))
+        self._indexes_stale = True
+        self._stats_stale = True
+        self.version += 1
+
+    @_writes
+    def attach_store(self, store):
+        """Replace the table's storage with a prepared store (e.g. a memory-mapped snapshot)."""
+        self._store = store
+        self._indexes_stale = True
+        self._stats_stale = True
+        self.version += 1
+
     @staticmethod
-    def from_dict(data: dict, type_registry: dict[str, Any]):
+    def from_schema(data: dict, type_registry: dict[str, Any]):
         """
-        Create a Table instance from a dictionary.
+        Create an empty Table from a schema dictionary (see schema_dict).
 
         Args:
-            data (dict): Table data as dictionary.
+            data (dict): Table definition.
             type_registry (dict): Mapping from type name to DataType class.
 
         Returns:
-            Table: Reconstructed table instance.
+            Table: New table without rows.
         """
         columns = []
         for c in data["columns"]:
             dtype_class = type_registry[c["type"]]
-            dtype = dtype_class() if c["type"] != "StringType" else dtype_class(None)
+            dtype = dtype_class() if c["type"] != "StringType" else dtype_class(None, c.get("dictionary", False))
             columns.append(
                 Column(
                     c["name"],
@@ -150,6 +614,23 @@ class Table:
                     foreign_key=c["foreign_key"],
                 )
             )
-        table = Table(data["name"], columns)
-        table.rows = [Row.from_dict(r) for r in data["rows"]]
+        table = Table(data["name"], columns, storage=data.get("storage", "row"))
+        for idx in data.get("indexes", []):
+            table.create_index(idx["column"], idx["kind"])
+        return table
+
+    @staticmethod
+    def from_dict(data: dict, type_registry: dict[str, Any]):
+        """
+        Create a Table instance from a dictionary.
+
+        Args:
+            data (dict): Table data as dictionary.
+            type_registry (dict): Mapping from type name to DataType class.
+
+        Returns:
+            Table: Reconstructed table instance.
+        """
+        table = Table.from_schema(data, type_registry)
+        table.load_rows(Row.from_dict(r) for r in data["rows"])
         return table
@@ -1,7 +1,19 @@
+import asyncio
+import gc
+import json
 import pytest
+import random
+import sys
+import threading
+import weakref
+from datetime import date
 from query import SimpleQuery, JoinedTable
-from factory import Database
+from factory import Database, TYPE_REGISTRY
 from datatypes import Row
+from table import Table
+from cache import QueryCache
+from server import Client, QueryServer
+import parallel
 
 # ---------- Fixtures ----------
 
@@ -64,6 +76,218 @@ def test_foreign_key_enforced(users_table, orders_table):
     with pytest.raises(ValueError):
         orders_table.insert({"id": 2, "user_id": 99, "product": "Phone"})
 
+def test_primary_key_index_follows_update_and_delete(users_table):
+    """Test that the PK index stays in sync after updates and deletes."""
+    users_table.insert({"id": 1, "name": "Alice", "age": 25})
+    users_table.insert({"id": 2, "name": "Bob", "age": 30})
+    with pytest.raises(ValueError):
+        users_table.update(2, {"id": 1})
+    users_table.delete(1)
+    users_table.insert({"id": 1, "name": "Carol", "age": 41})
+    assert users_table.get_by_id(1)["name"] == "Carol"
+    assert [r["name"] for r in users_table.get_all()] == ["Bob", "Carol"]
+
+def test_foreign_key_index_tracks_parent_changes(users_table, orders_table):
+    """Test that FK checks see inserts, updates and deletes on the parent table."""
+    users_table.insert({"id": 1, "name": "Alice", "age": 25})
+    users_table.insert({"id": 2, "name": "Bob", "age": 30})
+    users_table.update(2, {"id": 3})
+    orders_table.insert({"id": 1, "user_id": 3, "product": "Laptop"})
+    with pytest.raises(ValueError):
+        orders_table.insert({"id": 2, "user_id": 2, "product": "Phone"})
+    users_table.delete(1)
+    with pytest.raises(ValueError):
+        orders_table.insert({"id": 3, "user_id": 1, "product": "Mouse"})
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_rows_share_one_layout(db, storage):
+    """Test that a table's rows share a slot layout and keep the dict-like Row contract."""
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "name", "type": "string", "nullable": False},
+            {"name": "age", "type": "int"},
+        ],
+        "storage": storage,
+    }
+    table = db.create_table_with_factory("layouts", schema)
+    table.insert_many([{"id": i, "name": f"n{i}", "age": i * 10} for i in range(1, 5)])
+    # Other key orders and missing nullable columns share the table's slots;
+    # row storage remembers which columns a row was never given.
+    table.insert({"name": "n5", "id": 5})
+    table.insert_many([{"age": 60, "name": "n6", "id": 6}])
+    table.load_rows([Row.from_dict({"id": 7, "data": {"name": "n7", "id": 7}})])
+    rows = table.get_all()
+    assert {id(r.layout.base) for r in rows} == {id(table.layout)}
+    assert table.layout.keys == ("id", "name", "age")
+    no_age = {"age": None} if storage == "columnar" else {}  # columnar rows hold every column
+    assert [r.data for r in rows[4:]] == [{"id": 5, "name": "n5", **no_age},
+                                           {"id": 6, "name": "n6", "age": 60},
+                                           {"id": 7, "name": "n7", **no_age}]
+    assert rows[4]["age"] is None
+    if storage == "row":
+        assert "age" not in rows[4] and rows[4].get("age", 0) == 0
+        assert rows[4].to_dict() == {"id": 5, "data": {"id": 5, "name": "n5"}}
+        table.update(5, {"age": 50})
+        assert table.get_by_id(5).data == {"id": 5, "name": "n5", "age": 50}
+    assert not hasattr(rows[0], "__dict__")
+
+    row = table.get_by_id(2)
+    assert (row["name"], row["age"], row["missing"], row.get("missing", 0)) == ("n2", 20, None, 0)
+    assert "age" in row and "missing" not in row
+    table.update(2, {"age": 21})
+    assert table.get_by_id(2)["age"] == 21
+    assert table.get_by_id(1)["age"] == 10
+
+    copy = Row.from_dict(table.get_by_id(2).to_dict())
+    assert copy.to_dict() == {"id": 2, "data": {"id": 2, "name": "n2", "age": 21}}
+    copy["extra"] = True  # a new key extends the layout of this row only
+    assert copy.data == {"id": 2, "name": "n2", "age": 21, "extra": True}
+    assert "extra" not in table.get_by_id(2)
+    with pytest.raises(TypeError):
+        copy.data["age"] = 0  # data is a read-only view
+    assert copy["age"] == 21
+
+def test_columnar_table_matches_row_table(db):
+    """Test that columnar storage behaves like row storage for CRUD and queries."""
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "name", "type": "string", "nullable": False},
+            {"name": "active", "type": "bool"},
+            {"name": "joined", "type": "date"},
+            {"name": "age", "type": "int"},
+        ]
+    }
+    tables = [
+        db.create_table_with_factory("people_rows", schema),
+        db.create_table_with_factory("people_cols", {**schema, "storage": "columnar"}),
+    ]
+    for table in tables:
+        for i in range(1, 11):
+            table.insert({"id": i, "name": f"p{i}", "active": i % 2 == 0,
+                          "joined": date(2024, 1, i), "age": None if i % 4 == 0 else 40 - i})
+        table.update(3, {"age": 99, "active": None})
+        table.delete(5)
+    rows, cols = tables
+    assert cols.get_by_id(3)["age"] == 99 and cols.get_by_id(3)["active"] is None
+    assert cols.get_by_id(2)["joined"] == date(2024, 1, 2)
+    assert cols.get_by_id(5) is None and len(cols.get_all()) == 9
+    assert [r.data for r in cols.get_all()] == [r.data for r in rows.get_all()]
+    for table in tables:
+        table.insert({"id": 20, "name": "late", "active": True, "joined": None, "age": 1})
+    query = lambda t: SimpleQuery(t).where("age", ">", 30).order_by("age", ascending=False)
+    assert [r.data for r in query(cols).execute()] == [r.data for r in query(rows).execute()]
+    assert query(cols).explain().startswith("COLUMN SCAN people_cols")
+    assert cols.column_values("joined") == rows.column_values("joined")  # a NULL date among dates
+    assert [r.data for r in cols.rows_at(range(10))] == [r.data for r in rows.get_all()]
+
+    with pytest.raises(ValueError):
+        cols.insert({"id": 21, "name": "huge", "age": 2 ** 70})
+    assert cols.get_by_id(21) is None and len(cols.get_all()) == 10
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_delete_where_and_vacuum(db, storage):
+    """Test bulk deletes through a query, tombstone skipping, and compaction."""
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "age", "type": "int"},
+        ],
+        "storage": storage,
+    }
+    table = db.create_table_with_factory(f"purge_{storage}", schema)
+    table.insert_many({"id": i, "age": None if i % 7 == 0 else i % 10} for i in range(100))
+    table.create_index("age", "sorted")
+    table.delete(3)
+    expected = [r.data for r in table.get_all() if r["age"] is None or r["age"] < 5]
+
+    assert table.delete_where(SimpleQuery(table).where("age", ">", 4).select(["id"])) == 99 - len(expected)
+    assert table.get_by_id(5) is None and table.get_by_primary_key(5) is None
+    assert [r.data for r in table.get_all()] == expected
+    assert [r.id for r in SimpleQuery(table).where("age", ">", 2).execute()] == \
+        [r.id for r in table.get_all() if r["age"] is not None and r["age"] > 2]
+    assert table.stats.row_count == len(expected) == len(table.get_all())
+    table.insert({"id": 500, "age": 9})
+    assert table.delete_where(SimpleQuery(table).order_by("id").limit(2)) == 2
+    assert [r.id for r in SimpleQuery(table).where("age", "=", 9).execute()] == \
+        [r.id for r in table.get_all() if r["age"] == 9]
+    table.vacuum()
+    assert table.vacuum() == 0
+    assert [r["id"] for r in table.get_all()][:2] == [2, 4]
+    assert table.get_by_id(500)["age"] == 9
+    with pytest.raises(ValueError):
+        table.delete_where(SimpleQuery(table).aggregate("count"))
+
+@pytest.mark.parametrize("by_column", [False, True])
+def test_insert_many_is_all_or_nothing(users_table, orders_table, by_column):
+    """Test batch inserts: validation per row or per column, keys, and rollback."""
+    users_table.insert({"id": 1, "name": "Alice", "age": 25})
+    rows = users_table.insert_many(
+        [{"id": i, "name": f"user{i}", "age": i} for i in range(2, 6)], by_column=by_column)
+    assert [r.id for r in rows] == [2, 3, 4, 5]
+    users_table.create_index("age", kind="sorted")
+
+    bad_batches = [
+        [{"id": 6, "name": "ok"}, {"id": 7, "name": None}],      # not nullable
+        [{"id": 6, "name": "a"}, {"id": 6, "name": "b"}],         # PK repeated in batch
+        [{"id": 6, "name": "a"}, {"id": 3, "name": "b"}],         # PK already in table
+    ]
+    for batch in bad_batches:
+        with pytest.raises(ValueError, match="Row 1"):
+            users_table.insert_many(batch, by_column=by_column)
+    assert len(users_table.get_all()) == 5
+    with pytest.raises(ValueError):
+        orders_table.insert_many([{"id": 1, "user_id": 1, "product": "a"},
+                                  {"id": 2, "user_id": 42, "product": "b"}])
+    assert orders_table.get_all() == []
+
+    users_table.insert_many([{"id": 6, "name": "six", "age": 1}])
+    assert [r.id for r in SimpleQuery(users_table).where("age", "<", 3).execute()] == [2, 6]
+
+def test_insert_many_self_reference_and_columnar_rollback(db):
+    """Test batch FK references within the batch and rollback of a failed columnar append."""
+    table = db.create_table_with_factory("nodes", {
+        "storage": "columnar",
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "parent", "type": "int", "foreign_key": ("nodes", "id")},
+        ],
+    })
+    table.insert_many([{"id": 1, "parent": None}, {"id": 2, "parent": 1}, {"id": 3, "parent": 2}])
+    with pytest.raises(ValueError):
+        table.insert_many([{"id": 4, "parent": 3}, {"id": 2 ** 70, "parent": 1}])
+    assert [r.id for r in table.get_all()] == [1, 2, 3]
+    assert table.get_by_primary_key(4) is None
+
+def test_columnar_update_refused_by_storage_changes_nothing(tmp_path):
+    """Test that an update the columnar storage cannot hold leaves the row, its index and the log unchanged."""
+    db = Database("WalDB")
+    db.tables.clear()
+    filepath = str(tmp_path / "db.ndjson")
+    db.attach_wal(filepath, checkpoint_every=None, sync=False)
+    try:
+        table = db.create_table_with_factory("pairs", {
+            "storage": "columnar",
+            "columns": [
+                {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+                {"name": "a", "type": "int"},
+                {"name": "b", "type": "int"},
+            ],
+        })
+        table.create_index("a", "sorted")
+        table.insert({"id": 1, "a": 1, "b": 1})
+        with pytest.raises(ValueError):
+            table.update(1, {"a": 7, "b": 2 ** 70})
+        assert table.get_by_id(1).data == {"id": 1, "a": 1, "b": 1}
+        assert SimpleQuery(table).where("a", "=", 7).execute() == []
+        assert [r.id for r in SimpleQuery(table).where("a", "=", 1).execute()] == [1]
+        table.update(1, {"b": 2})
+    finally:
+        db.detach_wal()
+    db.load_from_json(filepath)
+    assert db.get_table("pairs").get_by_id(1).data == {"id": 1, "a": 1, "b": 2}
+
 # ---------- SimpleQuery Tests ----------
 
 def test_simple_query(users_table):
@@ -85,6 +309,386 @@ def test_order_by(users_table):
     assert result[0]["name"] == "Charlie"
     assert result[2]["name"] == "Bob"
 
+def test_index_plan_matches_full_scan(users_table):
+    """Test that indexed queries return the same rows as a full scan."""
+    for i in range(1, 21):
+        users_table.insert({"id": i, "name": f"user{i % 4}", "age": None if i % 7 == 0 else i * 3})
+    queries = [
+        lambda: SimpleQuery(users_table).where("age", ">", 20).where("name", "=", "user1"),
+        lambda: SimpleQuery(users_table).where("age", "<", 30).order_by("id", ascending=False),
+        lambda: SimpleQuery(users_table).where("name", "=", "user2").select(["id"]),
+    ]
+    expected = [[r.data for r in q().execute()] for q in queries]
+    assert "FULL SCAN users" in queries[0]().explain()
+
+    users_table.create_index("name")
+    users_table.create_index("age", kind="sorted")
+    assert [[r.data for r in q().execute()] for q in queries] == expected
+
+    users_table.update(5, {"age": 1})
+    users_table.delete(6)
+    young = [r.id for r in users_table.get_all() if r["age"] is not None and r["age"] < 30]
+    assert [r.id for r in SimpleQuery(users_table).where("age", "<", 30).execute()] == young
+    plan = SimpleQuery(users_table).where("name", "=", "user1").where("age", ">", 55).explain()
+    assert plan.splitlines()[0].startswith("INDEX SCAN users USING sorted(age)")
+    assert plan.splitlines()[1] == "FILTER name = 'user1'"
+    assert SimpleQuery(users_table).where("id", "=", 3).explain().startswith("PRIMARY KEY LOOKUP")
+
+def test_sorted_index_ignores_mismatched_types(users_table):
+    """Test that a value of another type skips a sorted index instead of raising."""
+    for i in range(1, 6):
+        users_table.insert({"id": i, "name": f"user{i}", "age": i})
+    users_table.create_index("age", kind="sorted")
+    assert SimpleQuery(users_table).where("age", "=", "3").execute() == []
+    assert SimpleQuery(users_table).where("age", "=", "3").explain().startswith("FULL SCAN")
+    assert [r.id for r in SimpleQuery(users_table).where("age", "=", 3).execute()] == [3]
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_vectorized_query_matches_row_loop(db, storage):
+    """Test that the NumPy path returns the same rows as the row-at-a-time path."""
+    schema = {
+        "storage": storage,
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "city", "type": "string"},
+            {"name": "score", "type": "int"},
+            {"name": "vip", "type": "bool"},
+            {"name": "since", "type": "date"},
+        ],
+    }
+    table = db.create_table_with_factory("scores", schema)
+    for i in range(1, 61):
+        table.insert({
+            "id": i,
+            "city": None if i % 9 == 0 else f"c{i % 5}",
+            "score": None if i % 7 == 0 else (i * 37) % 50,
+            "vip": None if i % 11 == 0 else i % 3 == 0,
+            "since": date(2020, 1 + i % 12, 1),
+        })
+    shapes = [
+        ([("score", ">", 20)], "score", True),
+        ([("score", "<", 30), ("city", "=", "c2")], "since", False),
+        ([("city", "=", None)], "score", False),
+        ([("vip", "=", True), ("since", ">", date(2020, 6, 1))], "city", True),
+        ([("score", "=", "17")], None, True),
+        ([], "vip", False),
+    ]
+    for conditions, sort_column, ascending in shapes:
+        def build():
+            query = SimpleQuery(table)
+            for condition in conditions:
+                query.where(*condition)
+            if sort_column:
+                query.order_by(sort_column, ascending)
+            return query
+        expected = [r.data for r in build().execute()]
+        assert [r.data for r in build().vectorize().execute()] == expected
+    assert SimpleQuery(table).vectorize().explain().startswith("VECTORIZED SCAN")
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_limit_offset_match_sliced_results(db, storage):
+    """Test that LIMIT/OFFSET (heap top-k with ORDER BY) equal slicing the full result."""
+    schema = {**{"storage": storage}, "columns": [
+        {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+        {"name": "score", "type": "int"},
+    ]}
+    table = db.create_table_with_factory("paged", schema)
+    table.insert_many({"id": i, "score": None if i % 6 == 0 else i % 10} for i in range(1, 41))
+    shapes = [
+        lambda: SimpleQuery(table).where("score", ">", 3),
+        lambda: SimpleQuery(table).order_by("score"),
+        lambda: SimpleQuery(table).where("score", "<", 8).order_by("score", ascending=False),
+        lambda: SimpleQuery(table).order_by("score", ascending=False).select(["id"]),
+        lambda: SimpleQuery(table).order_by("score").vectorize(),
+    ]
+    for build in shapes:
+        full = [r.data for r in build().execute()]
+        for offset, limit in [(0, 5), (3, 4), (0, 0), (35, 10)]:
+            paged = build().offset(offset).limit(limit)
+            assert [r.data for r in paged.execute()] == full[offset:offset + limit]
+        assert [r.data for r in build().offset(7)] == full[7:]
+    assert "SORT score DESC [top 12]" in SimpleQuery(table).order_by("score", False).offset(2).limit(10).explain()
+    with pytest.raises(ValueError):
+        SimpleQuery(table).limit(-1)
+
+def test_cursor_is_lazy(users_table, monkeypatch):
+    """Test that a cursor without ORDER BY reads only as many rows as it yields."""
+    users_table.insert_many({"id": i, "name": f"user{i}", "age": i} for i in range(1, 101))
+    rows = users_table.get_all()
+    visited = []
+    monkeypatch.setattr(users_table, "get_all", lambda: (visited.append(r.id) or r for r in rows))
+    cursor = SimpleQuery(users_table).where("age", ">", 10).cursor()
+    assert [next(cursor).id for _ in range(3)] == [11, 12, 13]
+    assert len(visited) == 13
+
+def test_prepared_query_orders_predicates(users_table):
+    """Test that compiled queries order filters by selectivity and stay reusable."""
+    users_table.insert_many({"id": i, "name": f"user{i % 10}", "age": None if i % 9 == 0 else i}
+                            for i in range(1, 101))
+    query = SimpleQuery(users_table).where("age", ">", 20).where("name", "=", "user3")
+    expected = [r.id for r in users_table.get_all()
+                if r["age"] is not None and r["age"] > 20 and r["name"] == "user3"]
+    assert query.explain().splitlines()[1:] == ["FILTER name = 'user3'", "FILTER age > 20"]
+
+    prepared = query.order_by("id", ascending=False).compile()
+    query.where("age", "<", 0)  # does not affect the prepared query
+    assert [r.id for r in prepared.execute()] == expected[::-1]
+    users_table.insert({"id": 1003, "name": "user3", "age": 50})
+    users_table.create_index("age", kind="sorted")
+    assert prepared.explain().startswith("INDEX SCAN users USING sorted(age)")
+    assert [r.id for r in prepared] == [1003] + expected[::-1]
+    assert SimpleQuery(users_table).where("age", ">", None).execute() == []
+
+def test_table_statistics_follow_changes(db, users_table, orders_table):
+    """Test that statistics track inserts, updates and deletes and drive the planner."""
+    users_table.insert_many({"id": i, "name": f"user{i % 40}", "age": None if i % 10 == 0 else i % 90}
+                            for i in range(1, 3001))
+    for i in range(3001, 3101):
+        users_table.insert({"id": i, "name": "bulk", "age": 200})
+    stats = users_table.stats
+    assert stats.row_count == 3100
+    assert stats.column("age").nulls == 300
+    assert stats.value_range("age") == (1, 200)
+    assert 38 <= stats.distinct("name") <= 44
+    assert stats.distinct("id") == 3100
+    assert stats.selectivity("name", "=", "nobody") == pytest.approx(1 / stats.distinct("name"))
+    assert stats.selectivity("age", ">", 300) == 0.0
+    assert stats.selectivity("age", "<", 45) == pytest.approx(0.45, abs=0.08)
+
+    for i in range(3001, 3101):
+        users_table.delete(i)
+    users_table.update(1, {"age": None})
+    assert stats.row_count == 3000
+    assert stats.column("age").nulls == 301
+    assert stats.value_range("age") == (1, 89)
+
+    # Without indexes, the statistics decide the filter order.
+    query = SimpleQuery(users_table).where("age", ">", 5).where("name", "=", "user7")
+    assert query.explain().splitlines()[1:] == ["FILTER name = 'user7'", "FILTER age > 5"]
+
+    orders_table.insert_many({"id": i, "user_id": 1 + i % 30, "product": "p"} for i in range(300))
+    join = JoinedTable(users_table, orders_table, "id", "user_id")
+    assert join.explain().endswith("[build: orders]")
+    assert 200 <= join.estimate_rows() <= 400
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_group_by_aggregates(db, storage):
+    """Test GROUP BY aggregates on a scan, after filters, and straight from an index."""
+    schema = {"storage": storage, "columns": [
+        {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+        {"name": "city", "type": "string"},
+        {"name": "score", "type": "int"},
+    ]}
+    table = db.create_table_with_factory("sales", schema)
+    table.insert_many({"id": i, "city": None if i % 8 == 0 else f"c{i % 3}",
+                       "score": None if i % 5 == 0 else i} for i in range(1, 31))
+    rows = table.get_all()
+
+    def expected(city):
+        group = [r for r in rows if r["city"] == city]
+        scores = [r["score"] for r in group if r["score"] is not None]
+        return {"city": city, "count(*)": len(group), "count(score)": len(scores), "sum(score)": sum(scores),
+                "min(score)": min(scores), "max(score)": max(scores), "avg(score)": sum(scores) / len(scores)}
+
+    def by_city():
+        query = SimpleQuery(table).group_by(["city"]).aggregate("count").aggregate("count", "score")
+        for function in ("sum", "min", "max", "avg"):
+            query.aggregate(function, "score")
+        return query.order_by("city")
+
+    assert [r.data for r in by_city().execute()] == [expected(c) for c in (None, "c0", "c1", "c2")]
+    top = SimpleQuery(table).where("score", ">", 10).group_by(["city"]).aggregate("sum", "score", "total")
+    top = top.order_by("total", ascending=False).limit(1).execute()
+    totals_by_city = {}
+    for r in rows:
+        if r["score"] is not None and r["score"] > 10:
+            totals_by_city[r["city"]] = totals_by_city.get(r["city"], 0) + r["score"]
+    best = max(totals_by_city, key=totals_by_city.get)
+    assert top[0].data == {"city": best, "total": totals_by_city[best]}
+
+    totals = lambda: SimpleQuery(table).aggregate("count").aggregate("max", "score").aggregate("avg", "score")
+    scan = [r.data for r in totals().execute()]
+    grouped = lambda: SimpleQuery(table).group_by(["city"]).aggregate("count").order_by("city")
+    groups = [r.data for r in grouped().execute()]
+    table.create_index("score", kind="sorted")
+    table.create_index("city")
+    assert totals().explain().startswith("INDEX AGGREGATE sales USING sorted(score)")
+    assert [r.data for r in totals().execute()] == scan
+    assert grouped().explain().startswith("INDEX AGGREGATE sales USING hash(city)")
+    assert [r.data for r in grouped().execute()] == groups
+    empty = SimpleQuery(table).where("score", ">", 100).aggregate("count").aggregate("sum", "score")
+    assert [r.data for r in empty.execute()] == [{"count(*)": 0, "sum(score)": None}]
+    with pytest.raises(ValueError):
+        SimpleQuery(table).aggregate("sum")
+
+def test_query_cache_invalidation_and_bounds(db, users_table, orders_table, monkeypatch):
+    """Test that cached results are reused until a table they read changes."""
+    monkeypatch.setattr(db, "query_cache", QueryCache(max_entries=2))
+    users_table.insert_many({"id": i, "name": f"user{i % 3}", "age": i} for i in range(1, 11))
+    orders_table.insert_many({"id": i, "user_id": i + 2, "product": "p"} for i in range(5))
+    young = lambda: SimpleQuery(users_table).where("age", "<", 5).where("name", "=", "user1")
+    same = lambda: SimpleQuery(users_table).where("name", "=", "user1").where("age", "<", 5)
+
+    first = [r.id for r in young().execute()]
+    assert [r.id for r in same().execute()] == first == [1, 4]
+    assert (db.query_cache.hits, db.query_cache.misses) == (1, 1)
+    users_table.insert({"id": 11, "name": "user1", "age": 2})
+    assert [r.id for r in young().execute()] == [1, 4, 11]
+    users_table.update(4, {"age": 50})
+    users_table.delete(1)
+    assert [r.id for r in young().execute()] == [11]
+    assert db.query_cache.stats()["misses"] == 3
+
+    join = lambda: JoinedTable(users_table, orders_table, "id", "user_id").execute()
+    assert len(join()) == len(join()) == 5
+    orders_table.delete(0)
+    assert len(join()) == 4
+    assert db.query_cache.stats()["hits"] == 2
+    SimpleQuery(users_table).order_by("age").execute()
+    assert len(db.query_cache) == 2 and db.query_cache.evictions >= 1
+
+    # A write committed while a query runs leaves its cached result stale.
+    query = SimpleQuery(users_table).where("name", "=", "user2")
+    scan = query.cursor
+
+    def scan_then_write():
+        rows = list(scan())
+        users_table.insert({"id": 12, "name": "user2", "age": 12})
+        return iter(rows)
+
+    monkeypatch.setattr(query, "cursor", scan_then_write)
+    assert 12 not in [r.id for r in query.execute()]
+    assert 12 in [r.id for r in SimpleQuery(users_table).where("name", "=", "user2").execute()]
+
+    small = QueryCache(max_bytes=1)
+    monkeypatch.setattr(db, "query_cache", small)
+    SimpleQuery(users_table).execute()
+    assert len(small) == 0
+
+    # Entries hold their tables weakly: caching a query does not keep a dropped table alive.
+    cache = QueryCache()
+    monkeypatch.setattr(db, "query_cache", cache)
+    scratch = Table.from_schema({**users_table.schema_dict(), "name": "scratch", "indexes": []}, TYPE_REGISTRY)
+    SimpleQuery(scratch).execute()
+    assert len(cache) == 1
+    scratch = weakref.ref(scratch)
+    gc.collect()
+    assert scratch() is None
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_parallel_scan_matches_serial(db, storage, monkeypatch):
+    """Test that partitioned scans in worker processes merge into the serial result."""
+    monkeypatch.setattr(parallel, "MIN_ROWS", 0)
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "city", "type": "string"},
+            {"name": "score", "type": "int"},
+            {"name": "vip", "type": "bool"},
+            {"name": "joined", "type": "date"},
+        ],
+        "storage": storage,
+    }
+    table = db.create_table_with_factory(f"parallel_{storage}", schema)
+    rnd = random.Random(7)
+    table.insert_many({"id": i, "city": rnd.choice(["Kyiv", "Lviv", "Odesa", None]),
+                       "score": rnd.choice([None, rnd.randrange(20)]), "vip": rnd.random() < 0.3,
+                       "joined": date(2024, 1 + i % 12, 1)} for i in range(300))
+    table.delete(5)
+    queries = [
+        lambda: SimpleQuery(table).where("score", ">", 4).where("vip", "=", False),
+        lambda: SimpleQuery(table).where("city", "=", "Lviv").order_by("score", ascending=False),
+        lambda: SimpleQuery(table).where("joined", "<", date(2024, 6, 1)).order_by("city").offset(3).limit(7),
+        lambda: SimpleQuery(table).order_by("score").limit(10).select(["id", "score"]),
+        lambda: (SimpleQuery(table).where("score", "<", 15).group_by(["city", "vip"]).aggregate("count")
+                 .aggregate("sum", "score").aggregate("avg", "score").aggregate("min", "joined")
+                 .aggregate("max", "city")),
+        lambda: SimpleQuery(table).where("score", ">", 100).aggregate("count").aggregate("sum", "score"),
+        lambda: SimpleQuery(table).where("city", "like", "%v%").where("score", "<", 10),
+    ]
+    for query in queries:
+        expected = [(r.id, r.data) if not query()._is_aggregate() else r.data for r in query().execute()]
+        for workers in (1, 3):
+            parallel_query = query().parallel(workers)
+            assert parallel_query.explain().startswith("PARALLEL SCAN")
+            assert [(r.id, r.data) if not parallel_query._is_aggregate() else r.data
+                    for r in parallel_query.execute()] == expected
+    table.create_index("city")
+    lookup = SimpleQuery(table).where("city", "=", "Kyiv").parallel(2)
+    assert lookup.explain().startswith("INDEX SCAN")
+    assert [r.id for r in lookup.execute()] == [r.id for r in SimpleQuery(table).where("city", "=", "Kyiv").execute()]
+
+    if storage == "row":
+        table.insert({"id": 1000, "score": 2 ** 70})  # too wide for a shared int64 segment
+        wide = lambda: SimpleQuery(table).where("score", ">", 4)
+        assert wide().parallel(2).explain().startswith("FULL SCAN")
+        assert [r.id for r in wide().parallel(2).execute()] == [r.id for r in wide().execute()]
+
+    # Shared segments do not keep their table alive, and go once it is collected.
+    scratch = Table.from_schema({**table.schema_dict(), "name": "scratch", "indexes": []}, TYPE_REGISTRY)
+    scratch.insert_many({"id": i, "score": i} for i in range(50))
+    assert [r.id for r in SimpleQuery(scratch).where("score", ">", 44).parallel(2).execute()] == [45, 46, 47, 48, 49]
+    scratch_id, scratch = id(scratch), weakref.ref(scratch)
+    gc.collect()
+    assert scratch() is None
+    parallel._export(table, "id")  # releases the collected table's segments first
+    assert not [key for key in parallel._exports if key[0] == scratch_id]
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_dictionary_columns_and_like(db, storage):
+    """Test dictionary-encoded strings and LIKE / startswith, with and without a sorted index."""
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "city", "type": "string", "dictionary": True},
+            {"name": "name", "type": "string"},
+        ],
+        "storage": storage,
+    }
+    table = db.create_table_with_factory(f"cities_{storage}", schema)
+    cities = ["Kyiv", "Kharkiv", "Lviv", "Odesa", None]
+    table.insert_many({"id": i, "city": None if cities[i % 5] is None else "".join(cities[i % 5]),
+                       "name": f"n{i}"} for i in range(40))
+    assert [c.get("dictionary") for c in table.schema_dict()["columns"]] == [None, True, None]
+    if storage == "row":
+        assert table.get_by_id(0)["city"] is table.get_by_id(5)["city"]
+    else:
+        vector = table.column_vector("city")
+        assert vector.typecode == "I" and vector.dictionary.strings == cities[:4]
+
+    def ids(op, val):
+        return [r.id for r in SimpleQuery(table).where("city", op, val).execute()]
+
+    def expected(test):
+        return [i for i in range(40) if cities[i % 5] is not None and test(cities[i % 5])]
+
+    cases = [
+        ("like", "K%", lambda c: c.startswith("K")),
+        ("startswith", "Kh", lambda c: c.startswith("Kh")),
+        ("like", "%v", lambda c: c.endswith("v")),
+        ("like", "_viv", lambda c: len(c) == 4 and c.endswith("viv")),
+        ("like", "%", lambda c: True),
+        ("=", "Lviv", lambda c: c == "Lviv"),
+        (">", "L", lambda c: c > "L"),
+    ]
+    for op, val, test in cases:
+        assert ids(op, val) == expected(test), (op, val)
+    assert ids("like", "kyiv") == [] and ids("=", "Dnipro") == []
+    with pytest.raises(ValueError):
+        SimpleQuery(table).where("city", "like", 5)
+
+    table.create_index("city", "sorted")
+    assert SimpleQuery(table).where("city", "like", "K%").explain().startswith("INDEX SCAN")
+    assert SimpleQuery(table).where("city", "startswith", "").explain().startswith("INDEX SCAN")
+    assert not SimpleQuery(table).where("city", "like", "%v").explain().startswith("INDEX SCAN")
+    for op, val, test in cases:
+        assert ids(op, val) == expected(test), (op, val)
+
+    table.update(2, {"city": "Dnipro"})
+    assert ids("like", "D%") == [2] and 2 not in ids("like", "%v")
+    copy = Table.from_schema({**table.schema_dict(), "indexes": []}, TYPE_REGISTRY)
+    assert copy.columns["city"].data_type.dictionary and not copy.columns["name"].data_type.dictionary
+
 # ---------- JoinedTable Tests ----------
 
 def test_inner_join(users_table, orders_table):
@@ -98,6 +702,190 @@ def test_inner_join(users_table, orders_table):
     assert joined[0]["name"] == "Alice"
     assert joined[1]["product"] == "Phone"
 
+def test_join_and_select_skip_columns_a_row_was_not_given(db, users_table):
+    """Test that columns left out of an insert neither overwrite joined values nor show up in selections."""
+    notes = db.create_table_with_factory("notes", {
+        "columns": [
+            {"name": "oid", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "uid", "type": "int", "nullable": False},
+            {"name": "name", "type": "string"},
+        ]
+    })
+    users_table.insert({"id": 1, "name": "Alice"})
+    notes.insert({"oid": 10, "uid": 1})
+    for strategy in ("nested", "hash", "merge"):
+        assert JoinedTable(users_table, notes, "id", "uid", strategy=strategy).execute() == \
+            [{"id": 1, "name": "Alice", "oid": 10, "uid": 1}]
+    assert [r.data for r in SimpleQuery(users_table).select(["id", "nope"]).execute()] == [{"id": 1}]
+
+
+def test_join_strategies_match_nested_loop(db, users_table, orders_table):
+    """Test that hash and merge joins return exactly the nested-loop output."""
+    for i in range(1, 9):
+        users_table.insert({"id": i, "name": f"user{i}", "age": None if i % 3 == 0 else i % 4})
+    for i in range(1, 30):
+        orders_table.insert({"id": i, "user_id": (i * 5) % 8 + 1, "product": f"p{i}"})
+    cases = [(users_table, orders_table, "id", "user_id"),
+             (orders_table, users_table, "user_id", "id"),
+             (users_table, users_table, "age", "age")]
+    for left, right, lcol, rcol in cases:
+        expected = JoinedTable(left, right, lcol, rcol, strategy="nested").execute()
+        assert JoinedTable(left, right, lcol, rcol).execute() == expected
+        assert JoinedTable(left, right, lcol, rcol, strategy="merge").execute() == expected
+
+    users_table.create_index("age", kind="sorted")
+    join = JoinedTable(users_table, users_table, "age", "age")
+    assert join.explain().startswith("MERGE JOIN")
+    assert join.execute() == JoinedTable(users_table, users_table, "age", "age", strategy="nested").execute()
+    assert JoinedTable(users_table, orders_table, "id", "user_id").explain().endswith("[build: users]")
+
+    # Sorted indexes over keys of different types (str against int) cannot be merged.
+    users_table.create_index("name", kind="sorted")
+    orders_table.create_index("user_id", kind="sorted")
+    join = JoinedTable(users_table, orders_table, "name", "user_id")
+    assert join.explain().startswith("HASH JOIN")
+    expected = JoinedTable(users_table, orders_table, "name", "user_id", strategy="nested").execute()
+    for strategy in ("auto", "merge", "hash"):
+        assert JoinedTable(users_table, orders_table, "name", "user_id", strategy=strategy).execute() == expected
+
+# ---------- Concurrency Tests ----------
+
+@pytest.mark.parametrize("storage", ["row", "columnar"])
+def test_snapshot_readers_see_no_lost_or_phantom_rows(db, storage):
+    """Stress test: reader threads query snapshots while one writer commits."""
+    schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "batch", "type": "int", "nullable": False},
+            {"name": "a", "type": "int"},
+            {"name": "b", "type": "int"},
+        ],
+        "storage": storage,
+    }
+    table = db.create_table_with_factory(f"stress_{storage}", schema)
+    table.create_index("batch")
+    history = {table.version: frozenset()}  # version -> ids committed at that version
+    observed, errors = [], []
+    done = threading.Event()
+
+    def writer():
+        rnd, batches, next_id = random.Random(1), [], 0
+        for step in range(300):
+            if not batches or rnd.random() < 0.4:
+                rows = [{"id": next_id + i, "batch": step, "a": 0, "b": 0} for i in range(10)]
+                table.insert_many(rows)
+                next_id += 10
+                batches.append(step)
+            elif rnd.random() < 0.5:
+                batch = batches.pop(rnd.randrange(len(batches)))
+                table.delete_where(SimpleQuery(table).where("batch", "=", batch))
+            else:
+                row = rnd.choice(table.get_all())
+                table.update(row.id, {"a": step, "b": step})
+            history[table.version] = frozenset(r.id for r in table.get_all())
+        done.set()
+
+    def reader():
+        try:
+            while not done.is_set():
+                snap = db.snapshot()[table.name] if random.random() < 0.5 else table.snapshot()
+                rows = SimpleQuery(snap).execute()
+                ids = frozenset(r.id for r in rows)
+                counts = {}
+                for row in rows:
+                    assert row["a"] == row["b"], "torn update"
+                    assert snap.get_by_primary_key(row.id).data == row.data
+                    counts[row["batch"]] = counts.get(row["batch"], 0) + 1
+                assert set(counts.values()) <= {10}, "torn batch"
+                for batch in list(counts)[:3]:
+                    assert len(SimpleQuery(snap).where("batch", "=", batch).execute()) == 10
+                assert frozenset(r.id for r in snap.get_all()) == ids, "non-repeatable read"
+                observed.append((snap.version, ids))
+        except Exception as e:
+            errors.append(e)
+            done.set()
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # switch threads often to provoke races
+    try:
+        for thread in readers:
+            thread.start()
+        writer()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, errors[0]
+    assert observed
+    for version, ids in observed:
+        assert ids == history[version]
+    with pytest.raises(ValueError):
+        table.snapshot().insert({"id": -1, "batch": 0})
+
+# ---------- Server Tests ----------
+
+def test_server_matches_in_process_results(db, users_table, orders_table):
+    """Test the async server and pooled client against the same calls made in process."""
+    events_schema = {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "user_id", "type": "int", "nullable": True, "foreign_key": ["users", "id"]},
+            {"name": "day", "type": "date", "nullable": True},
+        ]
+    }
+
+    async def scenario():
+        server = QueryServer(db)
+        host, port = await server.start()
+        client = await Client.connect(host, port, pool_size=2)
+        try:
+            await client.insert_many("users", [{"id": i, "name": f"user{i}", "age": i % 7 or None}
+                                               for i in range(1, 41)])
+            # Pipelined: all inserts are in flight at once over two connections.
+            ids = await asyncio.gather(*(client.insert("orders", {"id": i, "user_id": i % 40 + 1,
+                                                                  "product": f"p{i}"})
+                                         for i in range(1, 101)))
+            assert sorted(ids) == list(range(1, 101))
+            await client.create_table("events", events_schema)
+            await client.insert_many("events", [{"id": i, "user_id": i, "day": date(2024, 1, i)}
+                                                for i in range(1, 11)] + [{"id": 11, "user_id": None, "day": None}])
+
+            rows = await client.query("users").where("age", ">", 3).order_by("age", False).limit(5).execute()
+            expected = SimpleQuery(users_table).where("age", ">", 3).order_by("age", False).limit(5).execute()
+            assert [(r.id, r.data) for r in rows] == [(r.id, r.data) for r in expected]
+            rows = await (client.query("events").where("day", ">", date(2024, 1, 7))
+                          .select(["id", "day"]).execute())
+            assert [r.data for r in rows] == [{"id": i, "day": date(2024, 1, i)} for i in (8, 9, 10)]
+            rows = await client.query("events").aggregate("max", "day").aggregate("count").execute()
+            assert rows[0].data == {"max(day)": date(2024, 1, 10), "count(*)": 11}
+            assert await client.join("users", "orders", "id", "user_id") == \
+                JoinedTable(users_table, orders_table, "id", "user_id").execute()
+            assert await client.join("users", "events", "id", "user_id") == \
+                JoinedTable(users_table, db.get_table("events"), "id", "user_id").execute()
+
+            await client.update("users", 1, {"age": 99})
+            await client.delete("orders", 1)
+            assert users_table.get_by_id(1)["age"] == 99 and orders_table.get_by_id(1) is None
+            with pytest.raises(ValueError, match="Duplicate primary key"):
+                await client.insert("users", {"id": 2, "name": "dup", "age": 1})
+            with pytest.raises(ValueError, match="does not exist"):
+                await client.query("missing").execute()
+            with pytest.raises(ValueError, match="Unknown query call"):
+                await client.pool.request("query", table="users", calls=[["delete_where", []]])
+            with pytest.raises(ValueError, match="Missing request field.*row_id, data"):
+                await client.pool.request("update", table="users")
+            # A KeyError inside an operation is not mistaken for a missing field.
+            with pytest.raises(ValueError, match="KeyError: 'columns'"):
+                await client.create_table("broken", {"storage": "row"})
+            # Errors leave the connections usable.
+            assert len(await client.query("orders").execute()) == 99
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(scenario())
+
 # ---------- JSON Persistence Tests ----------
 
 def test_save_load_json(tmp_path):
@@ -126,3 +914,180 @@ def test_save_load_json(tmp_path):
     assert new_row.id != row.id
     assert users2.get_by_id(2)["name"] == "Bob"
 
+
+def test_save_load_ndjson_streaming(tmp_path):
+    """Test the streaming NDJSON snapshot round trip, including dates and columnar tables."""
+    db = Database("StreamDB")
+    db.tables.clear()
+    users = db.create_table_with_factory("users", {
+        "storage": "columnar",
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "name", "type": "string", "nullable": False},
+            {"name": "born", "type": "date"},
+        ],
+    })
+    orders = db.create_table_with_factory("orders", {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "user_id", "type": "int", "nullable": False, "foreign_key": ("users", "id")},
+        ],
+    })
+    users.insert({"id": 1, "name": "Alice", "born": date(1990, 5, 17)})
+    users.insert({"id": 2, "name": "Bob", "born": None})
+    orders.insert({"id": 10, "user_id": 2})
+    users.create_index("name")
+
+    filepath = tmp_path / "db.ndjson"
+    db.save_to_ndjson(filepath)
+    lines = filepath.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1 + 2 + 1 + 2
+    assert lines[2] == '{"id":1,"data":{"id":1,"name":"Alice","born":"1990-05-17"}}'
+
+    db.load_from_json(filepath)  # format is detected from the header line
+    users2 = db.get_table("users")
+    assert users2.storage == "columnar"
+    assert users2.get_by_id(1)["born"] == date(1990, 5, 17)
+    assert [r.data for r in db.get_table("orders").get_all()] == [{"id": 10, "user_id": 2}]
+    assert SimpleQuery(users2).where("name", "=", "Bob").explain().startswith("INDEX SCAN")
+    with pytest.raises(ValueError):
+        db.get_table("orders").insert({"id": 11, "user_id": 3})
+
+def test_binary_snapshot_opens_lazily(tmp_path):
+    """Test the mmap-backed binary snapshot: reads, index use, FK checks and copy on write."""
+    db = Database("BinDB")
+    db.tables.clear()
+    users = db.create_table_with_factory("users", {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "name", "type": "string", "nullable": False},
+            {"name": "active", "type": "bool"},
+            {"name": "born", "type": "date"},
+        ]
+    })
+    orders = db.create_table_with_factory("orders", {
+        "columns": [
+            {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+            {"name": "user_id", "type": "int", "nullable": False, "foreign_key": ("users", "id")},
+        ]
+    })
+    for i in (5, 2, 9):  # ids out of order
+        users.insert({"id": i, "name": f"Zoë{i}", "active": i > 4, "born": date(1990, 1, i)})
+    users.insert({"id": 7, "name": "Null", "active": None, "born": None})
+    users.create_index("name")
+    orders.insert({"id": 1, "user_id": 9})
+    expected = [r.data for r in users.get_all()]
+
+    filepath = tmp_path / "db.bin"
+    db.save_snapshot(filepath)
+    db.open_snapshot(filepath)
+    users = db.get_table("users")
+    assert users.storage == "row"  # the declared kind is kept
+    assert users.get_by_id(9).data == {"id": 9, "name": "Zoë9", "active": True, "born": date(1990, 1, 9)}
+    assert users.get_by_id(3) is None
+    assert [r.data for r in users.get_all()] == expected
+    assert [r.id for r in SimpleQuery(users).where("name", "=", "Zoë2").execute()] == [2]
+
+    db.get_table("orders").insert({"id": 2, "user_id": 7})
+    with pytest.raises(ValueError):
+        db.get_table("orders").insert({"id": 3, "user_id": 4})
+    users.update(7, {"name": "Seven"})
+    users.delete(5)
+    assert users._store._copy.kind == "row"  # copied on first write into the declared kind
+    assert [r["name"] for r in users.get_all()] == ["Zoë2", "Zoë9", "Seven"]
+    db.load_from_json(filepath)  # the binary format is detected too
+    assert len(db.get_table("users").get_all()) == 4
+
+# ---------- Write-Ahead Log Tests ----------
+
+def test_wal_replays_changes_after_crash(tmp_path):
+    """Test that changes logged after the last checkpoint survive a crash."""
+    db = Database("WalDB")
+    db.tables.clear()
+    filepath = str(tmp_path / "db.ndjson")
+    db.attach_wal(filepath, checkpoint_every=None, sync=False)
+    try:
+        users = db.create_table_with_factory("users", {
+            "columns": [
+                {"name": "id", "type": "int", "nullable": False, "primary_key": True},
+                {"name": "name", "type": "string", "nullable": False},
+                {"name": "born", "type": "date"},
+            ]
+        })
+        users.insert({"id": 1, "name": "Alice", "born": date(1990, 1, 2)})
+        users.insert({"id": 2, "name": "Bob"})
+        users.insert({"id": 3, "name": "Carol"})
+        users.update(2, {"born": date(1985, 3, 4)})
+        users.delete(3)
+        users.insert({"id": 4, "name": "Dan"})
+        users.delete_where(SimpleQuery(users).where("name", "=", "Dan"))
+        users.create_index("name")
+    finally:
+        db.detach_wal()  # "crash": no checkpoint
+    with open(f"{filepath}.wal", "a", encoding="utf-8") as f:
+        f.write('{"lsn": 99, "op": "delete", "tab')  # torn last record
+
+    db.load_from_json(filepath)
+    users = db.get_table("users")
+    assert [r.data for r in users.get_all()] == [
+        {"id": 1, "name": "Alice", "born": date(1990, 1, 2)},
+        {"id": 2, "name": "Bob", "born": date(1985, 3, 4)},
+    ]
+    assert ("name", "hash") in users.indexes
+
+def test_wal_checkpoint_compacts_log(tmp_path):
+    """Test automatic checkpoints and that replay skips records already in the snapshot."""
+    db = Database("WalDB")
+    db.tables.clear()
+    filepath = str(tmp_path / "db.ndjson")
+    db.attach_wal(filepath, checkpoint_every=3, sync=False)
+    try:
+        table = db.create_table_with_factory("items", {
+            "columns": [{"name": "id", "type": "int", "nullable": False, "primary_key": True}]
+        })
+        table.insert({"id": 1})
+        with open(f"{filepath}.wal", encoding="utf-8") as f:
+            stale_log = f.read()
+        table.insert({"id": 2})  # third record: checkpoint
+        with open(f"{filepath}.wal", encoding="utf-8") as f:
+            assert f.read() == ""
+        table.insert({"id": 3})
+    finally:
+        db.detach_wal()
+    with open(f"{filepath}.wal", "w", encoding="utf-8") as f:
+        f.write(stale_log)  # as if the crash hit between snapshot rename and log truncation
+    db.load_from_json(filepath)
+    assert [r.id for r in db.get_table("items").get_all()] == [1, 2]
+
+def test_wal_logs_changes_before_applying_them(tmp_path, monkeypatch):
+    """Test that a change the log cannot take is not applied, and that a logged change that fails is taken back."""
+    db = Database("WalDB")
+    db.tables.clear()
+    filepath = str(tmp_path / "db.ndjson")
+    db.attach_wal(filepath, checkpoint_every=None, sync=True)
+    try:
+        items = db.create_table_with_factory("items", {
+            "columns": [{"name": "id", "type": "int", "nullable": False, "primary_key": True}],
+            "storage": "columnar",
+        })
+        items.insert({"id": 1})
+
+        def fsync(fd):
+            raise OSError("disk full")
+
+        with monkeypatch.context() as m:
+            m.setattr("wal.os.fsync", fsync)
+            with pytest.raises(OSError):
+                items.insert({"id": 2})
+            with pytest.raises(OSError):
+                items.delete(items.get_by_primary_key(1).id)
+        with pytest.raises(ValueError):
+            items.insert({"id": 2 ** 70})  # logged, then refused by the int64 column
+        items.insert({"id": 3})
+    finally:
+        db.detach_wal()
+    assert [r["id"] for r in items.get_all()] == [1, 3]
+    with open(f"{filepath}.wal", encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["create_table", "insert", "insert"]
+    db.load_from_json(filepath)
+    assert [r["id"] for r in db.get_table("items").get_all()] == [1, 3]
@@ -0,0 +1,128 @@
+from datetime import date
+from typing import Any, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; SimpleQuery falls back to the row loop
+    np = None
+
+HAS_NUMPY = np is not None
+
+# ---------- Column arrays ----------
+
+_DTYPES = {"q": "int64", "b": "int8", "i": "int32"}
+
+
+def column_array(table, name: str):
+    """
+    Return a column as NumPy arrays.
+
+    Args:
+        table (Table): Source table.
+        name (str): Column name.
+
+    Returns:
+        tuple: (values, nulls, typecode). ``values`` is a typed array for
+        columnar int/bool/date columns and an object array otherwise;
+        ``nulls`` is a boolean mask; ``typecode`` is the storage typecode
+        or None for object arrays.
+    """
+    vector = table.column_vector(name)
+    if vector is not None and vector.typecode in _DTYPES:
+        values = np.frombuffer(vector.values, dtype=_DTYPES[vector.typecode]).copy()
+        if vector.nulls is None:
+            nulls = np.zeros(len(values), dtype=bool)
+        else:
+            nulls = np.frombuffer(vector.nulls, dtype=np.uint8).astype(bool)
+        return values, nulls, vector.typecode
+    values = np.empty(len(table.get_all()), dtype=object)
+    values[:] = table.column_values(name)
+    return values, np.equal(values, None), None
+
+
+def _encode(value: Any, typecode: Optional[str]):
+    """Convert a query value to the column's stored form, or raise TypeError."""
+    if typecode is None:
+        return value
+    if typecode == "i":
+        if type(value) is not date:
+            raise TypeError("date column compared with a non-date value")
+        return value.toordinal()
+    if isinstance(value, (bool, int, float)):
+        return value
+    raise TypeError("numeric column compared with a non-numeric value")
+
+
+# ---------- Filter and sort ----------
+
+def filter_mask(table, conditions: Sequence[tuple[str, str, Any]]):
+    """
+    Compile (column, operator, value) conditions into one boolean mask.
+
+    Returns:
+        numpy.ndarray | None: Mask over table positions, or None when a
+        condition cannot be evaluated column-wise with the same result as
+        the row loop (e.g. a value of another type, or '>' None).
+    """
+    mask = np.ones(len(table.get_all()), dtype=bool)
+    for col, op, val in conditions:
+        if op in ("like", "startswith"):
+            return None  # pattern matching stays in the row loop
+        if op not in ("=", ">", "<"):
+            continue
+        values, nulls, typecode = column_array(table, col)
+        if val is None:
+            if op != "=":
+                return None
+            mask &= nulls
+            continue
+        try:
+            stored = _encode(val, typecode)
+        except TypeError:
+            return None
+        present = ~nulls
+        hits = np.zeros(len(values), dtype=bool)
+        if op == "=":
+            hits[present] = values[present] == stored
+        elif op == ">":
+            hits[present] = values[present] > stored
+        else:
+            hits[present] = values[present] < stored
+        mask &= hits
+    return mask
+
+
+def sort_positions(table, positions, column: str, ascending: bool = True):
+    """
+    Order positions by a column: NULLs first when ascending, last when descending.
+
+    Ties keep their input order, as with ``list.sort(reverse=...)``.
+    """
+    values, nulls, _ = column_array(table, column)
+    if not ascending:
+        positions = positions[::-1]
+    null_part = positions[nulls[positions]]
+    rest = positions[~nulls[positions]]
+    rest = rest[np.argsort(values[rest], kind="stable")]
+    ordered = np.concatenate([null_part, rest])
+    return ordered[::-1] if not ascending else ordered
+
+
+def vectorized_positions(table, conditions, sort_column: Optional[str] = None,
+                         ascending: bool = True) -> Optional[List[int]]:
+    """
+    Filter and sort a table with NumPy.
+
+    Returns:
+        List[int] | None: Matching positions in result order, or None when
+        NumPy is unavailable or the conditions need the row-at-a-time path.
+    """
+    if not HAS_NUMPY:
+        return None
+    mask = filter_mask(table, conditions)
+    if mask is None:
+        return None
+    positions = np.flatnonzero(mask)
+    if sort_column:
+        positions = sort_positions(table, positions, sort_column, ascending)
+    return positions.tolist()
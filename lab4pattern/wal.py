@@ -0,0 +1,121 @@
+import json
+import os
+from typing import Any, Callable, Iterator, Optional
+
+# ---------- Write-ahead log ----------
+
+class WriteAheadLog:
+    """Append-only log of database changes, one compact JSON record per line.
+
+    A record is durable once append() returns (flushed, and fsynced when
+    ``sync`` is true). A torn last line left by a crash is ignored on read
+    and cut off when the log is reopened.
+    """
+
+    def __init__(self, path: str, sync: bool = True, default: Optional[Callable] = None):
+        """
+        Open (or create) a log file.
+
+        Args:
+            path (str): Log file path.
+            sync (bool): fsync after every record.
+            default (Callable | None): json ``default`` hook for non-JSON values.
+        """
+        self.path = path
+        self.sync = sync
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"),
+                                        default=default).encode
+        self.count = self._truncate_torn_tail()
+        self._file = open(path, "ab")
+        self._last = 0  # offset of the last appended record (see retract)
+
+    def _truncate_torn_tail(self) -> int:
+        """Cut the file after the last complete record; return the record count."""
+        if not os.path.exists(self.path):
+            return 0
+        valid_end = 0
+        count = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n") or not self._parse(line):
+                    break
+                valid_end += len(line)
+                count += 1
+        if valid_end != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        return count
+
+    @staticmethod
+    def _parse(line: bytes) -> Optional[dict]:
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def append(self, record: dict[str, Any]):
+        """Write one record and make it durable; if that fails, the log is left as it was."""
+        line = self._encode(record).encode("utf-8") + b"\n"
+        end = self._file.seek(0, os.SEEK_END)
+        try:
+            self._file.write(line)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+        except BaseException:
+            self._cut(end)
+            raise
+        self._last = end
+        self.count += 1
+
+    def retract(self):
+        """Drop the record appended last (its change could not be applied)."""
+        self._cut(self._last)
+        self.count -= 1
+
+    def truncate(self):
+        """Drop every record (after a checkpoint has captured them)."""
+        self._cut(0)
+        self.count = 0
+
+    def _cut(self, end: int):
+        self._file.truncate(end)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """Yield the complete records of a log file, stopping at a torn tail."""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            for line in f:
+                record = WriteAheadLog._parse(line) if line.endswith(b"\n") else None
+                if record is None:
+                    return
+                yield record
+
+
+def replace_atomically(filepath: str, write: Callable[[Any], None], sync: bool = True,
+                       binary: bool = False):
+    """
+    Write a file via a temporary sibling and os.replace, so readers see the
+    old or the new content but never a half-written file.
+
+    Args:
+        filepath (str): Target path.
+        write (Callable): Called with the open temporary file.
+        sync (bool): fsync the temporary file before the rename.
+        binary (bool): Open the temporary file in binary instead of text mode.
+    """
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") if binary else open(tmp_path, "w", encoding="utf-8") as f:
+        write(f)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)